@@ -1,7 +1,13 @@
 from __future__ import annotations
 
-from pre_commit.main import main
+import sys
+
+from pre_commit.daemon import maybe_forward
 
 
 if __name__ == '__main__':
-    raise SystemExit(main())
+    retcode = maybe_forward(sys.argv[1:])
+    if retcode is None:
+        from pre_commit.main import main
+        retcode = main()
+    raise SystemExit(retcode)
@@ -1,50 +1,60 @@
 from __future__ import annotations
 
+import importlib
+from collections.abc import Iterator
+from collections.abc import Mapping
+from typing import cast
+
 from pre_commit.lang_base import Language
-from pre_commit.languages import conda
-from pre_commit.languages import coursier
-from pre_commit.languages import dart
-from pre_commit.languages import docker
-from pre_commit.languages import docker_image
-from pre_commit.languages import dotnet
-from pre_commit.languages import fail
-from pre_commit.languages import golang
-from pre_commit.languages import haskell
-from pre_commit.languages import julia
-from pre_commit.languages import lua
-from pre_commit.languages import node
-from pre_commit.languages import perl
-from pre_commit.languages import pygrep
-from pre_commit.languages import python
-from pre_commit.languages import r
-from pre_commit.languages import ruby
-from pre_commit.languages import rust
-from pre_commit.languages import swift
-from pre_commit.languages import unsupported
-from pre_commit.languages import unsupported_script
-
-
-languages: dict[str, Language] = {
-    'conda': conda,
-    'coursier': coursier,
-    'dart': dart,
-    'docker': docker,
-    'docker_image': docker_image,
-    'dotnet': dotnet,
-    'fail': fail,
-    'golang': golang,
-    'haskell': haskell,
-    'julia': julia,
-    'lua': lua,
-    'node': node,
-    'perl': perl,
-    'pygrep': pygrep,
-    'python': python,
-    'r': r,
-    'ruby': ruby,
-    'rust': rust,
-    'swift': swift,
-    'unsupported': unsupported,
-    'unsupported_script': unsupported_script,
-}
+
+
+class _Languages(Mapping[str, Language]):
+    """the language modules, imported on first use -- most configurations
+    only need a few of them and some are slow to import
+    """
+
+    def __init__(self, names: tuple[str, ...]) -> None:
+        self._names = names
+        self._modules: dict[str, Language] = {}
+
+    def __getitem__(self, name: str) -> Language:
+        if name not in self._names:
+            raise KeyError(name)
+        try:
+            return self._modules[name]
+        except KeyError:
+            module = importlib.import_module(f'pre_commit.languages.{name}')
+            ret = self._modules[name] = cast(Language, module)
+            return ret
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+languages: Mapping[str, Language] = _Languages((
+    'conda',
+    'coursier',
+    'dart',
+    'docker',
+    'docker_image',
+    'dotnet',
+    'fail',
+    'golang',
+    'haskell',
+    'julia',
+    'lua',
+    'node',
+    'perl',
+    'pygrep',
+    'python',
+    'r',
+    'ruby',
+    'rust',
+    'swift',
+    'unsupported',
+    'unsupported_script',
+))
 language_names = sorted(languages)
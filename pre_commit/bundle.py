@@ -0,0 +1,184 @@
+"""archives of the store's repositories (and their environments) used by a
+configuration -- to restore a store on another machine (for instance a CI
+cache) without cloning or installing anything
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import logging
+import os.path
+import shutil
+import tarfile
+import tempfile
+from collections.abc import Sequence
+from typing import Any
+
+from pre_commit.all_languages import languages
+from pre_commit.errors import FatalError
+from pre_commit.hook import Hook
+from pre_commit.store import Store
+from pre_commit.util import clean_path_on_failure
+
+logger = logging.getLogger('pre_commit')
+
+_VERSION = 1
+_METADATA = 'bundle.json'
+
+
+def config_hash(config_file: str) -> str:
+    with open(config_file, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _add_repo(tar: tarfile.TarFile, path: str, arcname: str) -> None:
+    alternates = os.path.join(path, '.git/objects/info/alternates')
+    alternates_arcname = f'{arcname}/.git/objects/info/alternates'
+
+    def _filter(info: tarfile.TarInfo) -> tarfile.TarInfo | None:
+        return None if info.name == alternates_arcname else info
+
+    tar.add(path, arcname, filter=_filter)
+
+    # clones borrow their objects from a mirror, include those instead so
+    # the restored clone does not depend on the mirror
+    if os.path.exists(alternates):
+        with open(alternates) as f:
+            objects_dirs = f.read().splitlines()
+        for objects in objects_dirs:
+            for name in os.listdir(objects):
+                if name != 'info':
+                    tar.add(
+                        os.path.join(objects, name),
+                        f'{arcname}/.git/objects/{name}',
+                    )
+
+
+def export_bundle(
+        store: Store,
+        hooks: Sequence[Hook],
+        config_hash: str,
+        filename: str,
+) -> None:
+    prefix_dirs = {hook.prefix.prefix_dir for hook in hooks}
+    with store.connect() as db:
+        rows = db.execute('SELECT repo, ref, path FROM repos').fetchall()
+    repos = [row for row in rows if row[2] in prefix_dirs]
+
+    metadata = {
+        'version': _VERSION,
+        'config': config_hash,
+        # environments refer to themselves by absolute path
+        'store': store.directory,
+        'repos': [
+            {'repo': repo, 'ref': ref, 'dir': os.path.basename(path)}
+            for repo, ref, path in repos
+        ],
+    }
+    metadata_bytes = json.dumps(metadata, indent=2).encode()
+
+    with tarfile.open(filename, 'w:gz') as tar:
+        info = tarfile.TarInfo(_METADATA)
+        info.size = len(metadata_bytes)
+        tar.addfile(info, io.BytesIO(metadata_bytes))
+
+        for repo, ref, path in repos:
+            _add_repo(tar, path, f'repos/{os.path.basename(path)}')
+
+    logger.info(f'Exported {len(repos)} repo(s) to {filename}.')
+
+
+def _read_metadata(tar: tarfile.TarFile, filename: str) -> dict[str, Any]:
+    try:
+        f = tar.extractfile(_METADATA)
+    except KeyError:
+        f = None
+    if f is None:
+        raise FatalError(f'{filename} is not a pre-commit bundle')
+    metadata = json.load(f)
+    if metadata['version'] != _VERSION:
+        raise FatalError(
+            f'{filename} is an unsupported bundle '
+            f'(version {metadata["version"]})',
+        )
+    return metadata
+
+
+def _is_environment(name: str) -> bool:
+    # repos/<dir>/<environment>/...
+    parts = name.split('/')
+    return len(parts) > 2 and any(
+        parts[2].startswith(f'{lang.ENVIRONMENT_DIR}-')
+        for lang in languages.values()
+        if lang.ENVIRONMENT_DIR is not None
+    )
+
+
+def import_bundle(
+        store: Store,
+        config_hash: str,
+        filename: str,
+) -> None:
+    with tarfile.open(filename) as tar:
+        metadata = _read_metadata(tar, filename)
+        if metadata['config'] != config_hash:
+            logger.warning(
+                f'{filename} was exported for a different configuration, '
+                f'anything it is missing will be installed.',
+            )
+        environments = metadata['store'] == store.directory
+        if not environments:
+            logger.warning(
+                f'{filename} was exported from a store at '
+                f'{metadata["store"]} -- its environments cannot be moved '
+                f'and will be installed again.',
+            )
+
+        members: dict[str, list[tarfile.TarInfo]] = {}
+        for member in tar.getmembers():
+            parts = member.name.split('/')
+            if parts[0] == 'repos' and len(parts) > 1:
+                if environments or not _is_environment(member.name):
+                    members.setdefault(parts[1], []).append(member)
+
+        imported = 0
+        for entry in metadata['repos']:
+            repo, ref, name = entry['repo'], entry['ref'], entry['dir']
+            with store.lock('repo', repo, ref), store.connect() as db:
+                if db.execute(
+                        'SELECT 1 FROM repos WHERE repo = ? AND ref = ?',
+                        (repo, ref),
+                ).fetchone():
+                    continue
+
+                directory = os.path.join(store.directory, name)
+                if os.path.lexists(directory):  # pragma: no cover (unlikely)
+                    continue
+
+                tmp = tempfile.mkdtemp(prefix='import', dir=store.directory)
+                with clean_path_on_failure(tmp):
+                    _extract(tar, members.get(name, []), tmp)
+                    os.replace(os.path.join(tmp, 'repos', name), directory)
+                shutil.rmtree(tmp)
+
+                db.execute(
+                    'INSERT INTO repos (repo, ref, path) VALUES (?, ?, ?)',
+                    (repo, ref, directory),
+                )
+                imported += 1
+
+    logger.info(f'Imported {imported} repo(s) from {filename}.')
+
+
+def _extract(
+        tar: tarfile.TarFile,
+        members: list[tarfile.TarInfo],
+        dest: str,
+) -> None:
+    if hasattr(tarfile, 'tar_filter'):
+        # environments symlink to interpreters by absolute path which the
+        # (default in the future) `data` filter refuses
+        tar.extractall(dest, members, filter='tar')
+    else:  # pragma: no cover (python without extraction filters)
+        tar.extractall(dest, members)
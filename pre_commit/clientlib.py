@@ -260,6 +260,8 @@ MANIFEST_HOOK_DICT = cfgv.Map(
     cfgv.Optional('language_version', cfgv.check_string, C.DEFAULT),
     cfgv.Optional('log_file', cfgv.check_string, ''),
     cfgv.Optional('require_serial', cfgv.check_bool, False),
+    cfgv.Optional('read_only', cfgv.check_bool, False),
+    cfgv.Optional('cache', cfgv.check_bool, False),
     StagesMigration('stages', []),
     cfgv.Optional('verbose', cfgv.check_bool, False),
 )
@@ -379,6 +381,7 @@ _meta = (
             ('name', 'Check hooks apply to the repository'),
             ('files', f'^{re.escape(C.CONFIG_FILE)}$'),
             ('entry', _entry('check_hooks_apply')),
+            ('read_only', True),
         ),
     ),
     (
@@ -386,6 +389,7 @@ _meta = (
             ('name', 'Check for useless excludes'),
             ('files', f'^{re.escape(C.CONFIG_FILE)}$'),
             ('entry', _entry('check_useless_excludes')),
+            ('read_only', True),
         ),
     ),
     (
@@ -393,6 +397,7 @@ _meta = (
             ('name', 'identity'),
             ('verbose', True),
             ('entry', _entry('identity')),
+            ('read_only', True),
         ),
     ),
 )
@@ -8,6 +8,7 @@ from pre_commit.util import rmtree
 
 
 def clean(store: Store) -> int:
+    store.close()
     legacy_path = os.path.expanduser('~/.pre-commit')
     for directory in (store.directory, legacy_path):
         if os.path.exists(directory):
@@ -1,35 +1,44 @@
 from __future__ import annotations
 
 import os.path
+import re
 from typing import Any
 
 import pre_commit.constants as C
 from pre_commit import output
+from pre_commit.all_languages import languages
 from pre_commit.clientlib import InvalidConfigError
 from pre_commit.clientlib import InvalidManifestError
-from pre_commit.clientlib import load_config
-from pre_commit.clientlib import load_manifest
 from pre_commit.clientlib import LOCAL
 from pre_commit.clientlib import META
+from pre_commit.repository import deps_prefix
 from pre_commit.store import Store
+from pre_commit.util import cmd_output
 from pre_commit.util import rmtree
 
 
+# `<ENVIRONMENT_DIR>-<language_version>-<env_key>` (see `Prefix.env_key`)
+_ENV_KEY_RE = re.compile('-([0-9a-f]{12})$')
+
+
 def _mark_used_repos(
         store: Store,
         all_repos: dict[tuple[str, str], str],
         unused_repos: set[tuple[str, str]],
+        env_keys: dict[str, set[str]],
         repo: dict[str, Any],
 ) -> None:
     if repo['repo'] == META:
         return
     elif repo['repo'] == LOCAL:
-        for hook in repo['hooks']:
-            deps = hook.get('additional_dependencies')
-            unused_repos.discard((
-                store.db_repo_name(repo['repo'], deps),
-                C.LOCAL_REPO_VERSION,
-            ))
+        key = (LOCAL, C.LOCAL_REPO_VERSION)
+        unused_repos.discard(key)
+        path = all_repos.get(key)
+        if path is not None:
+            env_keys.setdefault(path, set()).update(
+                deps_prefix(path, hook['additional_dependencies']).env_key
+                for hook in repo['hooks']
+            )
     else:
         key = (repo['repo'], repo['rev'])
         path = all_repos.get(key)
@@ -38,24 +47,60 @@ def _mark_used_repos(
             return
 
         try:
-            manifest = load_manifest(os.path.join(path, C.MANIFEST_FILE))
+            manifest = store.load_manifest(os.path.join(path, C.MANIFEST_FILE))
         except InvalidManifestError:
             return
         else:
+            # `additional_dependencies` only vary the environments within
+            # the checkout (older versions cloned once per set of them)
             unused_repos.discard(key)
-            by_id = {hook['id']: hook for hook in manifest}
 
-        for hook in repo['hooks']:
-            if hook['id'] not in by_id:
-                continue
+            by_id = {hook['id']: hook for hook in manifest}
+            used = env_keys.setdefault(path, set())
+            for hook in repo['hooks']:
+                if hook['id'] in by_id:
+                    deps = hook.get(
+                        'additional_dependencies',
+                        by_id[hook['id']]['additional_dependencies'],
+                    )
+                    used.add(deps_prefix(path, deps).env_key)
+
+
+def _remove_unused_environments(path: str, env_keys: set[str]) -> None:
+    """Remove the environments of `additional_dependencies` which are no
+    longer configured for the hooks of the checkout at `path`.
+    """
+    env_dirs = tuple(
+        f'{lang.ENVIRONMENT_DIR}-'
+        for lang in languages.values()
+        if lang.ENVIRONMENT_DIR is not None
+    )
+    for name in os.listdir(path):
+        match = _ENV_KEY_RE.search(name)
+        if (
+                match is not None and
+                match[1] not in env_keys and
+                name.startswith(env_dirs) and
+                os.path.isdir(os.path.join(path, name))
+        ):
+            rmtree(os.path.join(path, name))
+
+
+def _remove_unused_mirrors(store: Store, repos: set[str]) -> None:
+    mirrors = os.path.join(store.directory, 'mirrors')
+    if not os.path.isdir(mirrors):
+        return
 
-            deps = hook.get(
-                'additional_dependencies',
-                by_id[hook['id']]['additional_dependencies'],
-            )
-            unused_repos.discard((
-                store.db_repo_name(repo['repo'], deps), repo['rev'],
-            ))
+    for name in os.listdir(mirrors):
+        mirror = os.path.join(mirrors, name)
+        _, out, _ = cmd_output(
+            'git', 'config', '--get', 'pre-commit.repo',
+            cwd=mirror, check=False,
+        )
+        repo = out.strip()
+        # `repos` are `db_repo_name`s: `repo` or `repo:dep1,dep2`
+        if not any(r == repo or r.startswith(f'{repo}:') for r in repos):
+            rmtree(mirror)
 
 
 def _gc(store: Store) -> int:
@@ -69,26 +114,47 @@ def _gc(store: Store) -> int:
         configs_rows = db.execute('SELECT path FROM configs').fetchall()
         configs = [path for path, in configs_rows]
 
+        env_keys: dict[str, set[str]] = {}
         dead_configs = []
         for config_path in configs:
             try:
-                config = load_config(config_path)
+                config = store.load_config(config_path)
             except InvalidConfigError:
                 dead_configs.append(config_path)
                 continue
             else:
                 for repo in config['repos']:
-                    _mark_used_repos(store, all_repos, unused_repos, repo)
+                    _mark_used_repos(
+                        store, all_repos, unused_repos, env_keys, repo,
+                    )
 
         paths = [(path,) for path in dead_configs]
         db.executemany('DELETE FROM configs WHERE path = ?', paths)
+        db.execute(
+            'DELETE FROM hook_results '
+            'WHERE config NOT IN (SELECT path FROM configs)',
+        )
 
         db.executemany(
             'DELETE FROM repos WHERE repo = ? and ref = ?',
             sorted(unused_repos),
         )
+        db.executemany(
+            'DELETE FROM hook_results WHERE prefix = ?',
+            sorted((all_repos[k],) for k in unused_repos),
+        )
+        # files are identified by inode which may since have been reused
+        db.execute('DELETE FROM file_tags')
         for k in unused_repos:
             rmtree(all_repos[k])
+        for path, used in env_keys.items():
+            _remove_unused_environments(path, used)
+        _remove_unused_mirrors(
+            store, {repo for repo, ref in set(all_repos) - unused_repos},
+        )
+        store.remove_unused_objects()
+        store.clear_load_cache()
+        store.clear_locks()
 
         return len(unused_repos)
 
@@ -110,6 +110,10 @@ def _ns(
         verbose=False,
         show_diff_on_failure=False,
         fail_fast=False,
+        no_cache=False,
+        isolated_worktree=False,
+        shard=None,
+        shard_by_size=False,
     )
 
 
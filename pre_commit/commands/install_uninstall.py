@@ -141,8 +141,25 @@ def install(
     return 0
 
 
-def install_hooks(config_file: str, store: Store) -> int:
-    install_hook_envs(all_hooks(load_config(config_file), store), store)
+def install_hooks(
+        config_file: str,
+        store: Store,
+        *,
+        import_bundle: str | None = None,
+        export_bundle: str | None = None,
+) -> int:
+    if import_bundle is not None or export_bundle is not None:
+        # tarfile is slow to import, only load it when needed
+        from pre_commit import bundle
+        config_hash = bundle.config_hash(config_file)
+    if import_bundle is not None:
+        bundle.import_bundle(store, config_hash, import_bundle)
+
+    hooks = all_hooks(store.load_config(config_file), store)
+    install_hook_envs(hooks, store)
+
+    if export_bundle is not None:
+        bundle.export_bundle(store, hooks, config_hash, export_bundle)
     return 0
 
 
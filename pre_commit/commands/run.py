@@ -1,33 +1,57 @@
 from __future__ import annotations
 
 import argparse
+import bisect
+import concurrent.futures
 import contextlib
 import functools
+import hashlib
+import json
 import logging
 import os
 import re
+import stat
 import subprocess
 import time
 import unicodedata
 from collections.abc import Generator
 from collections.abc import Iterable
+from collections.abc import Mapping
 from collections.abc import MutableMapping
 from collections.abc import Sequence
+from collections.abc import Set
 from typing import Any
+from typing import NamedTuple
 
+import identify.extensions
+import identify.identify
 from identify.identify import tags_from_path
 
+import pre_commit.constants as C
 from pre_commit import color
 from pre_commit import git
+from pre_commit import jobserver
+from pre_commit import lang_base
 from pre_commit import output
+from pre_commit import xargs
 from pre_commit.all_languages import languages
-from pre_commit.clientlib import load_config
+from pre_commit.clientlib import LOCAL
+from pre_commit.clientlib import META
+from pre_commit.envcontext import envcontext
+from pre_commit.envcontext import PatchesT
+from pre_commit.fingerprint import Fingerprint
+from pre_commit.fingerprint import is_racy
+from pre_commit.fingerprint import ModificationDetector
+from pre_commit.fingerprint import stat_key
+from pre_commit.fingerprint import StatKey
 from pre_commit.hook import Hook
 from pre_commit.repository import all_hooks
 from pre_commit.repository import install_hook_envs
+from pre_commit.shard import Shard
+from pre_commit.shard import shard_filenames
+from pre_commit.staged_files_only import isolated_staged_files
 from pre_commit.staged_files_only import staged_files_only
 from pre_commit.store import Store
-from pre_commit.util import cmd_output_b
 
 
 logger = logging.getLogger('pre_commit')
@@ -70,13 +94,151 @@ def filter_by_include_exclude(
     )
 
 
+_SPECIAL = frozenset('.^$*+?{}[]\\|()')
+_QUANTIFIERS = frozenset('*+?{')
+
+
+def _alternates(pattern: str) -> bool:
+    """whether `pattern` has a `|` outside of any group"""
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            i += 1
+        elif c == '[':
+            # skip the class, a leading `]` is part of it
+            i += 1
+            if pattern[i:i + 1] == '^':
+                i += 1
+            if pattern[i:i + 1] == ']':
+                i += 1
+            while i < len(pattern) and pattern[i] != ']':
+                if pattern[i] == '\\':
+                    i += 1
+                i += 1
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == '|' and depth == 0:
+            return True
+        i += 1
+    return False
+
+
+def _literal_prefix(pattern: str) -> str:
+    """the text every match of `pattern` must start with -- only known for
+    patterns anchored at the start, such as `^src/.*\\.py$`
+    """
+    if pattern.startswith('^'):
+        i = 1
+    elif pattern.startswith('\\A'):
+        i = 2
+    else:
+        return ''
+    if _alternates(pattern):
+        return ''
+
+    prefix = []
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\' and not pattern[i + 1:i + 2].isalnum():
+            c = pattern[i + 1:i + 2]
+            width = 2
+        elif c in _SPECIAL:
+            break
+        else:
+            width = 1
+        # the character may be optional or repeated
+        if pattern[i + width:i + width + 1] in _QUANTIFIERS:
+            break
+        prefix.append(c)
+        i += width
+    return ''.join(prefix)
+
+
+def _identify_version() -> str:
+    # (importing `importlib.metadata` for the version is slow)
+    return ':'.join(
+        str(part)
+        for mod in (identify.identify, identify.extensions)
+        if mod.__file__ is not None
+        for part in stat_key(mod.__file__) or ()
+    )
+
+
 class Classifier:
     def __init__(self, filenames: Iterable[str]) -> None:
         self.filenames = [f for f in filenames if os.path.lexists(f)]
-
-    @functools.cache
-    def _types_for_file(self, filename: str) -> set[str]:
-        return tags_from_path(filename)
+        self._tags: dict[str, Set[str]] = {}
+        self._patterns: dict[str, re.Pattern[str]] = {}
+        # pattern => the filenames it matches
+        self._matches: dict[str, Set[str]] = {}
+        # (files, exclude, types, types_or, exclude_types) => filenames
+        self._hook_filenames: dict[tuple[Any, ...], tuple[str, ...]] = {}
+
+    def _types_for_file(self, filename: str) -> Set[str]:
+        try:
+            return self._tags[filename]
+        except KeyError:
+            ret = self._tags[filename] = tags_from_path(filename)
+            return ret
+
+    def classify(self, store: Store) -> None:
+        """Find the tags of all of the files up front: reusing what `store`
+        remembers for the files which did not change and identifying the
+        rest concurrently.
+        """
+        version = _identify_version()
+        # filename => ((st_dev, st_ino), key, racy)
+        files = {}
+        for filename in self.filenames:
+            try:
+                st = os.lstat(filename)
+            except OSError:
+                continue
+            # tags for anything else come from `lstat` alone
+            if stat.S_ISREG(st.st_mode):
+                st_key = StatKey(
+                    st.st_mtime_ns, st.st_size, st.st_ino, st.st_mode,
+                )
+                key = ':'.join((
+                    version,
+                    *(str(part) for part in st_key),
+                    os.path.basename(filename),
+                ))
+                inode = (st.st_dev, st.st_ino)
+                files[filename] = (inode, key, is_racy(st_key))
+
+        remembered = store.select_file_tags(
+            inode for inode, _, _ in files.values()
+        )
+        missing = []
+        for filename, (inode, key, _) in files.items():
+            cached = remembered.get(inode)
+            if cached is not None and cached[0] == key:
+                self._tags[filename] = cached[1]
+            else:
+                missing.append(filename)
+
+        # mostly waiting on opening and reading files
+        jobs = min(len(missing) // 64 + 1, lang_base.target_concurrency())
+        if jobs == 1:
+            tags = list(map(tags_from_path, missing))
+        else:
+            with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+                tags = list(executor.map(tags_from_path, missing))
+
+        new = {}
+        for filename, file_tags in zip(missing, tags):
+            self._tags[filename] = file_tags
+            inode, key, racy = files[filename]
+            # may be modified again without the stat changing
+            if not racy:
+                new[inode] = (key, file_tags)
+        if new:
+            store.mark_file_tags(new)
 
     def by_types(
             self,
@@ -97,17 +259,77 @@ class Classifier:
             ):
                 yield filename
 
-    def filenames_for_hook(self, hook: Hook) -> Generator[str]:
-        return self.by_types(
-            filter_by_include_exclude(
-                self.filenames,
-                hook.files,
-                hook.exclude,
+    def _compile(self, pattern: str) -> re.Pattern[str]:
+        try:
+            return self._patterns[pattern]
+        except KeyError:
+            ret = self._patterns[pattern] = re.compile(pattern)
+            return ret
+
+    @functools.cached_property
+    def _sorted(self) -> list[str]:
+        return sorted(self.filenames)
+
+    @functools.cached_property
+    def _positions(self) -> dict[str, int]:
+        return {filename: i for i, filename in enumerate(self.filenames)}
+
+    def _candidates(self, pattern: str) -> Sequence[str]:
+        """the filenames which could match `pattern` -- for patterns anchored
+        to a directory (or any other literal prefix) only that slice of the
+        sorted filenames is searched
+        """
+        prefix = _literal_prefix(pattern)
+        if not prefix:
+            return self.filenames
+        start = end = bisect.bisect_left(self._sorted, prefix)
+        while end < len(self._sorted) and self._sorted[end].startswith(prefix):
+            end += 1
+        return self._sorted[start:end]
+
+    def _matching(self, pattern: str) -> Set[str]:
+        try:
+            return self._matches[pattern]
+        except KeyError:
+            search = self._compile(pattern).search
+            ret = self._matches[pattern] = frozenset(
+                filter(search, self._candidates(pattern)),
+            )
+            return ret
+
+    def filenames_for_hook(self, hook: Hook) -> tuple[str, ...]:
+        # hooks commonly share their filters (most use the defaults) so each
+        # distinct pattern and combination is only evaluated once per run
+        key = (
+            hook.files,
+            hook.exclude,
+            frozenset(hook.types),
+            frozenset(hook.types_or),
+            frozenset(hook.exclude_types),
+        )
+        try:
+            return self._hook_filenames[key]
+        except KeyError:
+            pass
+
+        names: Iterable[str]
+        # the default `files: ''` matches everything
+        if hook.files:
+            # only visit the (often few) matching files, in their order
+            names = sorted(
+                self._matching(hook.files), key=self._positions.__getitem__,
+            )
+            exclude = self._compile(hook.exclude).search
+            names = [f for f in names if not exclude(f)]
+        else:
+            excluded = self._matching(hook.exclude)
+            names = (f for f in self.filenames if f not in excluded)
+        ret = self._hook_filenames[key] = tuple(
+            self.by_types(
+                names, hook.types, hook.types_or, hook.exclude_types,
             ),
-            hook.types,
-            hook.types_or,
-            hook.exclude_types,
         )
+        return ret
 
     @classmethod
     def from_config(
@@ -133,87 +355,109 @@ def _get_skips(environ: MutableMapping[str, str]) -> set[str]:
 
 SKIPPED = 'Skipped'
 NO_FILES = '(no files to check)'
+CACHED = '(unchanged files)'
 
 
 def _subtle_line(s: str, use_color: bool) -> None:
     output.write_line(color.format_color(s, color.SUBTLE, use_color))
 
 
-def _run_single_hook(
-        classifier: Classifier,
+# these languages never write to the files they are passed
+_READ_ONLY_LANGUAGES = frozenset(('fail', 'pygrep'))
+
+
+def _is_read_only(hook: Hook) -> bool:
+    return hook.read_only or hook.language in _READ_ONLY_LANGUAGES
+
+
+def _will_run(hook: Hook, filenames: Sequence[str], skips: set[str]) -> bool:
+    return (
+        hook.id not in skips and
+        hook.alias not in skips and
+        (bool(filenames) or hook.always_run)
+    )
+
+
+def _fail_fast(
+        config: dict[str, Any],
+        hook: Hook,
+        args: argparse.Namespace,
+) -> bool:
+    return config['fail_fast'] or hook.fail_fast or args.fail_fast
+
+
+def _skip_msg(
         hook: Hook,
+        filenames: Sequence[str],
         skips: set[str],
         cols: int,
-        diff_before: bytes,
-        verbose: bool,
         use_color: bool,
-) -> tuple[bool, bytes]:
-    filenames = tuple(classifier.filenames_for_hook(hook))
-
+) -> str | None:
     if hook.id in skips or hook.alias in skips:
-        output.write(
-            _full_msg(
-                start=hook.name,
-                end_msg=SKIPPED,
-                end_color=color.YELLOW,
-                use_color=use_color,
-                cols=cols,
-            ),
+        return _full_msg(
+            start=hook.name,
+            end_msg=SKIPPED,
+            end_color=color.YELLOW,
+            use_color=use_color,
+            cols=cols,
         )
-        duration = None
-        retcode = 0
-        diff_after = diff_before
-        files_modified = False
-        out = b''
     elif not filenames and not hook.always_run:
-        output.write(
-            _full_msg(
-                start=hook.name,
-                postfix=NO_FILES,
-                end_msg=SKIPPED,
-                end_color=color.TURQUOISE,
-                use_color=use_color,
-                cols=cols,
-            ),
+        return _full_msg(
+            start=hook.name,
+            postfix=NO_FILES,
+            end_msg=SKIPPED,
+            end_color=color.TURQUOISE,
+            use_color=use_color,
+            cols=cols,
         )
-        duration = None
-        retcode = 0
-        diff_after = diff_before
-        files_modified = False
-        out = b''
     else:
-        # print hook and dots first in case the hook takes a while to run
-        output.write(_start_msg(start=hook.name, end_len=6, cols=cols))
-
-        if not hook.pass_filenames:
-            filenames = ()
-        time_before = time.monotonic()
-        language = languages[hook.language]
-        with language.in_env(hook.prefix, hook.language_version):
-            retcode, out = language.run_hook(
-                hook.prefix,
-                hook.entry,
-                hook.args,
-                filenames,
-                is_local=hook.src == 'local',
-                require_serial=hook.require_serial,
-                color=use_color,
-            )
-        duration = round(time.monotonic() - time_before, 2) or 0
-        diff_after = _get_diff()
+        return None
 
-        # if the hook makes changes, fail the commit
-        files_modified = diff_before != diff_after
 
-        if retcode or files_modified:
-            print_color = color.RED
-            status = 'Failed'
-        else:
-            print_color = color.GREEN
-            status = 'Passed'
+def _run_hook(
+        hook: Hook,
+        filenames: Sequence[str],
+        use_color: bool,
+        jobs: int | None = None,
+) -> tuple[int, bytes, float]:
+    if not hook.pass_filenames:
+        filenames = ()
+    time_before = time.monotonic()
+    language = languages[hook.language]
+    with contextlib.ExitStack() as ctx:
+        if jobs is not None:
+            ctx.enter_context(lang_base.hook_concurrency(jobs))
+        ctx.enter_context(language.in_env(hook.prefix, hook.language_version))
+        retcode, out = language.run_hook(
+            hook.prefix,
+            hook.entry,
+            hook.args,
+            filenames,
+            is_local=hook.src == 'local',
+            require_serial=hook.require_serial,
+            color=use_color,
+        )
+    duration = round(time.monotonic() - time_before, 2) or 0
+    return retcode, out, duration
 
-        output.write_line(color.format_color(status, print_color, use_color))
 
+def _status_msg(retcode: int, files_modified: bool, use_color: bool) -> str:
+    if retcode or files_modified:
+        return color.format_color('Failed', color.RED, use_color)
+    else:
+        return color.format_color('Passed', color.GREEN, use_color)
+
+
+def _report_hook(
+        hook: Hook,
+        *,
+        retcode: int,
+        out: bytes,
+        duration: float | None,
+        files_modified: bool,
+        verbose: bool,
+        use_color: bool,
+) -> None:
     if verbose or hook.verbose or retcode or files_modified:
         _subtle_line(f'- hook id: {hook.id}', use_color)
 
@@ -232,7 +476,380 @@ def _run_single_hook(
             output.write_line_b(out.strip(), logfile_name=hook.log_file)
             output.write_line()
 
-    return files_modified or bool(retcode), diff_after
+
+def _footprint(
+        hook: Hook,
+        filenames: Sequence[str],
+) -> Sequence[str] | None:
+    """The files a hook may look at (and a fixer may modify) -- `None` for
+    hooks which are not passed files and so may touch any file.
+    """
+    if hook.pass_filenames and filenames:
+        return filenames
+    else:
+        return None
+
+
+def _snapshot(
+        detector: ModificationDetector,
+        hook: Hook,
+        filenames: Sequence[str],
+) -> Mapping[str, Fingerprint | None] | bytes:
+    footprint = _footprint(hook, filenames)
+    if footprint is None:
+        return detector.snapshot_diff()
+    else:
+        return detector.snapshot(footprint)
+
+
+def _files_modified(
+        detector: ModificationDetector,
+        before: Mapping[str, Fingerprint | None] | bytes,
+) -> bool:
+    if isinstance(before, bytes):
+        return detector.diff_modified(before)
+    modified = detector.modified(before)
+    # like `git diff`, only modifications to tracked files count
+    return bool(modified) and bool(git.get_tracked_files(modified))
+
+
+class _PassCache(NamedTuple):
+    store: Store
+    # the (real) path of the configuration the hooks come from
+    config: str
+    # see `_configs_digest`
+    configs: str
+
+
+# files which are assumed to configure the tools hooks run, anywhere in the
+# repository: dotfiles (`.flake8`, `.eslintrc.json`, ...), `setup.cfg`,
+# `mypy.ini`, `pyproject.toml`, `eslint.config.mjs`, `package.json`, ...
+_CONFIG_EXTENSIONS = frozenset(('.cfg', '.ini', '.toml'))
+_CONFIG_NAME_RE = re.compile(
+    r'.+\.config\.[^.]+|(package|tsconfig.*)\.json',
+)
+# and at the root of the repository (`renovate.json`, `environment.yml`, ...)
+_ROOT_CONFIG_EXTENSIONS = frozenset(('.json', '.yaml', '.yml'))
+
+
+def _is_config(filename: str) -> bool:
+    dirname, basename = os.path.split(filename)
+    _, ext = os.path.splitext(basename)
+    return (
+        basename.startswith('.') or
+        ext in _CONFIG_EXTENSIONS or
+        (not dirname and ext in _ROOT_CONFIG_EXTENSIONS) or
+        _CONFIG_NAME_RE.fullmatch(basename) is not None
+    )
+
+
+def _configs_digest(detector: ModificationDetector) -> str:
+    # untracked files at the root are often configuration too
+    filenames = {*git.get_all_files(), *os.listdir('.')}
+    h = hashlib.sha256()
+    for filename in sorted(filter(_is_config, filenames)):
+        contents = detector.contents(filename)
+        if contents is not None and stat.S_ISREG(contents.mode):
+            h.update(f'{filename}\0{contents.digest.hex()}\0'.encode())
+    return h.hexdigest()
+
+
+def _cache_key(hook: Hook, config: str) -> str | None:
+    # the hook opts in when its result only depends on the (pinned) hook, the
+    # configuration of its tool and the contents of each file passed
+    if (
+            not hook.cache or
+            not hook.pass_filenames or
+            hook.always_run or
+            # sees all of its files at once: may depend on how they relate
+            hook.require_serial or
+            (
+                hook.src in {LOCAL, META} and
+                hook.language not in _READ_ONLY_LANGUAGES
+            )
+    ):
+        return None
+    parts = (
+        C.VERSION,
+        config,
+        hook.prefix.prefix_dir,
+        hook.language,
+        hook.language_version,
+        list(hook.additional_dependencies),
+        hook.entry,
+        list(hook.args),
+    )
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+
+def _cache_digests(
+        detector: ModificationDetector,
+        filenames: Iterable[str],
+) -> dict[str, str]:
+    return {
+        filename: f'{contents.mode:o}:{contents.digest.hex()}'
+        for filename in filenames
+        for contents in (detector.contents(filename),)
+        if contents is not None
+    }
+
+
+def _cached_passes(
+        cache: _PassCache | None,
+        hook: Hook,
+        detector: ModificationDetector,
+        filenames: Sequence[str],
+) -> set[str]:
+    if cache is None:
+        return set()
+    key = _cache_key(hook, cache.config)
+    if key is None:
+        return set()
+    else:
+        digests = _cache_digests(detector, filenames)
+        return cache.store.select_passed_files(key, cache.configs, digests)
+
+
+def _record_passes(
+        cache: _PassCache | None,
+        hook: Hook,
+        detector: ModificationDetector,
+        filenames: Sequence[str],
+) -> None:
+    if cache is None:
+        return
+    key = _cache_key(hook, cache.config)
+    if key is not None:
+        digests = _cache_digests(detector, filenames)
+        cache.store.mark_files_passed(
+            key, cache.configs, hook.prefix.prefix_dir, cache.config, digests,
+        )
+
+
+def _pass_cache(
+        store: Store,
+        config_file: str,
+        config_hooks: Sequence[Hook],
+        detector: ModificationDetector,
+) -> _PassCache | None:
+    config = os.path.realpath(config_file)
+    keys = {
+        key
+        for hook in config_hooks
+        for key in (_cache_key(hook, config),)
+        if key is not None
+    }
+    # forget the results of the hooks since removed (or changed)
+    store.prune_hook_results(config, keys)
+    if keys:
+        return _PassCache(store, config, _configs_digest(detector))
+    else:
+        return None
+
+
+def _cached_msg(hook: Hook, cols: int, use_color: bool) -> str:
+    return _full_msg(
+        start=hook.name,
+        postfix=CACHED,
+        end_msg='Passed',
+        end_color=color.GREEN,
+        use_color=use_color,
+        cols=cols,
+    )
+
+
+def _run_single_hook(
+        hook: Hook,
+        filenames: Sequence[str],
+        skips: set[str],
+        cols: int,
+        detector: ModificationDetector,
+        cache: _PassCache | None,
+        verbose: bool,
+        use_color: bool,
+) -> bool:
+    skip_msg = _skip_msg(hook, filenames, skips, cols, use_color)
+    if skip_msg is not None:
+        output.write(skip_msg)
+        duration = None
+        retcode = 0
+        files_modified = False
+        out = b''
+    else:
+        before = _snapshot(detector, hook, filenames)
+        cached = _cached_passes(cache, hook, detector, filenames)
+        to_run = tuple(f for f in filenames if f not in cached)
+
+        if cached and not to_run:
+            output.write(_cached_msg(hook, cols, use_color))
+            duration = None
+            retcode = 0
+            files_modified = False
+            out = b''
+        else:
+            # print hook and dots first in case the hook takes a while to run
+            output.write(_start_msg(start=hook.name, end_len=6, cols=cols))
+
+            retcode, out, duration = _run_hook(hook, to_run, use_color)
+
+            # if the hook makes changes, fail the commit
+            files_modified = _files_modified(detector, before)
+            if not retcode and not files_modified:
+                _record_passes(cache, hook, detector, to_run)
+
+            output.write_line(_status_msg(retcode, files_modified, use_color))
+
+    _report_hook(
+        hook,
+        retcode=retcode,
+        out=out,
+        duration=duration,
+        files_modified=files_modified,
+        verbose=verbose,
+        use_color=use_color,
+    )
+    return files_modified or bool(retcode)
+
+
+def _run_hook_batch(
+        pool: concurrent.futures.Executor,
+        batch: Sequence[tuple[Hook, tuple[str, ...]]],
+        skips: set[str],
+        cols: int,
+        detector: ModificationDetector,
+        cache: _PassCache | None,
+        verbose: bool,
+        use_color: bool,
+) -> list[bool]:
+    skip_msgs = [
+        _skip_msg(hook, filenames, skips, cols, use_color)
+        for hook, filenames in batch
+    ]
+    befores = [
+        _snapshot(detector, hook, filenames)
+        if _will_run(hook, filenames, skips) else
+        None
+        for hook, filenames in batch
+    ]
+    cacheds = [
+        set() if before is None else
+        _cached_passes(cache, hook, detector, filenames)
+        for (hook, filenames), before in zip(batch, befores)
+    ]
+    to_runs = [
+        tuple(f for f in filenames if f not in cached)
+        for (_, filenames), cached in zip(batch, cacheds)
+    ]
+    will_run = [
+        before is not None and (bool(to_run) or not cached)
+        for before, cached, to_run in zip(befores, cacheds, to_runs)
+    ]
+    # split the concurrency between the hooks rather than each hook running
+    # as many processes as there are cpus
+    jobs = max(1, lang_base.target_concurrency() // max(1, sum(will_run)))
+    futures = [
+        pool.submit(_run_hook, hook, to_run, use_color, jobs)
+        if run else
+        None
+        for (hook, _), run, to_run in zip(batch, will_run, to_runs)
+    ]
+
+    ret = []
+    for (hook, _), skip_msg, before, to_run, future in zip(
+            batch, skip_msgs, befores, to_runs, futures,
+    ):
+        if before is None:
+            assert skip_msg is not None
+            output.write(skip_msg)
+            retcode, out, duration = 0, b'', None
+            files_modified = False
+        elif future is None:
+            output.write(_cached_msg(hook, cols, use_color))
+            retcode, out, duration = 0, b'', None
+            files_modified = False
+        else:
+            retcode, out, duration = future.result()
+            files_modified = _files_modified(detector, before)
+            if not retcode and not files_modified:
+                _record_passes(cache, hook, detector, to_run)
+            output.write(_start_msg(start=hook.name, end_len=6, cols=cols))
+            status = _status_msg(retcode, files_modified, use_color)
+            output.write_line(status)
+
+        _report_hook(
+            hook,
+            retcode=retcode,
+            out=out,
+            duration=duration,
+            files_modified=files_modified,
+            verbose=verbose,
+            use_color=use_color,
+        )
+        ret.append(files_modified or bool(retcode))
+    return ret
+
+
+def _can_run_together(
+        hook: Hook,
+        footprint: frozenset[str] | None,
+        other: Hook,
+        other_footprint: frozenset[str] | None,
+) -> bool:
+    if _is_read_only(hook) and _is_read_only(other):
+        return True
+    elif footprint is None or other_footprint is None:
+        return False
+    else:
+        return footprint.isdisjoint(other_footprint)
+
+
+def _schedule(
+        hooks: Sequence[tuple[Hook, tuple[str, ...]]],
+        skips: set[str],
+        *,
+        jobs: int,
+        fail_fast: bool,
+) -> list[list[tuple[Hook, tuple[str, ...]]]]:
+    """Split hooks into batches, preserving config order, such that hooks
+    within a batch can run concurrently without observing each other's
+    modifications.
+    """
+    batches: list[list[tuple[Hook, tuple[str, ...]]]] = []
+    batch: list[tuple[Hook, tuple[str, ...]]] = []
+    running: list[tuple[Hook, frozenset[str] | None]] = []
+    for hook, filenames in hooks:
+        will_run = _will_run(hook, filenames, skips)
+        files = _footprint(hook, filenames)
+        footprint = None if files is None else frozenset(files)
+        if (
+                batch and
+                will_run and
+                (
+                    jobs == 1 or
+                    fail_fast or
+                    not all(
+                        _can_run_together(
+                            hook, footprint, other, other_footprint,
+                        )
+                        for other, other_footprint in running
+                    )
+                )
+        ):
+            batches.append(batch)
+            batch, running = [], []
+
+        batch.append((hook, filenames))
+        if will_run:
+            running.append((hook, footprint))
+
+        # a fail fast hook must finish before anything after it starts
+        if hook.fail_fast and will_run:
+            batches.append(batch)
+            batch, running = [], []
+
+    if batch:
+        batches.append(batch)
+    return batches
 
 
 def _compute_cols(hooks: Sequence[Hook]) -> int:
@@ -250,7 +867,10 @@ def _compute_cols(hooks: Sequence[Hook]) -> int:
     return max(cols, 80)
 
 
-def _all_filenames(args: argparse.Namespace) -> Iterable[str]:
+def _all_filenames(
+        args: argparse.Namespace,
+        status: git.Status | None = None,
+) -> Iterable[str]:
     # these hooks do not operate on files
     if args.hook_stage in {
         'post-checkout', 'post-commit', 'post-merge', 'post-rewrite',
@@ -267,16 +887,70 @@ def _all_filenames(args: argparse.Namespace) -> Iterable[str]:
         return git.get_all_files()
     elif git.is_in_merge_conflict():
         return git.get_conflicted_files()
+    elif status is not None:
+        return status.staged
     else:
         return git.get_staged_files()
 
 
-def _get_diff() -> bytes:
-    _, out, _ = cmd_output_b(
-        'git', 'diff', '--no-ext-diff', '--no-textconv', '--ignore-submodules',
-        check=False,
-    )
-    return out
+def _shard_hooks(
+        hooks_filenames: Sequence[tuple[Hook, tuple[str, ...]]],
+        all_filenames: Sequence[str],
+        shard: Shard,
+        *,
+        by_size: bool,
+) -> list[tuple[Hook, tuple[str, ...]]]:
+    mine = shard_filenames(shard, all_filenames, by_size=by_size)
+    ret = []
+    for hook, filenames in hooks_filenames:
+        if hook.always_run or not hook.pass_filenames:
+            # these see every file, so they only run on one shard
+            if not shard.designated:
+                continue
+        else:
+            filenames = tuple(f for f in filenames if f in mine)
+        ret.append((hook, filenames))
+    return ret
+
+
+# a long lived process (see `pre_commit.daemon`) reuses the resolved hooks
+# until the configuration or the environment they were resolved in changes
+_hooks_cache: dict[
+    tuple[str, str, StatKey | None, tuple[tuple[str, str], ...]],
+    tuple[dict[str, Any], tuple[Hook, ...]],
+] = {}
+# the environment variables which affect which hooks / environments are used
+# (`PRE_COMMIT_*` are always included)
+_HOOKS_ENV = frozenset((
+    'PATH', 'SKIP', 'VIRTUAL_ENV', 'CONDA_PREFIX', 'R_HOME', 'XDG_CACHE_HOME',
+))
+
+
+def _hooks_env() -> tuple[tuple[str, str], ...]:
+    return tuple(sorted(
+        (k, v) for k, v in os.environ.items()
+        if k in _HOOKS_ENV or k.startswith('PRE_COMMIT_')
+    ))
+
+
+def _load_hooks(
+        config_file: str,
+        store: Store,
+) -> tuple[dict[str, Any], tuple[Hook, ...]]:
+    st = stat_key(config_file)
+    key = (os.path.realpath(config_file), store.directory, st, _hooks_env())
+    cached = _hooks_cache.get(key)
+    # `pre-commit clean` / `gc` may have removed the repositories
+    if cached is not None and all(
+            os.path.isdir(hook.prefix.prefix_dir) for hook in cached[1]
+    ):
+        return cached
+
+    config = store.load_config(config_file)
+    ret = (config, all_hooks(config, store))
+    if st is not None and not is_racy(st):
+        _hooks_cache[key] = ret
+    return ret
 
 
 def _run_hooks(
@@ -284,24 +958,81 @@ def _run_hooks(
         hooks: Sequence[Hook],
         skips: set[str],
         args: argparse.Namespace,
+        store: Store,
+        status: git.Status | None = None,
+        *,
+        config_file: str = C.CONFIG_FILE,
+        config_hooks: Sequence[Hook] = (),
 ) -> int:
     """Actually run the hooks."""
     cols = _compute_cols(hooks)
     classifier = Classifier.from_config(
-        _all_filenames(args), config['files'], config['exclude'],
+        _all_filenames(args, status), config['files'], config['exclude'],
+    )
+    classifier.classify(store)
+    hooks_filenames = [
+        (hook, classifier.filenames_for_hook(hook)) for hook in hooks
+    ]
+    if args.shard is not None:
+        hooks_filenames = _shard_hooks(
+            hooks_filenames, classifier.filenames,
+            args.shard, by_size=args.shard_by_size,
+        )
+    batches = _schedule(
+        hooks_filenames,
+        skips,
+        jobs=lang_base.target_concurrency(),
+        fail_fast=config['fail_fast'] or args.fail_fast,
     )
+    detector = ModificationDetector()
+    cache: _PassCache | None
+    if args.no_cache or not any(hook.cache for hook in hooks):
+        cache = None
+    else:
+        cache = _pass_cache(store, config_file, config_hooks, detector)
     retval = 0
-    prior_diff = _get_diff()
-    for hook in hooks:
-        current_retval, prior_diff = _run_single_hook(
-            classifier, hook, skips, cols, prior_diff,
-            verbose=args.verbose, use_color=args.color,
+    with contextlib.ExitStack() as ctx:
+        jobserver_auth = ctx.enter_context(
+            jobserver.jobserver(lang_base.target_concurrency()),
         )
-        retval |= current_retval
-        fail_fast = (config['fail_fast'] or hook.fail_fast or args.fail_fast)
-        if current_retval and fail_fast:
-            break
-    if retval and args.show_diff_on_failure and prior_diff:
+        pool: concurrent.futures.Executor | None = None
+        for batch in batches:
+            if sum(_will_run(h, fnames, skips) for h, fnames in batch) > 1:
+                if pool is None:
+                    pool = ctx.enter_context(
+                        xargs.process_pool(
+                            lang_base.target_concurrency(),
+                            initializer=functools.partial(
+                                jobserver.worker, jobserver_auth,
+                            ),
+                        ),
+                    )
+                batch_retvals = _run_hook_batch(
+                    pool, batch, skips, cols, detector, cache,
+                    verbose=args.verbose, use_color=args.color,
+                )
+            else:
+                batch_retvals = []
+                for hook, filenames in batch:
+                    current_retval = _run_single_hook(
+                        hook, filenames, skips, cols, detector, cache,
+                        verbose=args.verbose, use_color=args.color,
+                    )
+                    batch_retvals.append(current_retval)
+                    if current_retval and _fail_fast(config, hook, args):
+                        break
+
+            retval |= any(batch_retvals)
+            if any(
+                    current_retval and _fail_fast(config, hook, args)
+                    for (hook, _), current_retval in zip(batch, batch_retvals)
+            ):
+                break
+    if (
+            retval and
+            args.show_diff_on_failure and
+            git.has_diff('--no-textconv', '--ignore-submodules')
+    ):
         if args.all_files:
             output.write_line(
                 'pre-commit hook(s) made changes.\n'
@@ -322,17 +1053,16 @@ def _run_hooks(
     return retval
 
 
-def _has_unmerged_paths() -> bool:
-    _, stdout, _ = cmd_output_b('git', 'ls-files', '--unmerged')
-    return bool(stdout.strip())
+def _has_unmerged_paths(status: git.Status) -> bool:
+    return bool(status.unmerged)
 
 
-def _has_unstaged_config(config_file: str) -> bool:
-    retcode, _, _ = cmd_output_b(
-        'git', 'diff', '--quiet', '--no-ext-diff', config_file, check=False,
-    )
-    # be explicit, other git errors don't mean it has an unstaged config.
-    return retcode == 1
+def _has_unstaged_config(config_file: str, status: git.Status) -> bool:
+    try:
+        filename = os.path.relpath(config_file).replace(os.sep, '/')
+    except ValueError:  # pragma: no cover (windows: on another drive)
+        return False
+    return filename in status.unstaged or filename in status.intent_to_add
 
 
 def run(
@@ -342,15 +1072,17 @@ def run(
         environ: MutableMapping[str, str] = os.environ,
 ) -> int:
     stash = not args.all_files and not args.files
+    # one look at the working directory answers everything below
+    status = git.status() if stash else None
 
     # Check if we have unresolved merge conflict files and fail fast.
-    if stash and _has_unmerged_paths():
+    if status is not None and _has_unmerged_paths(status):
         logger.error('Unmerged files.  Resolve before committing.')
         return 1
     if bool(args.from_ref) != bool(args.to_ref):
         logger.error('Specify both --from-ref and --to-ref.')
         return 1
-    if stash and _has_unstaged_config(config_file):
+    if status is not None and _has_unstaged_config(config_file, status):
         logger.error(
             f'Your pre-commit configuration is unstaged.\n'
             f'`git add {config_file}` to fix this.',
@@ -416,14 +1148,26 @@ def run(
     # Set pre_commit flag
     environ['PRE_COMMIT'] = '1'
 
+    isolated = (
+        args.isolated_worktree or
+        bool(environ.get('PRE_COMMIT_ISOLATED_WORKTREE'))
+    )
     with contextlib.ExitStack() as exit_stack:
-        if stash:
-            exit_stack.enter_context(staged_files_only(store.directory))
+        # the environment git needs to see the copy of the index
+        hooks_env: PatchesT = ()
+        if status is not None and isolated:
+            # the config is the same in the copy, keep its path stable
+            config_file = os.path.abspath(config_file)
+            hooks_env = exit_stack.enter_context(isolated_staged_files(status))
+        elif status is not None:
+            exit_stack.enter_context(
+                staged_files_only(store.directory, status),
+            )
 
-        config = load_config(config_file)
+        config, config_hooks = _load_hooks(config_file, store)
         hooks = [
             hook
-            for hook in all_hooks(config, store)
+            for hook in config_hooks
             if not args.hook or hook.id == args.hook or hook.alias == args.hook
             if args.hook_stage in hook.stages
         ]
@@ -442,7 +1186,11 @@ def run(
         ]
         install_hook_envs(to_install, store)
 
-        return _run_hooks(config, hooks, skips, args)
+        with envcontext(hooks_env):
+            return _run_hooks(
+                config, hooks, skips, args, store, status,
+                config_file=config_file, config_hooks=config_hooks,
+            )
 
     # https://github.com/python/mypy/issues/7726
     raise AssertionError('unreachable')
@@ -0,0 +1,251 @@
+"""An optional, long lived pre-commit process per repository.
+
+With `PRE_COMMIT_DAEMON=1`, `python -mpre_commit hook-impl ...` (as invoked
+by the installed git hooks) forwards its arguments, environment and standard
+streams over a unix socket to a server which has already imported pre-commit
+and loaded the configuration.  The server forks a child for each request so
+hooks run exactly as they would in-process.  The server is started lazily by
+the first hook which cannot reach one and exits after being idle for a while.
+
+This module is imported before the rest of pre-commit -- keep its imports
+light.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+from collections.abc import Sequence
+from typing import Any
+
+_IDLE_TIMEOUT = 15 * 60
+_HEADER = struct.Struct('!Q')
+_RETCODE = struct.Struct('!i')
+
+
+def _store_directory() -> str:
+    # same as `store._get_default_directory` without importing sqlite, etc.
+    ret = os.environ.get('PRE_COMMIT_HOME') or os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+        'pre-commit',
+    )
+    return os.path.realpath(ret)
+
+
+def socket_path(cwd: str) -> str:
+    # a new pre-commit (or python) gets a new server
+    here = os.path.dirname(os.path.abspath(__file__))
+    version = os.stat(os.path.join(here, '__init__.py')).st_mtime_ns
+    key = f'{os.path.realpath(cwd)}\0{sys.executable}\0{here}\0{version}'
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return os.path.join(_store_directory(), f'daemon-{digest}.sock')
+
+
+def _recv_exactly(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise EOFError
+        buf += chunk
+    return bytes(buf)
+
+
+def _spawn(path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    subprocess.Popen(
+        (sys.executable, '-mpre_commit.daemon', path),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def forward(path: str, argv: Sequence[str]) -> int | None:
+    """Run `pre-commit *argv` in the server, returning its exit code -- or
+    `None` (after starting a server for next time) if there is no server.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            _spawn(path)
+            return None
+
+        request = {
+            'argv': list(argv), 'cwd': os.getcwd(), 'env': {**os.environ},
+        }
+        payload = json.dumps(request).encode()
+        socket.send_fds(sock, [_HEADER.pack(len(payload))], [0, 1, 2])
+        sock.sendall(payload)
+        try:
+            retcode, = _RETCODE.unpack(_recv_exactly(sock, _RETCODE.size))
+        except EOFError:
+            print('pre-commit daemon exited unexpectedly', file=sys.stderr)
+            return 1
+        except KeyboardInterrupt:  # the server's child is interrupted too
+            return 130
+        else:
+            return retcode
+
+
+def maybe_forward(argv: Sequence[str]) -> int | None:
+    if (
+            sys.platform == 'win32' or
+            not os.environ.get('PRE_COMMIT_DAEMON') or
+            not argv or argv[0] != 'hook-impl'
+    ):
+        return None
+    else:  # pragma: win32 no cover
+        return forward(socket_path(os.getcwd()), argv)
+
+
+def _warm(request: dict[str, Any]) -> None:
+    """load the configuration in the server, where the children inherit it"""
+    from pre_commit.commands.run import _load_hooks
+    from pre_commit.store import Store
+
+    config_file = next(
+        (
+            arg[len('--config='):]
+            for arg in request['argv'] if arg.startswith('--config=')
+        ),
+        None,
+    )
+    if config_file is None:
+        return
+
+    orig_env, orig_cwd = {**os.environ}, os.getcwd()
+    os.environ.clear()
+    os.environ.update(request['env'])
+    try:
+        os.chdir(request['cwd'])
+        _load_hooks(config_file, Store(_store_directory()))
+    except Exception:
+        pass  # the child will report any problems
+    finally:
+        os.environ.clear()
+        os.environ.update(orig_env)
+        os.chdir(orig_cwd)
+
+
+def _interrupt_on_disconnect(  # pragma: no cover (daemon)
+        conn: socket.socket,
+) -> None:
+    # ^C only reaches the client, which then closes the connection: pass it
+    # on to the whole process group (the hooks) like the terminal would
+    try:
+        conn.recv(1)
+    except OSError:
+        pass
+    os.killpg(0, signal.SIGINT)
+
+
+def _child(  # pragma: no cover (daemon)
+        conn: socket.socket,
+        fds: Sequence[int],
+        request: dict[str, Any],
+) -> None:
+    from pre_commit.main import main
+
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    # a process group of its own for the hook processes (see above)
+    os.setpgid(0, 0)
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+
+    threading.Thread(
+        target=_interrupt_on_disconnect, args=(conn,), daemon=True,
+    ).start()
+
+    try:
+        retcode = main(request['argv'])
+    except SystemExit as e:
+        retcode = e.code if isinstance(e.code, int) else 1
+    except KeyboardInterrupt:
+        retcode = 130
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+    try:
+        conn.sendall(_RETCODE.pack(retcode))
+    except OSError:
+        pass
+
+
+def _bind(path: str) -> socket.socket:  # pragma: no cover (daemon)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    tmp = f'{path}.{os.getpid()}'
+    sock.bind(tmp)
+    os.chmod(tmp, 0o600)
+    os.replace(tmp, path)
+    sock.listen()
+    return sock
+
+
+def serve(  # pragma: no cover (daemon)
+        path: str,
+        idle_timeout: float = _IDLE_TIMEOUT,
+) -> int:
+    import pre_commit.main  # noqa: F401  (import everything up front)
+
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # reap children
+    with _bind(path) as sock:
+        inode = os.stat(path).st_ino
+        sock.settimeout(idle_timeout)
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except TimeoutError:
+                break
+
+            with conn:
+                conn.settimeout(None)
+                try:
+                    msg, fds, _, _ = socket.recv_fds(conn, _HEADER.size, 3)
+                    msg += _recv_exactly(conn, _HEADER.size - len(msg))
+                    size, = _HEADER.unpack(msg)
+                    request = json.loads(_recv_exactly(conn, size))
+                except (OSError, EOFError, ValueError):
+                    continue
+                if len(fds) != 3:
+                    for fd in fds:
+                        os.close(fd)
+                    continue
+
+                _warm(request)
+                sys.stdout.flush()
+                sys.stderr.flush()
+                if os.fork() == 0:
+                    sock.close()
+                    try:
+                        _child(conn, fds, request)
+                    finally:
+                        os._exit(0)
+                for fd in fds:
+                    os.close(fd)
+
+    # a newer server may have replaced us
+    try:
+        if os.stat(path).st_ino == inode:
+            os.remove(path)
+    except OSError:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(serve(sys.argv[1]))
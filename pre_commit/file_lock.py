@@ -16,10 +16,12 @@ if sys.platform == 'win32':  # pragma: no cover (windows)
     # byte region so we'll just pick *some* number here.
     _region = 0xffff
 
+    # there are no shared locks here, so those are exclusive too
     @contextlib.contextmanager
     def _locked(
             fileno: int,
             blocked_cb: Callable[[], None],
+            shared: bool,
     ) -> Generator[None]:
         try:
             msvcrt.locking(fileno, msvcrt.LK_NBLCK, _region)
@@ -53,12 +55,14 @@ else:  # pragma: win32 no cover
     def _locked(
             fileno: int,
             blocked_cb: Callable[[], None],
+            shared: bool,
     ) -> Generator[None]:
+        operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
         try:
-            fcntl.flock(fileno, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(fileno, operation | fcntl.LOCK_NB)
         except OSError:  # pragma: no cover (tests are single-threaded)
             blocked_cb()
-            fcntl.flock(fileno, fcntl.LOCK_EX)
+            fcntl.flock(fileno, operation)
         try:
             yield
         finally:
@@ -69,7 +73,9 @@ else:  # pragma: win32 no cover
 def lock(
         path: str,
         blocked_cb: Callable[[], None],
+        *,
+        shared: bool = False,
 ) -> Generator[None]:
     with open(path, 'a+') as f:
-        with _locked(f.fileno(), blocked_cb):
+        with _locked(f.fileno(), blocked_cb, shared):
             yield
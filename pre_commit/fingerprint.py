@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import stat
+import time
+from collections.abc import Iterable
+from collections.abc import Mapping
+from typing import NamedTuple
+
+from pre_commit.git import zsplit
+from pre_commit.util import cmd_output_b
+from pre_commit.xargs import xargs
+
+# file timestamps are only so precise -- a file modified within this window of
+# being fingerprinted may be modified again without its mtime changing
+_RACY_NS = 2 * 10 ** 9
+
+
+class StatKey(NamedTuple):
+    mtime_ns: int
+    size: int
+    ino: int
+    mode: int
+
+
+class Contents(NamedTuple):
+    mode: int
+    digest: bytes
+
+
+def stat_key(filename: str) -> StatKey | None:
+    try:
+        st = os.lstat(filename)
+    except OSError:
+        return None
+    else:
+        return StatKey(st.st_mtime_ns, st.st_size, st.st_ino, st.st_mode)
+
+
+def is_racy(key: StatKey) -> bool:
+    return time.time_ns() - key.mtime_ns < _RACY_NS
+
+
+def file_digest(filename: str, mode: int) -> bytes:
+    h = hashlib.sha256()
+    if stat.S_ISLNK(mode):
+        h.update(os.fsencode(os.readlink(filename)))
+    elif stat.S_ISREG(mode):
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(2 ** 16), b''):
+                h.update(chunk)
+    return h.digest()
+
+
+class _Entry(NamedTuple):
+    key: StatKey
+    contents: Contents
+    racy: bool
+
+
+class Fingerprint(NamedTuple):
+    key: StatKey
+    # only taken when the stat cannot be trusted or the file differs from the
+    # index -- otherwise the index records the contents
+    contents: Contents | None
+
+
+def _diff(*args: str) -> bytes:
+    _, out, _ = cmd_output_b(
+        'git', 'diff', '--no-ext-diff', '--no-textconv', '--ignore-submodules',
+        *args,
+        check=False,
+    )
+    return out
+
+
+class ModificationDetector:
+    """Detect modifications to files without asking git for a full diff.
+
+    Files are compared by `(mtime_ns, size, inode, mode)`.  Files are only
+    read when that key changes: compared with their digest if they differed
+    from the index (or were too recently written to trust their stat) and
+    otherwise with the index itself.  A file rewritten with identical
+    contents is not a modification.
+    """
+
+    def __init__(self) -> None:
+        self._cache: dict[str, _Entry] = {}
+        # files which differ from the index
+        self._dirty: set[str] | None = None
+
+    def _dirty_files(self) -> set[str]:
+        if self._dirty is None:
+            self._dirty = set(zsplit(_diff('--name-only', '-z').decode()))
+        return self._dirty
+
+    def contents(self, filename: str) -> Contents | None:
+        key = stat_key(filename)
+        if key is None:
+            return None
+
+        cached = self._cache.get(filename)
+        if cached is not None and cached.key == key and not cached.racy:
+            return cached.contents
+
+        contents = Contents(key.mode, file_digest(filename, key.mode))
+        self._cache[filename] = _Entry(key, contents, is_racy(key))
+        return contents
+
+    def snapshot(
+            self,
+            filenames: Iterable[str],
+    ) -> dict[str, Fingerprint | None]:
+        dirty = self._dirty_files()
+        ret: dict[str, Fingerprint | None] = {}
+        for filename in filenames:
+            key = stat_key(filename)
+            if key is None:
+                ret[filename] = None
+            elif is_racy(key) or filename in dirty:
+                ret[filename] = Fingerprint(key, self.contents(filename))
+            else:
+                ret[filename] = Fingerprint(key, None)
+        return ret
+
+    def modified(
+            self,
+            snapshot: Mapping[str, Fingerprint | None],
+    ) -> list[str]:
+        ret = []
+        # files which matched the index, but were touched
+        touched = []
+        for filename, before in snapshot.items():
+            key = stat_key(filename)
+            if before is None or key is None:
+                if before is not None or key is not None:
+                    ret.append(filename)
+            elif key == before.key and not is_racy(before.key):
+                continue
+            elif before.contents is not None:
+                if self.contents(filename) != before.contents:
+                    ret.append(filename)
+            else:
+                touched.append(filename)
+
+        if touched:
+            cmd = ('git', 'diff', '--name-only', '-z', '--no-ext-diff', '--')
+            _, out = xargs(cmd, touched)
+            differ = set(zsplit(out.decode()))
+            ret.extend(filename for filename in touched if filename in differ)
+
+        self._dirty_files().update(ret)
+        return ret
+
+    def snapshot_diff(self) -> bytes:
+        """For hooks which may modify any file."""
+        return _diff()
+
+    def diff_modified(self, before: bytes) -> bool:
+        if _diff() == before:
+            return False
+        else:
+            # any file may have been modified
+            self._dirty = None
+            return True
@@ -4,11 +4,14 @@ import logging
 import os.path
 import sys
 from collections.abc import Mapping
+from collections.abc import Sequence
+from typing import NamedTuple
 
 from pre_commit.errors import FatalError
 from pre_commit.util import CalledProcessError
 from pre_commit.util import cmd_output
 from pre_commit.util import cmd_output_b
+from pre_commit.xargs import xargs
 
 logger = logging.getLogger(__name__)
 
@@ -151,10 +154,55 @@ def intent_to_add_files() -> list[str]:
     return zsplit(stdout)
 
 
+class Status(NamedTuple):
+    # everything but deletions (as `get_staged_files`)
+    staged: list[str]
+    # changed in the working directory (besides submodules / intent-to-add)
+    unstaged: list[str]
+    intent_to_add: list[str]
+    unmerged: list[str]
+
+
+def status() -> Status:
+    """Inspect the index and the working directory in a single pass -- which
+    git speeds up with `core.fsmonitor` when the repository enables it.
+    """
+    _, out, _ = cmd_output(
+        'git', '--no-optional-locks', 'status', '--porcelain=v2', '-z',
+        '--untracked-files=no', '--ignore-submodules=dirty',
+    )
+    ret = Status([], [], [], [])
+    entries = iter(zsplit(out))
+    for entry in entries:
+        kind, xy, sub, rest = entry.split(' ', 3)
+        if kind == 'u':
+            ret.unmerged.append(rest.split(' ', 7)[7])
+            continue
+        elif kind == '2':
+            filename = rest.split(' ', 6)[6]
+            next(entries)  # the original filename
+        else:
+            filename = rest.split(' ', 5)[5]
+
+        if xy[0] not in '.D':
+            ret.staged.append(filename)
+        if xy[1] == 'A':
+            ret.intent_to_add.append(filename)
+        elif xy[1] != '.' and not sub.startswith('S'):
+            ret.unstaged.append(filename)
+    return ret
+
+
 def get_all_files() -> list[str]:
     return zsplit(cmd_output('git', 'ls-files', '-z', '--deduplicate')[1])
 
 
+def get_tracked_files(filenames: Sequence[str]) -> list[str]:
+    cmd = ('git', '--literal-pathspecs', 'ls-files', '-z', '--')
+    _, out = xargs(cmd, filenames)
+    return zsplit(out.decode())
+
+
 def get_changed_files(old: str, new: str) -> list[str]:
     diff_cmd = ('git', 'diff', '--name-only', '--no-ext-diff', '-z')
     try:
@@ -182,14 +230,15 @@ def has_core_hookpaths_set() -> bool:
     return bool(out.strip())
 
 
-def init_repo(path: str, remote: str) -> None:
+def init_repo(path: str, remote: str, *, bare: bool = False) -> None:
     if os.path.isdir(remote):
         remote = os.path.abspath(remote)
 
     git = ('git', *NO_FS_MONITOR)
     env = no_git_env()
+    bare_args = ('--bare',) if bare else ()
     # avoid the user's template so that hooks do not recurse
-    cmd_output_b(*git, 'init', '--template=', path, env=env)
+    cmd_output_b(*git, 'init', *bare_args, '--template=', path, env=env)
     cmd_output_b(*git, 'remote', 'add', 'origin', remote, cwd=path, env=env)
 
 
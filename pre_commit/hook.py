@@ -33,6 +33,8 @@ class Hook(NamedTuple):
     log_file: str
     minimum_pre_commit_version: str
     require_serial: bool
+    read_only: bool
+    cache: bool
     stages: Sequence[str]
     verbose: bool
 
@@ -0,0 +1,155 @@
+"""A GNU make compatible jobserver.
+
+pre-commit provides a jobserver while running hooks so that the xargs
+partitions of every hook draw from one shared pool of tokens.  The pool is
+only handed to pre-commit's own workers (see `worker`), never through the
+environment: hook processes do not change behaviour (`MAKEFLAGS` fifo auth
+needs make >= 4.4 and `-j` would parallelize makefiles not written for it)
+and a hook running pre-commit again gets a pool of its own.  A jobserver
+provided by an outer `make -j` is honored.
+
+See https://www.gnu.org/software/make/manual/html_node/Job-Slots.html
+"""
+from __future__ import annotations
+
+import contextlib
+import os
+import re
+import sys
+import tempfile
+import threading
+from collections.abc import Generator
+from collections.abc import Mapping
+
+
+_AUTH_RE = re.compile(r'--jobserver-(?:auth|fds)=(\S+)')
+
+
+class JobServer:
+    def __init__(self, r: int, w: int) -> None:
+        self.r = r
+        self.w = w
+
+    @contextlib.contextmanager
+    def token(self) -> Generator[None]:
+        tok = os.read(self.r, 1)
+        try:
+            yield
+        finally:
+            os.write(self.w, tok)
+
+
+def _parse_auth(auth: str) -> JobServer | None:
+    if auth.startswith('fifo:'):
+        try:
+            fd = os.open(auth[len('fifo:'):], os.O_RDWR)
+        except OSError:
+            return None
+        else:
+            return JobServer(fd, fd)
+
+    try:
+        r, w = (int(part) for part in auth.split(','))
+    except ValueError:  # windows semaphores, etc.
+        return None
+    # the file descriptors are only inherited for "recursive" make rules
+    try:
+        os.fstat(r)
+        os.fstat(w)
+    except OSError:
+        return None
+    else:
+        return JobServer(r, w)
+
+
+_lock = threading.Lock()
+_jobservers: dict[str, JobServer | None] = {}
+# like any other client, we may run one job without a token -- unless we are
+# the one handing out tokens (or one of our workers)
+_implicit_token = threading.Lock()
+_has_implicit_token = True
+# the auth string of pre-commit's own jobserver (in this process or, for a
+# worker, its parent)
+_own_auth: str | None = None
+
+
+def _auth(environ: Mapping[str, str]) -> str | None:
+    if _own_auth is not None:
+        return _own_auth
+
+    auth = None
+    for match in _AUTH_RE.finditer(environ.get('MAKEFLAGS', '')):
+        auth = match[1]
+    return auth
+
+
+def from_environ(
+        environ: Mapping[str, str] = os.environ,
+) -> JobServer | None:
+    auth = _auth(environ)
+    if auth is None:
+        return None
+    with _lock:
+        if auth not in _jobservers:
+            _jobservers[auth] = _parse_auth(auth)
+        return _jobservers[auth]
+
+
+def worker(auth: str | None) -> None:
+    """Initialize a worker process of the process running `jobserver`."""
+    global _own_auth, _has_implicit_token
+    _own_auth = auth
+    # the parent holds that one
+    _has_implicit_token = False
+
+
+@contextlib.contextmanager
+def token() -> Generator[None]:
+    """Hold a job slot, if there is a jobserver."""
+    server = from_environ()
+    if server is None:
+        yield
+    elif _has_implicit_token and _implicit_token.acquire(blocking=False):
+        try:
+            yield
+        finally:
+            _implicit_token.release()
+    else:
+        with server.token():
+            yield
+
+
+@contextlib.contextmanager
+def jobserver(jobs: int) -> Generator[str | None]:
+    """Provide a jobserver with `jobs` tokens to this process and its workers
+    unless one is already provided (for instance by `make -j`).
+
+    Yields what the workers are initialized with (see `worker`).
+    """
+    global _has_implicit_token, _own_auth
+
+    if sys.platform == 'win32' or from_environ() is not None:
+        yield _own_auth
+        return
+
+    with tempfile.TemporaryDirectory() as tmpdir:  # pragma: win32 no cover
+        fifo = os.path.join(tmpdir, 'jobserver')
+        os.mkfifo(fifo)
+        fd = os.open(fifo, os.O_RDWR)
+        try:
+            os.write(fd, b'+' * jobs)
+            auth = f'fifo:{fifo}'
+            with _lock:
+                _jobservers[auth] = JobServer(fd, fd)
+
+            orig, _has_implicit_token = _has_implicit_token, False
+            orig_auth, _own_auth = _own_auth, auth
+            try:
+                yield auth
+            finally:
+                _has_implicit_token = orig
+                _own_auth = orig_auth
+                with _lock:
+                    del _jobservers[auth]
+        finally:
+            os.close(fd)
@@ -88,7 +88,10 @@ def setup_cmd(prefix: Prefix, cmd: tuple[str, ...], **kwargs: Any) -> None:
 
 
 def environment_dir(prefix: Prefix, d: str, language_version: str) -> str:
-    return prefix.path(f'{d}-{language_version}')
+    if prefix.env_key:
+        return prefix.path(f'{d}-{language_version}-{prefix.env_key}')
+    else:
+        return prefix.path(f'{d}-{language_version}')
 
 
 def assert_version_default(binary: str, version: str) -> None:
@@ -132,9 +135,25 @@ def no_env(prefix: Prefix, version: str) -> Generator[None]:
     yield
 
 
+# the share of the concurrency given to a hook running alongside others
+_hook_concurrency: int | None = None
+
+
+@contextlib.contextmanager
+def hook_concurrency(jobs: int) -> Generator[None]:
+    global _hook_concurrency
+    orig, _hook_concurrency = _hook_concurrency, jobs
+    try:
+        yield
+    finally:
+        _hook_concurrency = orig
+
+
 def target_concurrency() -> int:
     if 'PRE_COMMIT_NO_CONCURRENCY' in os.environ:
         return 1
+    elif _hook_concurrency is not None:
+        return _hook_concurrency
     else:
         # Travis appears to have a bunch of CPUs, but we can't use them all.
         if 'TRAVIS' in os.environ:
@@ -168,7 +187,13 @@ def run_xargs(
         # ordering.
         file_args = _shuffled(file_args)
         jobs = target_concurrency()
-    return xargs.xargs(cmd, file_args, target_concurrency=jobs, color=color)
+    return xargs.xargs(
+        cmd, file_args,
+        target_concurrency=jobs,
+        # balance partitions by file size rather than number of files
+        cost=xargs.file_size_cost,
+        color=color,
+    )
 
 
 def hook_cmd(entry: str, args: Sequence[str]) -> tuple[str, ...]:
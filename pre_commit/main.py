@@ -27,6 +27,7 @@ from pre_commit.commands.validate_config import validate_config
 from pre_commit.commands.validate_manifest import validate_manifest
 from pre_commit.error_handler import error_handler
 from pre_commit.logging_handler import logging_handler
+from pre_commit.shard import parse_shard
 from pre_commit.store import Store
 
 
@@ -81,6 +82,34 @@ def _add_run_options(parser: argparse.ArgumentParser) -> None:
         '--fail-fast', action='store_true',
         help='Stop after the first failing hook.',
     )
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help=(
+            'Run hooks even on files which are unchanged since they last '
+            'passed.'
+        ),
+    )
+    parser.add_argument(
+        '--isolated-worktree', action='store_true',
+        help=(
+            'Leave files with unstaged changes untouched and run the hooks '
+            'on a copy of the staged files instead.  Fixes are merged back.  '
+            'Also enabled by setting `PRE_COMMIT_ISOLATED_WORKTREE=1` (for '
+            'instance for the installed git hooks).'
+        ),
+    )
+    parser.add_argument(
+        '--shard', type=parse_shard, metavar='INDEX/COUNT',
+        help=(
+            'Only run on this slice (1-based) of the files, for splitting a '
+            'run across COUNT machines.  Hooks which do not operate on files '
+            'only run on shard 1.'
+        ),
+    )
+    parser.add_argument(
+        '--shard-by-size', action='store_true',
+        help='Balance the shards by file size rather than number of files.',
+    )
     parser.add_argument(
         '--hook-stage',
         choices=clientlib.STAGES,
@@ -301,6 +330,21 @@ def main(argv: Sequence[str] | None = None) -> int:
         ),
     )
     _add_config_option(install_hooks_parser)
+    install_hooks_parser.add_argument(
+        '--import', dest='import_bundle', metavar='FILENAME',
+        help=(
+            'Restore the repositories and environments from a bundle made '
+            'with `--export` before installing.'
+        ),
+    )
+    install_hooks_parser.add_argument(
+        '--export', dest='export_bundle', metavar='FILENAME',
+        help=(
+            'After installing, write the repositories and environments used '
+            'by the config file to a bundle (a `.tar.gz`) which `--import` '
+            'restores, for instance to cache them in CI.'
+        ),
+    )
 
     migrate_config_parser = _add_cmd(
         'migrate-config',
@@ -422,7 +466,11 @@ def main(argv: Sequence[str] | None = None) -> int:
                 skip_on_missing_config=args.allow_missing_config,
             )
         elif args.command == 'install-hooks':
-            return install_hooks(args.config, store)
+            return install_hooks(
+                args.config, store,
+                import_bundle=args.import_bundle,
+                export_bundle=args.export_bundle,
+            )
         elif args.command == 'migrate-config':
             return migrate_config(args.config)
         elif args.command == 'run':
@@ -6,6 +6,9 @@ from typing import NamedTuple
 
 class Prefix(NamedTuple):
     prefix_dir: str
+    # distinguishes the environments of hooks sharing a `prefix_dir` which
+    # differ in `additional_dependencies`
+    env_key: str = ''
 
     def path(self, *parts: str) -> str:
         return os.path.normpath(os.path.join(self.prefix_dir, *parts))
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import concurrent.futures
+import hashlib
 import json
 import logging
 import os
@@ -7,10 +9,13 @@ from collections.abc import Sequence
 from typing import Any
 
 import pre_commit.constants as C
+from pre_commit import fingerprint
+from pre_commit import lang_base
+from pre_commit import xargs
 from pre_commit.all_languages import languages
-from pre_commit.clientlib import load_manifest
 from pre_commit.clientlib import LOCAL
 from pre_commit.clientlib import META
+from pre_commit.errors import FatalError
 from pre_commit.hook import Hook
 from pre_commit.lang_base import environment_dir
 from pre_commit.prefix import Prefix
@@ -43,6 +48,66 @@ def _read_state(venv: str) -> object | None:
             return json.load(f)
 
 
+def _health_filename(venv: str) -> str:
+    return os.path.join(venv, '.health_check')
+
+
+def _health_key(venv: str) -> list[object] | None:
+    """the executables of the environment (and through symlinks, the
+    interpreters it was made from) -- a health check only needs to be
+    repeated when one of these changes.  Environments without executables
+    (`renv`, ...) depend on an interpreter elsewhere and are not cached.
+    """
+    ret: list[object] = []
+    for bin_dir in ('bin', 'Scripts'):
+        bin_path = os.path.join(venv, bin_dir)
+        try:
+            names = sorted(os.listdir(bin_path))
+        except OSError:
+            continue
+        for name in names:
+            try:
+                st = os.stat(os.path.join(bin_path, name))
+            except OSError:  # broken symlink
+                ret.append((bin_dir, name, None))
+            else:
+                key = fingerprint.StatKey(
+                    st.st_mtime_ns, st.st_size, st.st_ino, st.st_mode,
+                )
+                # may be modified again without the stat changing
+                if fingerprint.is_racy(key):
+                    return None
+                ret.append((bin_dir, name, key))
+    return ret or None
+
+
+def _healthy(hook: Hook, venv: str) -> bool:
+    lang = languages[hook.language]
+
+    key = _health_key(venv)
+    key_s = json.dumps(key)
+    if key is not None:
+        try:
+            with open(_health_filename(venv)) as f:
+                if f.read() == key_s:
+                    return True
+        except OSError:
+            pass
+
+    if lang.health_check(hook.prefix, hook.language_version):
+        return False
+
+    if key is not None:
+        staging = f'{_health_filename(venv)}staging'
+        try:
+            with open(staging, 'w') as f:
+                f.write(key_s)
+            os.replace(staging, _health_filename(venv))
+        except OSError:  # pragma: no cover (read-only store)
+            pass
+    return True
+
+
 def _hook_installed(hook: Hook) -> bool:
     lang = languages[hook.language]
     if lang.ENVIRONMENT_DIR is None:
@@ -58,15 +123,17 @@ def _hook_installed(hook: Hook) -> bool:
             os.path.exists(_state_filename_v2(venv)) or
             _read_state(venv) == _state(hook.additional_dependencies)
         ) and
-        not lang.health_check(hook.prefix, hook.language_version)
+        _healthy(hook, venv)
     )
 
 
-def _hook_install(hook: Hook) -> None:
+def _log_install(hook: Hook) -> None:
     logger.info(f'Installing environment for {hook.src}.')
     logger.info('Once installed this environment will be reused.')
     logger.info('This may take a few minutes...')
 
+
+def _hook_install(hook: Hook) -> None:
     lang = languages[hook.language]
     assert lang.ENVIRONMENT_DIR is not None
 
@@ -106,6 +173,30 @@ def _hook_install(hook: Hook) -> None:
         open(_state_filename_v2(venv), 'a+').close()
 
 
+def _hook_install_all(
+        store: Store,
+        hooks: Sequence[Hook],
+        *,
+        log: bool,
+) -> None:
+    with store.lock('environments', hooks[0].prefix.prefix_dir):
+        for hook in hooks:
+            # Another process may have already completed this work
+            if not _hook_installed(hook):
+                if log:
+                    _log_install(hook)
+                _hook_install(hook)
+                lang = languages[hook.language]
+                assert lang.ENVIRONMENT_DIR is not None
+                store.dedupe(
+                    environment_dir(
+                        hook.prefix,
+                        lang.ENVIRONMENT_DIR,
+                        hook.language_version,
+                    ),
+                )
+
+
 def _hook(
         *hook_dicts: dict[str, Any],
         root_config: dict[str, Any],
@@ -144,6 +235,17 @@ def _hook(
     return ret
 
 
+def deps_prefix(prefix_dir: str, deps: Sequence[str]) -> Prefix:
+    """hooks differing only in `additional_dependencies` share a checkout,
+    each gets its own environment in it
+    """
+    if deps:
+        digest = hashlib.sha256(json.dumps(list(deps)).encode()).hexdigest()
+        return Prefix(prefix_dir, digest[:12])
+    else:
+        return Prefix(prefix_dir)
+
+
 def _non_cloned_repository_hooks(
         repo_config: dict[str, Any],
         store: Store,
@@ -156,7 +258,7 @@ def _non_cloned_repository_hooks(
         if language.ENVIRONMENT_DIR is None:
             return Prefix(os.getcwd())
         else:
-            return Prefix(store.make_local(deps))
+            return deps_prefix(store.make_local(()), deps)
 
     return tuple(
         Hook.create(
@@ -174,8 +276,9 @@ def _cloned_repository_hooks(
         root_config: dict[str, Any],
 ) -> tuple[Hook, ...]:
     repo, rev = repo_config['repo'], repo_config['rev']
-    manifest_path = os.path.join(store.clone(repo, rev), C.MANIFEST_FILE)
-    by_id = {hook['id']: hook for hook in load_manifest(manifest_path)}
+    prefix_dir = store.clone(repo, rev)
+    manifest_path = os.path.join(prefix_dir, C.MANIFEST_FILE)
+    by_id = {hook['id']: hook for hook in store.load_manifest(manifest_path)}
 
     for hook in repo_config['hooks']:
         if hook['id'] not in by_id:
@@ -193,7 +296,7 @@ def _cloned_repository_hooks(
     return tuple(
         Hook.create(
             repo_config['repo'],
-            Prefix(store.clone(repo, rev, hook['additional_dependencies'])),
+            deps_prefix(prefix_dir, hook['additional_dependencies']),
             hook,
         )
         for hook in hook_dcts
@@ -221,17 +324,78 @@ def install_hook_envs(hooks: Sequence[Hook], store: Store) -> None:
             seen.add(hook.install_key)
         return ret
 
-    if not _need_installed():
+    need_installed = _need_installed()
+    if not need_installed:
+        return
+
+    # environments of one repository may share files (`npm install`,
+    # `cargo build`, ...) so those are installed (and locked) together
+    by_prefix: dict[str, list[Hook]] = {}
+    for hook in need_installed:
+        by_prefix.setdefault(hook.prefix.prefix_dir, []).append(hook)
+
+    jobs = min(len(by_prefix), lang_base.target_concurrency())
+    if jobs == 1:
+        for group in by_prefix.values():
+            _hook_install_all(store, group, log=True)
         return
-    with store.exclusive_lock():
-        # Another process may have already completed this work
-        for hook in _need_installed():
-            _hook_install(hook)
+
+    for hook in need_installed:
+        _log_install(hook)
+
+    # processes: installation modifies `os.environ` (`in_env`)
+    errors = []
+    with xargs.process_pool(jobs) as pool:
+        futures = [
+            (group, pool.submit(_hook_install_all, store, group, log=False))
+            for group in by_prefix.values()
+        ]
+        for group, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(
+                    f'Failed to install environment for {group[0].src}.',
+                )
+                errors.append(e)
+    if errors:
+        raise errors[0]
+
+
+def _clone_jobs() -> int:
+    # cloning mostly waits on the network, not the cpu
+    if 'PRE_COMMIT_NO_CONCURRENCY' in os.environ:
+        return 1
+
+    jobs = os.environ.get('PRE_COMMIT_CLONE_JOBS', '8')
+    try:
+        return max(1, int(jobs))
+    except ValueError:
+        raise FatalError(
+            f'PRE_COMMIT_CLONE_JOBS must be an integer, got {jobs!r}',
+        )
 
 
 def all_hooks(root_config: dict[str, Any], store: Store) -> tuple[Hook, ...]:
-    return tuple(
-        hook
+    def _repo_hooks(repo_config: dict[str, Any]) -> tuple[Hook, ...]:
+        return _repository_hooks(repo_config, store, root_config)
+
+    # look up the repositories which are already cloned all at once
+    store.resolve_repos(
+        (LOCAL, C.LOCAL_REPO_VERSION)
+        if repo['repo'] == LOCAL else
+        (repo['repo'], repo['rev'])
         for repo in root_config['repos']
-        for hook in _repository_hooks(repo, store, root_config)
+        if repo['repo'] != META
     )
+
+    # resolve (and clone) the repositories concurrently
+    jobs = min(len(root_config['repos']), _clone_jobs())
+    if jobs <= 1:
+        repos_hooks = [_repo_hooks(repo) for repo in root_config['repos']]
+    else:
+        with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+            repos_hooks = list(
+                executor.map(_repo_hooks, root_config['repos']),
+            )
+    return tuple(hook for hooks in repos_hooks for hook in hooks)
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import heapq
+import os
+from collections.abc import Sequence
+from typing import NamedTuple
+
+
+class Shard(NamedTuple):
+    number: int  # 1-based, as most CI providers number their nodes
+    total: int
+
+    @property
+    def designated(self) -> bool:
+        """the shard running the hooks which do not operate on files"""
+        return self.number == 1
+
+
+def parse_shard(s: str) -> Shard:
+    try:
+        index_s, count_s = s.split('/')
+        index, count = int(index_s), int(count_s)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected INDEX/COUNT, got {s!r}')
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(
+            f'expected 1 <= INDEX <= COUNT, got {s!r}',
+        )
+    return Shard(index, count)
+
+
+def _path_hash(filename: str) -> int:
+    digest = hashlib.sha256(os.fsencode(filename)).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def _size(filename: str) -> int:
+    try:
+        return os.lstat(filename).st_size
+    except OSError:
+        return 0
+
+
+def shard_filenames(
+        shard: Shard,
+        filenames: Sequence[str],
+        *,
+        by_size: bool = False,
+) -> set[str]:
+    """Select this shard's slice of `filenames`.
+
+    Every node computes the same partition: by default from a stable hash of
+    each path and with `by_size` by assigning the largest files first to the
+    least loaded shard.
+    """
+    if not by_size:
+        return {
+            filename for filename in filenames
+            if _path_hash(filename) % shard.total == shard.number - 1
+        }
+
+    weighted = sorted(
+        (-_size(filename), _path_hash(filename), filename)
+        for filename in filenames
+    )
+    loads = [(0, i) for i in range(shard.total)]
+    ret = set()
+    for neg_size, _, filename in weighted:
+        load, i = heapq.heappop(loads)
+        if i == shard.number - 1:
+            ret.add(filename)
+        heapq.heappush(loads, (load + 1 - neg_size, i))
+    return ret
@@ -1,16 +1,23 @@
 from __future__ import annotations
 
 import contextlib
+import filecmp
 import logging
 import os.path
+import shutil
+import tempfile
 import time
 from collections.abc import Generator
+from collections.abc import Sequence
 
 from pre_commit import git
+from pre_commit.envcontext import PatchesT
 from pre_commit.errors import FatalError
+from pre_commit.fingerprint import stat_key
 from pre_commit.util import CalledProcessError
 from pre_commit.util import cmd_output
 from pre_commit.util import cmd_output_b
+from pre_commit.util import rmtree
 from pre_commit.xargs import xargs
 
 
@@ -33,8 +40,7 @@ def _git_apply(patch: str) -> None:
 
 
 @contextlib.contextmanager
-def _intent_to_add_cleared() -> Generator[None]:
-    intent_to_add = git.intent_to_add_files()
+def _intent_to_add_cleared(intent_to_add: Sequence[str]) -> Generator[None]:
     if intent_to_add:
         logger.warning('Unstaged intent-to-add files detected.')
 
@@ -48,7 +54,14 @@ def _intent_to_add_cleared() -> Generator[None]:
 
 
 @contextlib.contextmanager
-def _unstaged_changes_cleared(patch_dir: str) -> Generator[None]:
+def _unstaged_changes_cleared(
+        patch_dir: str,
+        unstaged: Sequence[str],
+) -> Generator[None]:
+    if not unstaged:
+        yield
+        return
+
     tree = cmd_output('git', 'write-tree')[1].strip()
     diff_cmd = (
         'git', 'diff-index', '--ignore-submodules', '--binary',
@@ -105,9 +118,164 @@ def _unstaged_changes_cleared(patch_dir: str) -> Generator[None]:
 
 
 @contextlib.contextmanager
-def staged_files_only(patch_dir: str) -> Generator[None]:
+def staged_files_only(
+        patch_dir: str,
+        status: git.Status | None = None,
+) -> Generator[None]:
     """Clear any unstaged changes from the git working directory inside this
     context.
     """
-    with _intent_to_add_cleared(), _unstaged_changes_cleared(patch_dir):
-        yield
+    if status is None:
+        status = git.status()
+    with _intent_to_add_cleared(status.intent_to_add):
+        with _unstaged_changes_cleared(patch_dir, status.unstaged):
+            yield
+
+
+def _xargs_checked(cmd: tuple[str, ...], varargs: Sequence[str]) -> None:
+    retcode, out = xargs(cmd, varargs)
+    if retcode:
+        raise CalledProcessError(retcode, cmd, out, None)
+
+
+def _index_blobs() -> dict[str, tuple[str, str]]:
+    """filename => (mode, blob) of the index (without submodules)"""
+    _, out, _ = cmd_output('git', 'ls-files', '-z', '--stage')
+    ret = {}
+    for line in git.zsplit(out):
+        info, filename = line.split('\t', 1)
+        mode, blob, _ = info.split()
+        if mode != '160000':
+            ret[filename] = (mode, blob)
+    return ret
+
+
+def _materialize(
+        root: str,
+        worktree: str,
+        blobs: dict[str, tuple[str, str]],
+        unstaged: set[str],
+) -> None:
+    to_checkout = []
+    for filename, (mode, _) in blobs.items():
+        # the working directory already has the staged contents
+        if mode != '120000' and filename not in unstaged:
+            dest = os.path.join(worktree, filename)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            try:
+                os.link(os.path.join(root, filename), dest)
+            except OSError:  # pragma: no cover (no hard links)
+                pass
+            else:
+                continue
+        to_checkout.append(filename)
+
+    if to_checkout:
+        _xargs_checked(
+            ('git', 'checkout-index', f'--prefix={worktree}{os.sep}', '--'),
+            to_checkout,
+        )
+
+
+def _copy_back(
+        root: str,
+        worktree: str,
+        blobs: dict[str, tuple[str, str]],
+        unstaged: set[str],
+        fixed: list[str],
+) -> None:
+    _xargs_checked(('git', f'--work-tree={worktree}', 'add', '--'), fixed)
+
+    for filename in fixed:
+        src = os.path.join(worktree, filename)
+        dest = os.path.join(root, filename)
+        if os.path.islink(src):
+            continue
+        elif filename not in unstaged:
+            # the hook modified the (hard linked) file in place
+            if os.path.samefile(src, dest):
+                continue
+            elif not filecmp.cmp(src, dest, shallow=False):
+                shutil.copyfile(src, dest)
+            continue
+
+        # merge the fixes with the unstaged changes
+        _, blob = blobs[filename]
+        _, base_contents, _ = cmd_output_b(
+            'git', 'cat-file', '--filters', f'--path={filename}', blob,
+        )
+        with tempfile.TemporaryDirectory() as tmpdir:
+            base = os.path.join(tmpdir, 'base')
+            with open(base, 'wb') as f:
+                f.write(base_contents)
+            retcode, merged, _ = cmd_output_b(
+                'git', 'merge-file', '-p', dest, base, src,
+                check=False,
+            )
+        if retcode == 0:
+            with open(dest, 'wb') as f:
+                f.write(merged)
+        else:
+            logger.warning(
+                f'Fixes to {filename} conflicted with its unstaged '
+                f'changes, they are only staged.',
+            )
+
+
+@contextlib.contextmanager
+def _isolated_worktree(unstaged: set[str]) -> Generator[PatchesT]:
+    if not unstaged:
+        yield ()
+        return
+
+    root = os.getcwd()
+    git_dir = os.path.abspath(git.get_git_dir())
+    worktree = tempfile.mkdtemp(prefix='pre-commit-worktree-', dir=git_dir)
+    logger.warning('Unstaged files detected.')
+    logger.info(f'Running hooks on the staged files in {worktree}.')
+    try:
+        blobs = _index_blobs()
+        _materialize(root, worktree, blobs, unstaged)
+        before = {
+            filename: stat_key(os.path.join(worktree, filename))
+            for filename in blobs
+        }
+
+        try:
+            os.chdir(worktree)
+            yield (('GIT_DIR', git_dir), ('GIT_WORK_TREE', worktree))
+        finally:
+            os.chdir(root)
+            fixed = [
+                filename
+                for filename, key in before.items()
+                if stat_key(os.path.join(worktree, filename)) not in {
+                    key, None,
+                }
+            ]
+            if fixed:
+                _copy_back(root, worktree, blobs, unstaged, fixed)
+    finally:
+        rmtree(worktree)
+
+
+@contextlib.contextmanager
+def isolated_staged_files(
+        status: git.Status | None = None,
+) -> Generator[PatchesT]:
+    """Run inside a copy of the index (made of hard links to the unmodified
+    files) rather than clearing the unstaged changes out of the git working
+    directory.  The files with unstaged changes are left untouched.
+
+    Yields the environment (`GIT_DIR` / `GIT_WORK_TREE`) pointing git at the
+    copy -- only for running the hooks, installing their environments must
+    not see it.
+
+    Fixes made by the hooks are staged and copied to the working directory
+    (merged with the unstaged changes if there are any).
+    """
+    if status is None:
+        status = git.status()
+    with _intent_to_add_cleared(status.intent_to_add):
+        with _isolated_worktree(set(status.unstaged)) as patch:
+            yield patch
@@ -1,13 +1,22 @@
 from __future__ import annotations
 
 import contextlib
+import hashlib
 import logging
 import os.path
+import pickle
+import shutil
 import sqlite3
+import stat
 import tempfile
+import threading
 from collections.abc import Callable
 from collections.abc import Generator
+from collections.abc import Iterable
+from collections.abc import Mapping
 from collections.abc import Sequence
+from typing import Any
+from typing import TypeVar
 
 import pre_commit.constants as C
 from pre_commit import clientlib
@@ -15,12 +24,19 @@ from pre_commit import file_lock
 from pre_commit import git
 from pre_commit.util import CalledProcessError
 from pre_commit.util import clean_path_on_failure
+from pre_commit.util import cmd_output
 from pre_commit.util import cmd_output_b
 from pre_commit.util import resource_text
+from pre_commit.util import rmtree
 
 
 logger = logging.getLogger('pre_commit')
 
+T = TypeVar('T')
+
+# the `PRAGMA user_version` of a store with every table, see `Store._migrate`
+_SCHEMA_VERSION = 2
+
 
 def _get_default_directory() -> str:
     """Returns the default directory for the Store.  This is intentionally
@@ -56,12 +72,34 @@ def _make_local_repo(directory: str) -> None:
             f.write(contents)
 
 
+_WRITE_BITS = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+
+# the stores whose `.lock` this thread holds (shared) through `Store.lock`
+_held = threading.local()
+
+
+class _CaptureLogs(logging.Handler):
+    """the messages logged by this thread (others may be loading too)"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.thread = threading.get_ident()
+        self.messages: list[tuple[int, str]] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.thread == self.thread:
+            self.messages.append((record.levelno, record.getMessage()))
+
+
 class Store:
     get_default_directory = staticmethod(_get_default_directory)
 
     def __init__(self, directory: str | None = None) -> None:
         self.directory = directory or Store.get_default_directory()
         self.db_path = os.path.join(self.directory, 'db.db')
+        self._init_connection()
+        # (db_repo_name, ref) => path, for repositories seen this run
+        self._repos: dict[tuple[str, str], str] = {}
         self.readonly = (
             os.path.exists(self.directory) and
             not os.access(self.directory, os.W_OK)
@@ -76,6 +114,11 @@ class Store:
                 )
 
         if os.path.exists(self.db_path):
+            if not self.readonly:
+                with self.connect() as db:
+                    version, = db.execute('PRAGMA user_version').fetchone()
+                    if version < _SCHEMA_VERSION:
+                        self._migrate(db, version)
             return
         with self.exclusive_lock():
             # Another process may have already completed this work
@@ -96,31 +139,295 @@ class Store:
                     ');',
                 )
                 self._create_configs_table(db)
+                self._migrate(db, 0)
 
             # Atomic file move
             os.replace(tmpfile, self.db_path)
 
+    def _migrate(self, db: sqlite3.Connection, version: int) -> None:
+        """Bring a store created at schema `version` up to date."""
+        if version < 1:
+            db.executescript(
+                'CREATE TABLE IF NOT EXISTS file_tags ('
+                '   dev INTEGER NOT NULL,'
+                '   ino INTEGER NOT NULL,'
+                '   key TEXT NOT NULL,'
+                '   tags TEXT NOT NULL,'
+                '   PRIMARY KEY (dev, ino)'
+                ');',
+            )
+        if version < 2:
+            # only a cache: the results of the old schema are dropped
+            db.executescript(
+                'DROP TABLE IF EXISTS hook_results;'
+                'CREATE TABLE hook_results ('
+                '   key TEXT NOT NULL,'
+                '   configs TEXT NOT NULL,'
+                '   prefix TEXT NOT NULL,'
+                '   config TEXT NOT NULL,'
+                '   filename TEXT NOT NULL,'
+                '   digest TEXT NOT NULL,'
+                '   PRIMARY KEY (key, filename)'
+                ');'
+                'CREATE INDEX hook_results_config ON hook_results (config);',
+            )
+        db.execute(f'PRAGMA user_version = {_SCHEMA_VERSION}')
+
     @contextlib.contextmanager
     def exclusive_lock(self) -> Generator[None]:
+        """Lock the whole store -- for migrations and `gc`."""
         def blocked_cb() -> None:  # pragma: no cover (tests are in-process)
             logger.info('Locking pre-commit directory')
 
         with file_lock.lock(os.path.join(self.directory, '.lock'), blocked_cb):
             yield
 
+    @contextlib.contextmanager
+    def lock(self, *key: str) -> Generator[None]:
+        """Lock one repository or environment, identified by `key`.  Work on
+        anything else in the store may proceed concurrently.
+        """
+        def blocked_cb() -> None:  # pragma: no cover (tests are in-process)
+            logger.info('Locking pre-commit directory')
+
+        digest = hashlib.sha256('\0'.join(key).encode()).hexdigest()
+        locks_dir = os.path.join(self.directory, '.locks')
+        with contextlib.ExitStack() as ctx:
+            # only the outermost lock takes `.lock`: taking it again through
+            # another handle deadlocks where there are no shared locks (win32)
+            held: set[str] = _held.__dict__.setdefault('directories', set())
+            if self.directory not in held:
+                ctx.enter_context(
+                    file_lock.lock(
+                        os.path.join(self.directory, '.lock'), blocked_cb,
+                        shared=True,
+                    ),
+                )
+                held.add(self.directory)
+                ctx.callback(held.discard, self.directory)
+
+            os.makedirs(locks_dir, exist_ok=True)
+            with file_lock.lock(
+                    os.path.join(locks_dir, f'{digest}.lock'), blocked_cb,
+            ):
+                yield
+
+    def _load_cached(
+            self,
+            kind: str,
+            load: Callable[[str], T],
+            filename: str,
+    ) -> T:
+        """Load (and validate) `filename` with `load`, or reuse the result
+        from when this version last loaded the same contents from there.
+        The warnings logged while loading are repeated.
+        """
+        try:
+            with open(filename, 'rb') as f:
+                contents = f.read()
+        except OSError:
+            return load(filename)  # which reports the error
+
+        h = hashlib.sha256()
+        for part in (C.VERSION, kind, os.path.realpath(filename)):
+            h.update(f'{part}\0'.encode())
+        h.update(contents)
+        cache_dir = os.path.join(self.directory, 'loaded')
+        cache = os.path.join(cache_dir, h.hexdigest())
+
+        try:
+            with open(cache, 'rb') as f:
+                messages, ret = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+        else:
+            for level, msg in messages:
+                logger.log(level, msg)
+            return ret
+
+        handler = _CaptureLogs()
+        logger.addHandler(handler)
+        try:
+            ret = load(filename)
+        finally:
+            logger.removeHandler(handler)
+
+        if self.readonly:  # pragma: win32 no cover
+            return ret
+        try:
+            with open(filename, 'rb') as f:
+                unchanged = f.read() == contents
+            if unchanged:
+                os.makedirs(cache_dir, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=cache_dir)
+                with open(fd, 'wb') as f:
+                    pickle.dump(
+                        (handler.messages, ret), f,
+                        protocol=pickle.HIGHEST_PROTOCOL,
+                    )
+                os.replace(tmp, cache)
+        except OSError:  # pragma: no cover (a cache is optional)
+            pass
+        return ret
+
+    def load_config(self, filename: str) -> dict[str, Any]:
+        return self._load_cached('config', clientlib.load_config, filename)
+
+    def load_manifest(self, filename: str) -> list[dict[str, Any]]:
+        return self._load_cached(
+            'manifest', clientlib.load_manifest, filename,
+        )
+
+    def clear_load_cache(self) -> None:
+        """Remove the results kept by `load_config` / `load_manifest` --
+        which may only be done while holding the `exclusive_lock`.
+        """
+        cache_dir = os.path.join(self.directory, 'loaded')
+        if os.path.exists(cache_dir):
+            rmtree(cache_dir)
+
+    def clear_locks(self) -> None:
+        """Remove the files used by `lock` -- which may only be done while
+        holding the `exclusive_lock`.
+        """
+        locks_dir = os.path.join(self.directory, '.locks')
+        if os.path.exists(locks_dir):
+            rmtree(locks_dir)
+
+    def dedupe(self, directory: str) -> None:
+        """Replace the files in `directory` with hard links into a pool of
+        files shared by every environment (keyed by contents and mode).
+
+        Environments of different repositories differ in the hook's own
+        package but tend to install the same dependencies -- the same files.
+        The shared files are made read-only so a modification in place cannot
+        leak into other environments (installers replace files instead).
+        Must be called while holding a `lock`.
+        """
+        objects = os.path.join(self.directory, 'objects')
+        for root, _, filenames in os.walk(directory):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                st = os.lstat(path)
+                if (
+                        not stat.S_ISREG(st.st_mode) or
+                        st.st_size == 0 or
+                        st.st_nlink > 1
+                ):
+                    continue
+
+                hasher = hashlib.sha256()
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 16), b''):
+                        hasher.update(chunk)
+                mode = stat.S_IMODE(st.st_mode) & ~_WRITE_BITS
+                name = f'{hasher.hexdigest()}-{mode:o}'
+                obj = os.path.join(objects, name[:2], name[2:])
+
+                try:
+                    os.makedirs(os.path.dirname(obj), exist_ok=True)
+                    try:
+                        # first of its kind: becomes the shared copy
+                        os.link(path, obj)
+                        os.chmod(obj, mode)
+                    except FileExistsError:
+                        tmp = f'{path}.dedupe'
+                        os.link(obj, tmp)
+                        os.replace(tmp, path)
+                except OSError:  # pragma: no cover (no hard links)
+                    # not supported by the filesystem (or too many links),
+                    # an environment with its own copies is fine
+                    return
+
+    def remove_unused_objects(self) -> int:
+        """Remove the pooled files (see `dedupe`) which no environment links
+        to anymore -- which may only be done while holding the
+        `exclusive_lock`.
+        """
+        objects = os.path.join(self.directory, 'objects')
+        if not os.path.exists(objects):
+            return 0
+
+        removed = 0
+        for name in os.listdir(objects):
+            subdir = os.path.join(objects, name)
+            for filename in os.listdir(subdir):
+                obj = os.path.join(subdir, filename)
+                if os.lstat(obj).st_nlink == 1:
+                    os.remove(obj)
+                    removed += 1
+            if not os.listdir(subdir):
+                os.rmdir(subdir)
+        return removed
+
+    def _init_connection(self) -> None:
+        self._db: sqlite3.Connection | None = None
+        self._db_pid = -1
+        self._db_lock = threading.RLock()
+
+    def __getstate__(self) -> dict[str, Any]:
+        # the connection (and its lock) belong to this process
+        state = dict(self.__dict__)
+        for k in ('_db', '_db_pid', '_db_lock'):
+            del state[k]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._init_connection()
+
     @contextlib.contextmanager
     def connect(
             self,
             db_path: str | None = None,
     ) -> Generator[sqlite3.Connection]:
-        db_path = db_path or self.db_path
-        # sqlite doesn't close its fd with its contextmanager >.<
-        # contextlib.closing fixes this.
-        # See: https://stackoverflow.com/a/28032829/812183
-        with contextlib.closing(sqlite3.connect(db_path)) as db:
+        if db_path is not None and db_path != self.db_path:
+            # sqlite doesn't close its fd with its contextmanager >.<
+            # contextlib.closing fixes this.
+            # See: https://stackoverflow.com/a/28032829/812183
+            with contextlib.closing(sqlite3.connect(db_path)) as db:
+                # this creates a transaction
+                with db:
+                    yield db
+            return
+
+        # one connection per `Store` (shared by its threads), a forked
+        # process must not use its parent's
+        with self._db_lock:
+            if self._db is None or self._db_pid != os.getpid():
+                self._db = sqlite3.connect(
+                    self.db_path, check_same_thread=False,
+                )
+                self._db_pid = os.getpid()
             # this creates a transaction
-            with db:
-                yield db
+            with self._db:
+                yield self._db
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._db is not None and self._db_pid == os.getpid():
+                self._db.close()
+            self._db = None
+
+    def resolve_repos(self, keys: Iterable[tuple[str, str]]) -> None:
+        """Look up the repositories (`(db_repo_name, ref)`) in bulk so
+        `clone` / `make_local` needn't query for each of them.
+        """
+        keys = sorted(set(keys) - self._repos.keys())
+        if not keys:
+            return
+        with self.connect() as db:
+            for i in range(0, len(keys), 256):
+                chunk = keys[i:i + 256]
+                rows = db.execute(
+                    f'SELECT repo, ref, path FROM repos '
+                    f'WHERE (repo, ref) IN '
+                    f'(VALUES {", ".join(("(?, ?)",) * len(chunk))})',
+                    [part for key in chunk for part in key],
+                ).fetchall()
+                self._repos.update(
+                    ((repo, ref), path) for repo, ref, path in rows
+                )
 
     @classmethod
     def db_repo_name(cls, repo: str, deps: Sequence[str]) -> str:
@@ -148,10 +455,16 @@ class Store:
                 ).fetchone()
                 return result[0] if result else None
 
+        # `gc` may have removed it since
+        memoized = self._repos.get((repo, ref))
+        if memoized is not None and os.path.isdir(memoized):
+            return memoized
+
         result = _get_result()
         if result:
+            self._repos[(repo, ref)] = result
             return result
-        with self.exclusive_lock():
+        with self.lock('repo', repo, ref):
             # Another process may have already completed this work
             result = _get_result()
             if result:  # pragma: no cover (race)
@@ -172,40 +485,89 @@ class Store:
 
             clientlib.warn_for_stages_on_repo_init(original_repo, directory)
 
+        self._repos[(repo, ref)] = directory
         return directory
 
     def _complete_clone(self, ref: str, git_cmd: Callable[..., None]) -> None:
-        """Perform a complete clone of a repository and its submodules """
+        """Perform a complete fetch of a repository"""
 
-        git_cmd('fetch', 'origin', '--tags')
-        git_cmd('checkout', ref)
-        git_cmd('submodule', 'update', '--init', '--recursive')
+        git_cmd('fetch', 'origin', '--tags', '+refs/heads/*:refs/heads/*')
 
     def _shallow_clone(self, ref: str, git_cmd: Callable[..., None]) -> None:
-        """Perform a shallow clone of a repository and its submodules """
+        """Perform a shallow fetch of a repository"""
 
         git_config = 'protocol.version=2'
         git_cmd('-c', git_config, 'fetch', 'origin', ref, '--depth=1')
-        git_cmd('checkout', 'FETCH_HEAD')
-        git_cmd(
-            '-c', git_config, 'submodule', 'update', '--init', '--recursive',
-            '--depth=1',
-        )
+
+    def _mirror(self, repo: str) -> str:
+        """The bare repository holding the objects of every clone of `repo`.
+        """
+        mirrors = os.path.join(self.directory, 'mirrors')
+        digest = hashlib.sha256(repo.encode()).hexdigest()
+        mirror = os.path.join(mirrors, f'{digest}.git')
+        if not os.path.exists(mirror):
+            os.makedirs(mirrors, exist_ok=True)
+            tmp = tempfile.mkdtemp(prefix='mirror', dir=mirrors)
+            with clean_path_on_failure(tmp):
+                git.init_repo(tmp, repo, bare=True)
+                cmd_output_b('git', 'config', 'pre-commit.repo', repo, cwd=tmp)
+                os.replace(tmp, mirror)
+        return mirror
 
     def clone(self, repo: str, ref: str, deps: Sequence[str] = ()) -> str:
         """Clone the given url and checkout the specific ref."""
 
         def clone_strategy(directory: str) -> None:
-            git.init_repo(directory, repo)
             env = git.no_git_env()
 
+            with self.lock('mirror', repo):
+                mirror = self._mirror(repo)
+
+                def _mirror_cmd(*args: str) -> None:
+                    cmd_output_b('git', *args, cwd=mirror, env=env)
+
+                try:
+                    self._shallow_clone(ref, _mirror_cmd)
+                except CalledProcessError:
+                    if os.path.exists(os.path.join(mirror, 'shallow')):
+                        _mirror_cmd('fetch', 'origin', '--unshallow')
+                    self._complete_clone(ref, _mirror_cmd)
+                    shallow, rev = False, ref
+                else:
+                    shallow, rev = True, 'FETCH_HEAD'
+
+                _, out, _ = cmd_output(
+                    'git', 'rev-parse', '--verify', f'{rev}^{{commit}}',
+                    cwd=mirror, env=env,
+                )
+                commit = out.strip()
+                # so the mirror's `git gc` keeps it
+                _mirror_cmd('update-ref', f'refs/pre-commit/{commit}', commit)
+
+                # borrow the mirror's objects rather than fetching them again
+                git.init_repo(directory, repo)
+                git_dir = os.path.join(directory, '.git')
+                alternates = os.path.join(git_dir, 'objects/info/alternates')
+                with open(alternates, 'w') as f:
+                    f.write(f'{os.path.join(mirror, "objects")}\n')
+                if os.path.exists(os.path.join(mirror, 'shallow')):
+                    shutil.copyfile(
+                        os.path.join(mirror, 'shallow'),
+                        os.path.join(git_dir, 'shallow'),
+                    )
+
             def _git_cmd(*args: str) -> None:
                 cmd_output_b('git', *args, cwd=directory, env=env)
 
-            try:
-                self._shallow_clone(ref, _git_cmd)
-            except CalledProcessError:
-                self._complete_clone(ref, _git_cmd)
+            _git_cmd('checkout', commit)
+            if shallow:
+                _git_cmd(
+                    '-c', 'protocol.version=2',
+                    'submodule', 'update', '--init', '--recursive',
+                    '--depth=1',
+                )
+            else:
+                _git_cmd('submodule', 'update', '--init', '--recursive')
 
         return self._new_repo(repo, ref, deps, clone_strategy)
 
@@ -233,3 +595,114 @@ class Store:
             # TODO: eventually remove this and only create in _create
             self._create_configs_table(db)
             db.execute('INSERT OR IGNORE INTO configs VALUES (?)', (path,))
+
+    def select_file_tags(
+            self,
+            inodes: Iterable[tuple[int, int]],
+    ) -> dict[tuple[int, int], tuple[str, frozenset[str]]]:
+        """Return the `(key, tags)` remembered for the files identified by
+        `(st_dev, st_ino)`.
+        """
+        if self.readonly:  # pragma: win32 no cover
+            return {}
+        inodes = sorted(set(inodes))
+        ret: dict[tuple[int, int], tuple[str, frozenset[str]]] = {}
+        with self.connect() as db:
+            for i in range(0, len(inodes), 256):
+                chunk = inodes[i:i + 256]
+                rows = db.execute(
+                    f'SELECT dev, ino, key, tags FROM file_tags '
+                    f'WHERE (dev, ino) IN '
+                    f'(VALUES {", ".join(("(?, ?)",) * len(chunk))})',
+                    [part for inode in chunk for part in inode],
+                ).fetchall()
+                ret.update(
+                    ((dev, ino), (key, frozenset(tags.split(','))))
+                    for dev, ino, key, tags in rows
+                )
+        return ret
+
+    def mark_file_tags(
+            self,
+            rows: Mapping[tuple[int, int], tuple[str, Iterable[str]]],
+    ) -> None:
+        if self.readonly:  # pragma: win32 no cover
+            return
+        with self.connect() as db:
+            db.executemany(
+                'INSERT OR REPLACE INTO file_tags VALUES (?, ?, ?, ?)',
+                [
+                    (dev, ino, key, ','.join(sorted(tags)))
+                    for (dev, ino), (key, tags) in rows.items()
+                ],
+            )
+
+    def select_passed_files(
+            self,
+            key: str,
+            configs: str,
+            digests: Mapping[str, str],
+    ) -> set[str]:
+        """Return the files which previously passed the hook identified by
+        `key` with exactly these contents (and tool configuration `configs`).
+        """
+        if self.readonly:  # pragma: win32 no cover
+            return set()
+        filenames = sorted(digests)
+        ret: set[str] = set()
+        with self.connect() as db:
+            for i in range(0, len(filenames), 256):
+                chunk = filenames[i:i + 256]
+                rows = db.execute(
+                    f'SELECT filename, digest FROM hook_results '
+                    f'WHERE key = ? AND configs = ? AND '
+                    f'filename IN ({", ".join("?" * len(chunk))})',
+                    (key, configs, *chunk),
+                ).fetchall()
+                ret.update(
+                    filename
+                    for filename, digest in rows
+                    if digests[filename] == digest
+                )
+        return ret
+
+    def mark_files_passed(
+            self,
+            key: str,
+            configs: str,
+            prefix: str,
+            config: str,
+            digests: Mapping[str, str],
+    ) -> None:
+        """Remember that the files passed the hook identified by `key` (of the
+        repository `prefix`, configured in `config`).  The results for an
+        earlier tool configuration can no longer be used and are replaced.
+        """
+        if self.readonly:  # pragma: win32 no cover
+            return
+        with self.connect() as db:
+            db.execute(
+                'DELETE FROM hook_results WHERE key = ? AND configs != ?',
+                (key, configs),
+            )
+            db.executemany(
+                'INSERT OR REPLACE INTO hook_results '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [
+                    (key, configs, prefix, config, filename, digest)
+                    for filename, digest in digests.items()
+                ],
+            )
+
+    def prune_hook_results(self, config: str, keys: Iterable[str]) -> None:
+        """Forget the results of the hooks `config` no longer defines."""
+        if self.readonly:  # pragma: win32 no cover
+            return
+        keys = sorted(set(keys))
+        params = ', '.join('?' * len(keys))
+        with self.connect() as db:
+            db.execute(
+                f'DELETE FROM hook_results '
+                f'WHERE config = ? AND key NOT IN ({params})',
+                (config, *keys),
+            )
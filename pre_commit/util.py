@@ -183,7 +183,7 @@ if sys.platform != 'win32':  # pragma: win32 no cover
 
             pty.close_w()
 
-            buf = b''
+            buf = bytearray()
             while True:
                 try:
                     bts = os.read(pty.r, 4096)
@@ -197,7 +197,7 @@ if sys.platform != 'win32':  # pragma: win32 no cover
                 if not bts:
                     break
 
-        return proc.wait(), buf, None
+        return proc.wait(), bytes(buf), None
 else:  # pragma: no cover
     cmd_output_p = cmd_output_b
 
@@ -15,6 +15,7 @@ from collections.abc import Sequence
 from typing import Any
 from typing import TypeVar
 
+from pre_commit import jobserver
 from pre_commit import parse_shebang
 from pre_commit.util import cmd_output_b
 from pre_commit.util import cmd_output_p
@@ -38,6 +39,41 @@ def cpu_count() -> int:
         return 1
 
 
+def _init_worker(
+        environ: dict[str, str],
+        initializer: Callable[[], object] | None,
+) -> None:
+    os.environ.clear()
+    os.environ.update(environ)
+    if initializer is not None:
+        initializer()
+
+
+def process_pool(
+        jobs: int,
+        *,
+        initializer: Callable[[], object] | None = None,
+) -> concurrent.futures.ProcessPoolExecutor:
+    """A process pool whose workers run with the current `os.environ`.
+
+    A `forkserver` (or `spawn`) worker starts from the environment of when
+    its server started, so the environment is passed along explicitly.  Where
+    possible the workers are forked so they also inherit file descriptors
+    (an outer `make`'s jobserver).
+    """
+    mp_context: multiprocessing.context.BaseContext
+    if 'fork' in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context('fork')
+    else:  # pragma: no cover (windows)
+        mp_context = multiprocessing.get_context()
+    return concurrent.futures.ProcessPoolExecutor(
+        jobs,
+        mp_context=mp_context,
+        initializer=_init_worker,
+        initargs=(dict(os.environ), initializer),
+    )
+
+
 def _environ_size(_env: MutableMapping[str, str] | None = None) -> int:
     environ = _env if _env is not None else getattr(os, 'environb', os.environ)
     size = 8 * len(environ)  # number of pointers in `envp`
@@ -73,44 +109,85 @@ class ArgumentTooLongError(RuntimeError):
     pass
 
 
+def unit_cost(arg: str) -> int:
+    return 1
+
+
+def file_size_cost(arg: str) -> int:
+    """Estimate the work for a file argument: a fixed per-file overhead plus
+    one unit per 4KiB.  Arguments which aren't files only cost the overhead.
+    """
+    try:
+        size = os.stat(arg).st_size
+    except OSError:
+        size = 0
+    return 1 + size // 4096
+
+
 def partition(
         cmd: Sequence[str],
         varargs: Sequence[str],
         target_concurrency: int,
         _max_length: int | None = None,
+        *,
+        work_queue: bool = False,
+        cost: Callable[[str], int] = unit_cost,
 ) -> tuple[tuple[str, ...], ...]:
-    _max_length = _max_length or _get_platform_max_length()
+    """Split `varargs` into commands which each fit on a command line.
 
-    # Generally, we try to partition evenly into at least `target_concurrency`
-    # partitions, but we don't want a bunch of tiny partitions.
-    max_args = max(4, math.ceil(len(varargs) / target_concurrency))
+    By default the arguments are split into about `target_concurrency`
+    partitions of equal `cost`.  With `work_queue`, partitions shrink as the
+    remaining work runs out so that workers pulling them off a queue as they
+    finish end at about the same time even when some arguments are slow.
+    """
+    _max_length = _max_length or _get_platform_max_length()
+    costs = [cost(arg) for arg in varargs]
+    total_cost = remaining_cost = sum(costs)
+
+    def _max_cost() -> int:
+        # Generally, we try to partition evenly into at least
+        # `target_concurrency` partitions, but we don't want a bunch of tiny
+        # partitions.
+        if work_queue:
+            return max(4, math.ceil(remaining_cost / (2 * target_concurrency)))
+        else:
+            return max(4, math.ceil(total_cost / target_concurrency))
 
     cmd = tuple(cmd)
     ret = []
 
     ret_cmd: list[str] = []
+    ret_cost = 0
     # Reversed so arguments are in order
     varargs = list(reversed(varargs))
+    costs.reverse()
 
     total_length = _command_length(*cmd) + 1
+    max_cost = _max_cost()
     while varargs:
         arg = varargs.pop()
+        arg_cost = costs.pop()
 
         arg_length = _command_length(arg) + 1
         if (
                 total_length + arg_length <= _max_length and
-                len(ret_cmd) < max_args
+                (not ret_cmd or ret_cost + arg_cost <= max_cost)
         ):
             ret_cmd.append(arg)
             total_length += arg_length
+            ret_cost += arg_cost
+            remaining_cost -= arg_cost
         elif not ret_cmd:
             raise ArgumentTooLongError(arg)
         else:
             # We've exceeded the length, yield a command
             ret.append(cmd + tuple(ret_cmd))
             ret_cmd = []
+            ret_cost = 0
             total_length = _command_length(*cmd) + 1
             varargs.append(arg)
+            costs.append(arg_cost)
+            max_cost = _max_cost()
 
     ret.append(cmd + tuple(ret_cmd))
 
@@ -134,6 +211,7 @@ def xargs(
         *,
         color: bool = False,
         target_concurrency: int = 1,
+        cost: Callable[[str], int] = unit_cost,
         _max_length: int = _get_platform_max_length(),
         **kwargs: Any,
 ) -> tuple[int, bytes]:
@@ -141,10 +219,11 @@ def xargs(
 
     color: Make a pty if on a platform that supports it
     target_concurrency: Target number of partitions to run concurrently
+    cost: Estimated work for an argument, used to balance partitions
     """
     cmd_fn = cmd_output_p if color else cmd_output_b
     retcode = 0
-    stdout = b''
+    stdout: list[bytes] = []
 
     try:
         cmd = parse_shebang.normalize_cmd(cmd)
@@ -163,14 +242,20 @@ def xargs(
         # expansion inside the batch file
         _max_length = 8192 - len(cmd_exe) - len(' /c ') - 1024
 
-    partitions = partition(cmd, varargs, target_concurrency, _max_length)
+    # more (and shrinking) partitions than threads: the thread pool hands
+    # them out to threads as they become idle
+    partitions = partition(
+        cmd, varargs, target_concurrency, _max_length,
+        work_queue=target_concurrency > 1, cost=cost,
+    )
 
     def run_cmd_partition(
             run_cmd: tuple[str, ...],
     ) -> tuple[int, bytes, bytes | None]:
-        return cmd_fn(
-            *run_cmd, check=False, stderr=subprocess.STDOUT, **kwargs,
-        )
+        with jobserver.token():
+            return cmd_fn(
+                *run_cmd, check=False, stderr=subprocess.STDOUT, **kwargs,
+            )
 
     threads = min(len(partitions), target_concurrency)
     with _thread_mapper(threads) as thread_map:
@@ -179,6 +264,6 @@ def xargs(
         for proc_retcode, proc_out, _ in results:
             if abs(proc_retcode) > abs(retcode):
                 retcode = proc_retcode
-            stdout += proc_out
+            stdout.append(proc_out)
 
-    return retcode, stdout
+    return retcode, b''.join(stdout)
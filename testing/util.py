@@ -41,6 +41,10 @@ def run_opts(
         verbose=False,
         hook=None,
         fail_fast=False,
+        no_cache=False,
+        isolated_worktree=False,
+        shard=None,
+        shard_by_size=False,
         remote_branch='',
         local_branch='',
         from_ref='',
@@ -67,6 +71,10 @@ def run_opts(
         verbose=verbose,
         hook=hook,
         fail_fast=fail_fast,
+        no_cache=no_cache,
+        isolated_worktree=isolated_worktree,
+        shard=shard,
+        shard_by_size=shard_by_size,
         remote_branch=remote_branch,
         local_branch=local_branch,
         from_ref=from_ref,
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import pytest
+
+from pre_commit.all_languages import language_names
+from pre_commit.all_languages import languages
+from pre_commit.languages import python
+
+
+def test_languages_imported_on_access():
+    assert languages['python'] is python
+
+
+def test_languages_unknown():
+    with pytest.raises(KeyError):
+        languages['not-a-language']
+    assert 'not-a-language' not in languages
+
+
+def test_language_names():
+    assert len(languages) == len(language_names)
+    assert 'python' in language_names
+    assert language_names == sorted(language_names)
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import os.path
+import shutil
+import tarfile
+
+import pytest
+
+import pre_commit.constants as C
+from pre_commit import bundle
+from pre_commit.clientlib import load_config
+from pre_commit.commands.install_uninstall import install_hooks
+from pre_commit.errors import FatalError
+from pre_commit.repository import _hook_installed
+from pre_commit.repository import all_hooks
+from pre_commit.store import Store
+from pre_commit.util import cmd_output
+from testing.fixtures import make_config_from_repo
+from testing.fixtures import make_repo
+from testing.fixtures import write_config
+
+
+def _repos(store):
+    with store.connect() as db:
+        return db.execute('SELECT repo, ref, path FROM repos').fetchall()
+
+
+@pytest.fixture
+def python_config(tempdir_factory, in_git_dir):
+    path = make_repo(tempdir_factory, 'python_hooks_repo')
+    write_config('.', make_config_from_repo(path))
+
+
+def test_config_hash(tmpdir):
+    f = tmpdir.join('f')
+    f.write('repos: []\n')
+    assert bundle.config_hash(f.strpath) == bundle.config_hash(f.strpath)
+    before = bundle.config_hash(f.strpath)
+    f.write('repos: [] \n')
+    assert bundle.config_hash(f.strpath) != before
+
+
+def test_export_import_roundtrip(python_config, store, tmpdir, caplog):
+    filename = tmpdir.join('bundle.tar.gz').strpath
+    assert not install_hooks(C.CONFIG_FILE, store, export_bundle=filename)
+    repos = _repos(store)
+
+    # a fresh machine with the same store location
+    shutil.rmtree(store.directory)
+    store = Store(store.directory)
+    caplog.clear()
+    assert not install_hooks(C.CONFIG_FILE, store, import_bundle=filename)
+
+    assert _repos(store) == repos
+    hook, = all_hooks(load_config(C.CONFIG_FILE), store)
+    assert _hook_installed(hook)
+    # nothing was cloned or installed
+    assert caplog.messages == [f'Imported 1 repo(s) from {filename}.']
+
+
+def test_import_clone_does_not_need_the_mirror(python_config, store, tmpdir):
+    filename = tmpdir.join('bundle.tar.gz').strpath
+    assert not install_hooks(C.CONFIG_FILE, store, export_bundle=filename)
+    shutil.rmtree(store.directory)
+
+    store = Store(store.directory)
+    assert not install_hooks(C.CONFIG_FILE, store, import_bundle=filename)
+    assert not os.path.exists(os.path.join(store.directory, 'mirrors'))
+    (_, _, path), = _repos(store)
+    cmd_output('git', 'fsck', '--no-dangling', cwd=path)
+
+
+def test_import_into_different_store_reinstalls_environments(
+        python_config, store, tempdir_factory, tmpdir, caplog,
+):
+    filename = tmpdir.join('bundle.tar.gz').strpath
+    assert not install_hooks(C.CONFIG_FILE, store, export_bundle=filename)
+
+    other = Store(os.path.join(tempdir_factory.get(), '.pre-commit'))
+    bundle.import_bundle(other, bundle.config_hash(C.CONFIG_FILE), filename)
+    assert 'its environments cannot be moved' in caplog.text
+
+    (_, _, path), = _repos(other)
+    assert os.path.exists(os.path.join(path, C.MANIFEST_FILE))
+    hook, = all_hooks(load_config(C.CONFIG_FILE), other)
+    assert not _hook_installed(hook)
+
+
+def test_import_skips_existing_repos(python_config, store, tmpdir, caplog):
+    filename = tmpdir.join('bundle.tar.gz').strpath
+    assert not install_hooks(C.CONFIG_FILE, store, export_bundle=filename)
+    repos = _repos(store)
+
+    bundle.import_bundle(store, bundle.config_hash(C.CONFIG_FILE), filename)
+    assert _repos(store) == repos
+    assert caplog.messages[-1] == f'Imported 0 repo(s) from {filename}.'
+
+
+def test_import_for_different_config_warns(
+        python_config, store, tmpdir, caplog,
+):
+    filename = tmpdir.join('bundle.tar.gz').strpath
+    assert not install_hooks(C.CONFIG_FILE, store, export_bundle=filename)
+
+    bundle.import_bundle(store, 'other', filename)
+    assert 'exported for a different configuration' in caplog.text
+
+
+def test_import_not_a_bundle(store, tmpdir):
+    filename = tmpdir.join('bundle.tar.gz').strpath
+    with tarfile.open(filename, 'w:gz'):
+        pass
+    with pytest.raises(FatalError) as excinfo:
+        bundle.import_bundle(store, 'hash', filename)
+    msg, = excinfo.value.args
+    assert msg == f'{filename} is not a pre-commit bundle'
+
+
+def test_import_unsupported_version(store, tmpdir):
+    tmpdir.join('bundle.json').write('{"version": 9001}')
+    filename = tmpdir.join('bundle.tar.gz').strpath
+    with tarfile.open(filename, 'w:gz') as tar:
+        tar.add(tmpdir.join('bundle.json').strpath, 'bundle.json')
+    with pytest.raises(FatalError) as excinfo:
+        bundle.import_bundle(store, 'hash', filename)
+    msg, = excinfo.value.args
+    assert msg == f'{filename} is an unsupported bundle (version 9001)'
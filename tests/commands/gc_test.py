@@ -4,17 +4,21 @@ import os
 
 import pre_commit.constants as C
 from pre_commit import git
+from pre_commit import lang_base
 from pre_commit.clientlib import load_config
 from pre_commit.commands.autoupdate import autoupdate
 from pre_commit.commands.gc import gc
 from pre_commit.commands.install_uninstall import install_hooks
+from pre_commit.languages import python
 from pre_commit.repository import all_hooks
+from testing.fixtures import git_dir
 from testing.fixtures import make_config_from_repo
 from testing.fixtures import make_repo
 from testing.fixtures import modify_config
 from testing.fixtures import sample_local_config
 from testing.fixtures import sample_meta_config
 from testing.fixtures import write_config
+from testing.util import cwd
 from testing.util import git_commit
 
 
@@ -23,6 +27,11 @@ def _repo_count(store):
         return db.execute('SELECT COUNT(1) FROM repos').fetchone()[0]
 
 
+def _repos(store):
+    with store.connect() as db:
+        return db.execute('SELECT repo, ref, path FROM repos').fetchall()
+
+
 def _config_count(store):
     with store.connect() as db:
         return db.execute('SELECT COUNT(1) FROM configs').fetchone()[0]
@@ -55,8 +64,57 @@ def test_gc(tempdir_factory, store, in_git_dir, cap_out):
     assert _config_count(store) == 1
     assert _repo_count(store) == 1
     assert cap_out.get().splitlines()[-1] == '1 repo(s) removed.'
+    # the mirror is still in use
+    assert len(os.listdir(os.path.join(store.directory, 'mirrors'))) == 1
+    # loaded (and validated) configs are kept until the next `gc`
+    assert not os.path.exists(os.path.join(store.directory, 'loaded'))
 
     _remove_config_assert_cleared(store, cap_out)
+    assert not os.listdir(os.path.join(store.directory, 'mirrors'))
+
+
+def test_gc_removes_hook_results_of_removed_repos(
+        tempdir_factory, store, in_git_dir, cap_out,
+):
+    path = make_repo(tempdir_factory, 'script_hooks_repo')
+    write_config('.', make_config_from_repo(path))
+    store.mark_config_used(C.CONFIG_FILE)
+    assert not install_hooks(C.CONFIG_FILE, store)
+    (repo_path,) = (path for _, _, path in _repos(store))
+
+    other_path = make_repo(tempdir_factory, 'script_hooks_repo')
+    with cwd(git_dir(tempdir_factory)):
+        write_config('.', make_config_from_repo(other_path))
+        store.mark_config_used(C.CONFIG_FILE)
+        other_config = os.path.realpath(C.CONFIG_FILE)
+
+    config = os.path.realpath(C.CONFIG_FILE)
+    store.mark_files_passed('k1', 'c', repo_path, config, {'f': 'digest'})
+    store.mark_files_passed(
+        'k2', 'c', '/some/other/repo', other_config, {'f': 'digest'},
+    )
+
+    os.remove(C.CONFIG_FILE)
+    assert not gc(store)
+    with store.connect() as db:
+        rows = db.execute('SELECT key FROM hook_results').fetchall()
+    assert rows == [('k2',)]
+
+
+def test_gc_removes_hook_results_of_removed_configs(
+        tempdir_factory, store, in_git_dir, cap_out,
+):
+    write_config('.', sample_local_config())
+    store.mark_config_used(C.CONFIG_FILE)
+    config = os.path.realpath(C.CONFIG_FILE)
+    store.mark_files_passed('k1', 'c', '/repo', config, {'f': 'digest'})
+    store.mark_files_passed('k2', 'c', '/repo', '/removed', {'f': 'digest'})
+
+    assert not gc(store)
+    with store.connect() as db:
+        rows = db.execute('SELECT key FROM hook_results').fetchall()
+    assert rows == [('k1',)]
+    assert not os.path.exists(os.path.join(store.directory, '.locks'))
 
 
 def test_gc_repo_not_cloned(tempdir_factory, store, in_git_dir, cap_out):
@@ -98,8 +156,10 @@ def test_gc_unused_local_repo_with_env(store, in_git_dir, cap_out):
     write_config('.', config)
     store.mark_config_used(C.CONFIG_FILE)
 
-    # this causes the repositories to be created
-    all_hooks(load_config(C.CONFIG_FILE), store)
+    # this causes the repositories (and the environment) to be created
+    assert not install_hooks(C.CONFIG_FILE, store)
+    objects = os.path.join(store.directory, 'objects')
+    assert os.listdir(objects)
 
     assert _config_count(store) == 1
     assert _repo_count(store) == 1
@@ -107,8 +167,74 @@ def test_gc_unused_local_repo_with_env(store, in_git_dir, cap_out):
     assert _config_count(store) == 1
     assert _repo_count(store) == 1
     assert cap_out.get().splitlines()[-1] == '0 repo(s) removed.'
+    assert os.listdir(objects)
 
     _remove_config_assert_cleared(store, cap_out)
+    # the environment's files are no longer used
+    assert not os.listdir(objects)
+
+
+def test_gc_local_repo_with_additional_dependencies(
+        store, in_git_dir, cap_out,
+):
+    config = {
+        'repo': 'local',
+        'hooks': [{
+            'id': 'flake8', 'name': 'flake8', 'entry': 'flake8',
+            'types': ['python'], 'language': 'python',
+            'additional_dependencies': ['flake8'],
+        }],
+    }
+    write_config('.', config)
+    store.mark_config_used(C.CONFIG_FILE)
+    # a clone from before checkouts were shared between dependency sets
+    store.make_local(['flake8'])
+
+    all_hooks(load_config(C.CONFIG_FILE), store)
+
+    assert _repo_count(store) == 2
+    assert not gc(store)
+    assert [repo for repo, _, _ in _repos(store)] == ['local']
+    assert cap_out.get().splitlines()[-1] == '1 repo(s) removed.'
+
+
+def _make_env(hook):
+    env = lang_base.environment_dir(
+        hook.prefix, python.ENVIRONMENT_DIR, hook.language_version,
+    )
+    os.makedirs(env)
+    return env
+
+
+def test_gc_removes_environments_of_changed_dependencies(
+        tempdir_factory, store, in_git_dir, cap_out,
+):
+    path = make_repo(tempdir_factory, 'python_hooks_repo')
+    config = make_config_from_repo(path)
+    config['hooks'][0]['additional_dependencies'] = ['flake8']
+    write_config('.', config)
+    store.mark_config_used(C.CONFIG_FILE)
+
+    hook, = all_hooks(load_config(C.CONFIG_FILE), store)
+    # stand in for an installed environment of the old dependencies
+    old_env = _make_env(hook)
+
+    with modify_config() as config:
+        config['repos'][0]['hooks'][0]['additional_dependencies'] = ['pep8']
+    hook, = all_hooks(load_config(C.CONFIG_FILE), store)
+    new_env = _make_env(hook)
+    # environments without additional dependencies are shared by all hooks
+    plain_env = lang_base.environment_dir(
+        hook.prefix, python.ENVIRONMENT_DIR, hook.language_version,
+    ).rsplit('-', 1)[0]
+    os.makedirs(plain_env)
+
+    assert not gc(store)
+    assert _repo_count(store) == 1
+    assert cap_out.get().splitlines()[-1] == '0 repo(s) removed.'
+    assert not os.path.exists(old_env)
+    assert os.path.exists(new_env)
+    assert os.path.exists(plain_env)
 
 
 def test_gc_config_with_missing_hook(
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os.path
+import re
 import shlex
 import sys
 import time
@@ -8,18 +9,32 @@ from collections.abc import MutableMapping
 from unittest import mock
 
 import pytest
+from identify.identify import tags_from_path
 
 import pre_commit.constants as C
 from pre_commit import color
+from pre_commit import fingerprint
+from pre_commit import git
+from pre_commit import lang_base
+from pre_commit.commands import run as run_mod
 from pre_commit.commands.install_uninstall import install
 from pre_commit.commands.run import _compute_cols
 from pre_commit.commands.run import _full_msg
 from pre_commit.commands.run import _get_skips
 from pre_commit.commands.run import _has_unmerged_paths
+from pre_commit.commands.run import _hooks_cache
+from pre_commit.commands.run import _literal_prefix
+from pre_commit.commands.run import _load_hooks
+from pre_commit.commands.run import _run_hook_batch
+from pre_commit.commands.run import _schedule
+from pre_commit.commands.run import _shard_hooks
 from pre_commit.commands.run import _start_msg
 from pre_commit.commands.run import Classifier
 from pre_commit.commands.run import filter_by_include_exclude
 from pre_commit.commands.run import run
+from pre_commit.fingerprint import ModificationDetector
+from pre_commit.repository import install_hook_envs
+from pre_commit.shard import Shard
 from pre_commit.util import cmd_output
 from pre_commit.util import make_executable
 from testing.auto_namedtuple import auto_namedtuple
@@ -525,9 +540,9 @@ def test_checkout_type(cap_out, store, repo_with_passing_hook):
 
 
 def test_has_unmerged_paths(in_merge_conflict):
-    assert _has_unmerged_paths() is True
+    assert _has_unmerged_paths(git.status()) is True
     cmd_output('git', 'add', '.')
-    assert _has_unmerged_paths() is False
+    assert _has_unmerged_paths(git.status()) is False
 
 
 def test_merge_conflict(cap_out, store, in_merge_conflict):
@@ -947,6 +962,52 @@ def test_local_hook_passes(cap_out, store, repo_with_passing_hook):
     )
 
 
+@pytest.mark.parametrize(
+    ('opts', 'environ'),
+    (
+        ({'isolated_worktree': True}, {}),
+        ({}, {'PRE_COMMIT_ISOLATED_WORKTREE': '1'}),
+    ),
+)
+def test_isolated_worktree(
+        cap_out, store, repo_with_passing_hook, opts, environ,
+):
+    config = {
+        'repo': 'local',
+        'hooks': [{
+            'id': 'do_not_commit',
+            'name': 'Block if "DO NOT COMMIT" is found',
+            'entry': 'DO NOT COMMIT',
+            'language': 'pygrep',
+        }],
+    }
+    add_config_to_repo(repo_with_passing_hook, config)
+
+    with open('placeholder.py', 'w') as staged_file:
+        staged_file.write('"""TODO: something"""\n')
+    cmd_output('git', 'add', 'placeholder.py')
+    with open('placeholder.py', 'a') as unstaged_file:
+        unstaged_file.write('# DO NOT COMMIT\n')
+
+    install_env = []
+
+    def _install(*args):
+        install_env.append(os.environ.get('GIT_DIR'))
+        return install_hook_envs(*args)
+
+    with mock.patch.object(run_mod, 'install_hook_envs', _install):
+        ret, printed = _do_run(
+            cap_out, store, repo_with_passing_hook, run_opts(**opts), environ,
+        )
+    assert ret == 0
+    # environments are not installed against the copy
+    assert install_env == [None]
+    assert b'Running hooks on the staged files in ' in printed
+    assert b'Stashing unstaged files' not in printed
+    with open('placeholder.py') as f:
+        assert f.read().endswith('# DO NOT COMMIT\n')
+
+
 def test_local_hook_fails(cap_out, store, repo_with_passing_hook):
     config = {
         'repo': 'local',
@@ -1003,6 +1064,37 @@ def test_error_with_unstaged_config(cap_out, store, modified_config_repo):
     assert ret == 1
 
 
+def test_error_with_unstaged_config_absolute_path(
+        cap_out, store, modified_config_repo,
+):
+    config_file = os.path.join(modified_config_repo, C.CONFIG_FILE)
+    ret, printed = _do_run(
+        cap_out, store, modified_config_repo, run_opts(),
+        config_file=config_file,
+    )
+    assert b'Your pre-commit configuration is unstaged.' in printed
+    assert ret == 1
+
+
+def test_inspects_the_working_directory_once(
+        cap_out, store, repo_with_passing_hook,
+):
+    stage_a_file()
+    status_mock = mock.patch.object(git, 'status', wraps=git.status)
+    staged_mock = mock.patch.object(git, 'get_staged_files')
+    ita_mock = mock.patch.object(git, 'intent_to_add_files')
+    with status_mock as status_mock, staged_mock as staged_mock:
+        with ita_mock as ita_mock:
+            ret, printed = _do_run(
+                cap_out, store, repo_with_passing_hook, run_opts(),
+            )
+    assert ret == 0
+    assert b'Passed' in printed
+    status_mock.assert_called_once_with()
+    staged_mock.assert_not_called()
+    ita_mock.assert_not_called()
+
+
 def test_commit_msg_missing_filename(cap_out, store, repo_with_passing_hook):
     args = run_opts(hook_stage='commit-msg')
     ret, printed = _do_run(cap_out, store, repo_with_passing_hook, args)
@@ -1117,6 +1209,478 @@ def test_fail_fast_run_arg(cap_out, store, repo_with_failing_hook):
     assert printed.count(b'Failing hook') == 1
 
 
+def _sched_hook(hook_id, **kwargs):
+    return auto_namedtuple(**{
+        'id': hook_id,
+        'alias': '',
+        'language': 'system',
+        'always_run': False,
+        'fail_fast': False,
+        'pass_filenames': True,
+        'read_only': False,
+        **kwargs,
+    })
+
+
+def _batch_ids(batches):
+    return [[hook.id for hook, _ in batch] for batch in batches]
+
+
+def test_schedule_read_only_hooks_share_a_batch():
+    hooks = [
+        (_sched_hook('a', read_only=True), ('f.py',)),
+        (_sched_hook('b', language='pygrep'), ('f.py',)),
+        (_sched_hook('c', read_only=True), ('f.py',)),
+    ]
+    ret = _schedule(hooks, set(), jobs=4, fail_fast=False)
+    assert _batch_ids(ret) == [['a', 'b', 'c']]
+
+
+def test_schedule_fixers_sharing_files_are_serialized():
+    hooks = [
+        (_sched_hook('a'), ('f.py',)),
+        (_sched_hook('b'), ('g.py',)),
+        (_sched_hook('c', read_only=True), ('f.py',)),
+        (_sched_hook('d'), ('g.py',)),
+    ]
+    ret = _schedule(hooks, set(), jobs=4, fail_fast=False)
+    assert _batch_ids(ret) == [['a', 'b'], ['c', 'd']]
+
+
+def test_schedule_unknown_files_conflict_with_fixers():
+    hooks = [
+        (_sched_hook('a', read_only=True, pass_filenames=False), ('f.py',)),
+        (_sched_hook('b'), ('g.py',)),
+    ]
+    ret = _schedule(hooks, set(), jobs=4, fail_fast=False)
+    assert _batch_ids(ret) == [['a'], ['b']]
+
+
+def test_schedule_unknown_files_conflict_with_any_fixer():
+    hooks = [
+        (_sched_hook('a', pass_filenames=False), ('f.py',)),
+        (_sched_hook('b'), ('g.py',)),
+        (_sched_hook('c', read_only=True, pass_filenames=False), ('f.py',)),
+        (_sched_hook('d', read_only=True), ('g.py',)),
+    ]
+    ret = _schedule(hooks, set(), jobs=4, fail_fast=False)
+    assert _batch_ids(ret) == [['a'], ['b'], ['c', 'd']]
+
+
+def test_schedule_skipped_hooks_do_not_split_batches():
+    hooks = [
+        (_sched_hook('a', read_only=True), ('f.py',)),
+        (_sched_hook('b'), ('f.py',)),
+        (_sched_hook('c', read_only=True), ()),
+        (_sched_hook('d', read_only=True), ('f.py',)),
+    ]
+    ret = _schedule(hooks, {'b'}, jobs=4, fail_fast=False)
+    assert _batch_ids(ret) == [['a', 'b', 'c', 'd']]
+
+
+@pytest.mark.parametrize('kwargs', ({'jobs': 1}, {'fail_fast': True}))
+def test_schedule_serial(kwargs):
+    hooks = [
+        (_sched_hook('a', read_only=True), ('f.py',)),
+        (_sched_hook('b', read_only=True), ('f.py',)),
+    ]
+    kwargs = {'jobs': 4, 'fail_fast': False, **kwargs}
+    ret = _schedule(hooks, set(), **kwargs)
+    assert _batch_ids(ret) == [['a'], ['b']]
+
+
+def test_schedule_fail_fast_hook_ends_batch():
+    hooks = [
+        (_sched_hook('a', read_only=True, fail_fast=True), ('f.py',)),
+        (_sched_hook('b', read_only=True), ('f.py',)),
+    ]
+    ret = _schedule(hooks, set(), jobs=4, fail_fast=False)
+    assert _batch_ids(ret) == [['a'], ['b']]
+
+
+def test_run_hook_batch_splits_concurrency(tmpdir):
+    pool = mock.Mock()
+    pool.submit.return_value.result.return_value = (0, b'', 0)
+    kwargs = {
+        'read_only': True, 'verbose': False, 'require_serial': False,
+        'src': 'local', 'log_file': '',
+    }
+    batch = [
+        (_sched_hook('a', name='a', **kwargs), ('f',)),
+        (_sched_hook('b', name='b', **kwargs), ('f',)),
+    ]
+    with tmpdir.as_cwd(), mock.patch.object(
+            lang_base, 'target_concurrency', return_value=4,
+    ):
+        tmpdir.join('f').ensure()
+        _run_hook_batch(
+            pool, batch, set(), 80, ModificationDetector(), None,
+            verbose=False, use_color=False,
+        )
+    assert [call[0][4] for call in pool.submit.call_args_list] == [2, 2]
+
+
+def _timed_hook(hook_id, log, **kwargs):
+    code = (
+        'import sys, time\n'
+        'with open(sys.argv[1], "a") as f:\n'
+        '    f.write(sys.argv[2] + " start\\n")\n'
+        'time.sleep(.5)\n'
+        'with open(sys.argv[1], "a") as f:\n'
+        '    f.write(sys.argv[2] + " end\\n")\n'
+    )
+    return {
+        'id': hook_id,
+        'name': hook_id,
+        'entry': shlex.quote(sys.executable),
+        'args': ['-c', code, log, hook_id],
+        'language': 'system',
+        'pass_filenames': False,
+        'always_run': True,
+        **kwargs,
+    }
+
+
+def test_run_hooks_overlap(cap_out, store, repo_with_passing_hook, tmpdir):
+    log = tmpdir.join('log').strpath
+    config = {
+        'repo': 'local',
+        'hooks': [
+            _timed_hook('a', log, read_only=True),
+            _timed_hook('b', log, read_only=True),
+        ],
+    }
+    add_config_to_repo(repo_with_passing_hook, config)
+
+    with mock.patch.object(lang_base, 'target_concurrency', return_value=4):
+        ret, printed = _do_run(
+            cap_out, store, repo_with_passing_hook, run_opts(),
+        )
+    assert ret == 0, printed
+    with open(log) as f:
+        lines = f.read().splitlines()
+    # both started before either finished
+    assert sorted(lines[:2]) == ['a start', 'b start']
+
+
+def test_hook_without_filenames_modifying_other_files(
+        cap_out, store, repo_with_passing_hook,
+):
+    config = {
+        'repo': 'local',
+        'hooks': [{
+            'id': 'generate',
+            'name': 'generate',
+            'entry': shlex.quote(sys.executable),
+            'args': [
+                '-c', 'open("generated.txt", "a").write("more\\n")',
+            ],
+            'language': 'system',
+            'pass_filenames': False,
+        }],
+    }
+    add_config_to_repo(repo_with_passing_hook, config)
+    with cwd(repo_with_passing_hook):
+        with open('generated.txt', 'w') as f:
+            f.write('generated\n')
+        cmd_output('git', 'add', 'generated.txt')
+        git.commit()
+        stage_a_file()
+
+    ret, printed = _do_run(cap_out, store, repo_with_passing_hook, run_opts())
+    assert ret == 1
+    assert b'- files were modified by this hook' in printed
+
+
+def test_run_conflicting_hooks_serially(
+        cap_out, store, repo_with_passing_hook, tmpdir,
+):
+    log = tmpdir.join('log').strpath
+    config = {
+        'repo': 'local',
+        'hooks': [_timed_hook('a', log), _timed_hook('b', log)],
+    }
+    add_config_to_repo(repo_with_passing_hook, config)
+    stage_a_file()
+
+    with mock.patch.object(lang_base, 'target_concurrency', return_value=4):
+        ret, printed = _do_run(
+            cap_out, store, repo_with_passing_hook, run_opts(),
+        )
+    assert ret == 0, printed
+    with open(log) as f:
+        lines = f.read().splitlines()
+    assert lines == ['a start', 'a end', 'b start', 'b end']
+
+
+def test_run_hooks_concurrently(cap_out, store, repo_with_passing_hook):
+    config = {
+        'repo': 'local',
+        'hooks': [
+            {
+                'id': 'no-todo',
+                'name': 'no todo',
+                'entry': 'TODO',
+                'language': 'pygrep',
+            },
+            {
+                'id': 'no-fixme',
+                'name': 'no fixme',
+                'entry': 'FIXME',
+                'language': 'pygrep',
+            },
+            {
+                'id': 'identity-copy',
+                'name': 'identity copy',
+                'entry': '{} -m pre_commit.meta_hooks.identity'.format(
+                    shlex.quote(sys.executable),
+                ),
+                'language': 'system',
+                'read_only': True,
+            },
+        ],
+    }
+    add_config_to_repo(repo_with_passing_hook, config)
+
+    with open('placeholder.py', 'w') as staged_file:
+        staged_file.write('"""TODO: something"""\n')
+    cmd_output('git', 'add', 'placeholder.py')
+
+    with mock.patch.object(lang_base, 'target_concurrency', return_value=4):
+        ret, printed = _do_run(
+            cap_out, store, repo_with_passing_hook, run_opts(),
+        )
+    assert ret == 1
+    # output is still reported in config order
+    todo = printed.index(b'no todo...')
+    fixme = printed.index(b'no fixme...')
+    identity = printed.index(b'identity copy...')
+    assert todo < fixme < identity
+    assert b'placeholder.py:1:"""TODO: something"""' in printed
+
+
+def _opt_into_cache():
+    with modify_config() as config:
+        for hook in config['repos'][0]['hooks']:
+            hook['cache'] = True
+
+
+def test_files_are_not_cached_by_default(
+        cap_out, store, repo_with_passing_hook,
+):
+    stage_a_file()
+    for _ in range(2):
+        ret, printed = _do_run(
+            cap_out, store, repo_with_passing_hook, run_opts(),
+        )
+        assert ret == 0
+        assert b'(unchanged files)' not in printed
+
+
+def test_unchanged_files_are_cached(cap_out, store, repo_with_passing_hook):
+    _opt_into_cache()
+    stage_a_file()
+    ret, printed = _do_run(cap_out, store, repo_with_passing_hook, run_opts())
+    assert ret == 0
+    assert b'Bash hook' in printed
+    assert b'(unchanged files)' not in printed
+
+    ret, printed = _do_run(cap_out, store, repo_with_passing_hook, run_opts())
+    assert ret == 0
+    assert printed.startswith(b'Bash hook...')
+    assert printed.endswith(b'...(unchanged files)Passed\n')
+
+    # modifying the file invalidates the cache
+    with open('foo.py', 'w') as f:
+        f.write('print("hello world")\n')
+    cmd_output('git', 'add', 'foo.py')
+    ret, printed = _do_run(cap_out, store, repo_with_passing_hook, run_opts())
+    assert ret == 0
+    assert b'(unchanged files)' not in printed
+
+
+@pytest.mark.parametrize(
+    'config',
+    ('setup.cfg', 'eslint.config.mjs', 'sub/pyproject.toml', 'sub/.eslintrc'),
+)
+def test_tool_config_change_invalidates_cache(
+        cap_out, store, repo_with_passing_hook, config,
+):
+    _opt_into_cache()
+    stage_a_file()
+    for _ in range(2):
+        ret, printed = _do_run(
+            cap_out, store, repo_with_passing_hook, run_opts(),
+        )
+        assert ret == 0
+    assert b'(unchanged files)' in printed
+
+    os.makedirs('sub', exist_ok=True)
+    with open(config, 'w') as f:
+        f.write('changed\n')
+    cmd_output('git', 'add', config)
+    ret, printed = _do_run(cap_out, store, repo_with_passing_hook, run_opts())
+    assert ret == 0
+    assert b'(unchanged files)' not in printed
+
+
+@pytest.mark.parametrize(
+    ('filename', 'expected'),
+    (
+        ('.flake8', True),
+        ('sub/.eslintrc.json', True),
+        ('setup.cfg', True),
+        ('sub/pyproject.toml', True),
+        ('web/eslint.config.cjs', True),
+        ('web/package.json', True),
+        ('tsconfig.build.json', True),
+        ('renovate.json', True),
+        ('sub/data.json', False),
+        ('foo.py', False),
+        ('sub/.github/workflows/main.yml', False),
+    ),
+)
+def test_is_config(filename, expected):
+    assert run_mod._is_config(filename) is expected
+
+
+def test_cache_forgets_changed_hooks(cap_out, store, repo_with_passing_hook):
+    def _keys():
+        with store.connect() as db:
+            query = 'SELECT DISTINCT key FROM hook_results'
+            return db.execute(query).fetchall()
+
+    _opt_into_cache()
+    stage_a_file()
+    _do_run(cap_out, store, repo_with_passing_hook, run_opts())
+    before = _keys()
+    assert len(before) == 1
+
+    with modify_config(commit=False) as config:
+        config['repos'][0]['hooks'][0]['args'] = ['--changed']
+    cmd_output('git', 'add', C.CONFIG_FILE)
+    _do_run(cap_out, store, repo_with_passing_hook, run_opts())
+    after = _keys()
+    assert len(after) == 1
+    assert after != before
+
+
+def test_no_cache(cap_out, store, repo_with_passing_hook):
+    _opt_into_cache()
+    stage_a_file()
+    for _ in range(2):
+        ret, printed = _do_run(
+            cap_out, store, repo_with_passing_hook, run_opts(no_cache=True),
+        )
+        assert ret == 0
+        assert b'(unchanged files)' not in printed
+
+
+def test_require_serial_hooks_are_not_cached(
+        cap_out, store, repo_with_passing_hook,
+):
+    with modify_config() as config:
+        for hook in config['repos'][0]['hooks']:
+            hook['cache'] = True
+            hook['require_serial'] = True
+    stage_a_file()
+    for _ in range(2):
+        ret, printed = _do_run(
+            cap_out, store, repo_with_passing_hook, run_opts(),
+        )
+        assert ret == 0
+        assert b'(unchanged files)' not in printed
+
+
+def test_failures_are_not_cached(cap_out, store, repo_with_failing_hook):
+    _opt_into_cache()
+    stage_a_file()
+    for _ in range(2):
+        ret, printed = _do_run(
+            cap_out, store, repo_with_failing_hook, run_opts(),
+        )
+        assert ret == 1
+        assert b'(unchanged files)' not in printed
+
+
+def test_load_hooks_cached_until_config_changes(in_git_dir, store):
+    def _config(hook_id):
+        hook = {
+            'id': hook_id, 'name': hook_id, 'entry': 'true',
+            'language': 'system',
+        }
+        write_config('.', {'repo': 'local', 'hooks': [hook]})
+        # as if it were not modified just now
+        os.utime(C.CONFIG_FILE, ns=(0, len(hook_id)))
+
+    with mock.patch.dict(_hooks_cache, clear=True):
+        _config('a')
+        _, hooks = _load_hooks(C.CONFIG_FILE, store)
+        assert _load_hooks(C.CONFIG_FILE, store)[1] is hooks
+
+        _config('bb')
+        _, hooks = _load_hooks(C.CONFIG_FILE, store)
+        assert [hook.id for hook in hooks] == ['bb']
+
+
+def test_load_hooks_cached_until_environment_changes(in_git_dir, store):
+    hook = {
+        'id': 'a', 'name': 'a', 'entry': 'true', 'language': 'system',
+    }
+    write_config('.', {'repo': 'local', 'hooks': [hook]})
+    os.utime(C.CONFIG_FILE, ns=(0, 0))
+
+    with mock.patch.dict(_hooks_cache, clear=True):
+        _, hooks = _load_hooks(C.CONFIG_FILE, store)
+        assert _load_hooks(C.CONFIG_FILE, store)[1] is hooks
+
+        path = os.pathsep.join(('/opt/python/bin', os.environ['PATH']))
+        with mock.patch.dict(os.environ, {'PATH': path}):
+            assert _load_hooks(C.CONFIG_FILE, store)[1] is not hooks
+        with mock.patch.dict(os.environ, {'PRE_COMMIT_USE_MAMBA': '1'}):
+            assert _load_hooks(C.CONFIG_FILE, store)[1] is not hooks
+        # unrelated variables do not matter
+        with mock.patch.dict(os.environ, {'OLDPWD': '/'}):
+            assert _load_hooks(C.CONFIG_FILE, store)[1] is hooks
+
+
+def test_shard_hooks():
+    all_filenames = tuple(f'f{i}.py' for i in range(20))
+    hooks = [
+        (_sched_hook('files'), all_filenames),
+        (_sched_hook('always', always_run=True), ()),
+        (_sched_hook('no_files', pass_filenames=False), all_filenames),
+    ]
+    seen: list[str] = []
+    for index in (1, 2):
+        shard = Shard(index, 2)
+        ret = _shard_hooks(hooks, all_filenames, shard, by_size=False)
+        if index == 1:
+            (_, files), (_, always), (_, no_files) = ret
+            assert always == ()
+            assert no_files == all_filenames
+        else:
+            (_, files), = ret
+        seen.extend(files)
+    assert sorted(seen) == sorted(all_filenames)
+
+
+def test_shard_hooks_same_id():
+    all_filenames = tuple(f'f{i}.py' for i in range(20))
+    hooks = [
+        (_sched_hook('h', pass_filenames=False), all_filenames),
+        (_sched_hook('h'), all_filenames),
+    ]
+    seen: list[str] = []
+    for index in (1, 2):
+        shard = Shard(index, 2)
+        ret = _shard_hooks(hooks, all_filenames, shard, by_size=False)
+        *_, (_, files) = ret
+        seen.extend(files)
+    # the hook passed filenames still checks every file on some shard
+    assert sorted(seen) == sorted(all_filenames)
+
+
 def test_classifier_removes_dne():
     classifier = Classifier(('this_file_does_not_exist',))
     assert classifier.filenames == []
@@ -1139,6 +1703,156 @@ def test_classifier_does_not_normalize_backslashes_non_windows(tmpdir):
                 assert classifier.filenames == [r'a/b\c']
 
 
+def _classify(filenames, store):
+    classifier = Classifier(filenames)
+    with mock.patch.object(
+            run_mod, 'tags_from_path', side_effect=tags_from_path,
+    ) as tags_mock:
+        classifier.classify(store)
+    tags = {f: classifier._types_for_file(f) for f in classifier.filenames}
+    return tags, sorted(call[0][0] for call in tags_mock.call_args_list)
+
+
+def test_classifier_remembers_tags(tmpdir, store):
+    tmpdir.join('a.py').write('print("hi")\n')
+    tmpdir.join('b.png').write_binary(b'\x89PNG')
+    tmpdir.join('d').ensure_dir()
+    with tmpdir.as_cwd(), mock.patch.object(fingerprint, '_RACY_NS', 0):
+        tags, identified = _classify(('a.py', 'b.png', 'd'), store)
+        # directories (and such) are identified by `lstat` as they are needed
+        assert identified == ['a.py', 'b.png']
+        assert tags == {
+            'a.py': tags_from_path('a.py'),
+            'b.png': tags_from_path('b.png'),
+            'd': {'directory'},
+        }
+
+        assert _classify(('a.py', 'b.png', 'd'), store) == (tags, [])
+
+        tmpdir.join('a.py').write('#!/usr/bin/env python3\nprint("hi")\n')
+        tags, identified = _classify(('a.py', 'b.png'), store)
+        assert identified == ['a.py']
+        assert tags['a.py'] == tags_from_path('a.py')
+
+
+def test_classifier_does_not_remember_racy_files(tmpdir, store):
+    tmpdir.join('a.py').ensure()
+    with tmpdir.as_cwd():
+        assert _classify(('a.py',), store)[1] == ['a.py']
+        assert _classify(('a.py',), store)[1] == ['a.py']
+
+
+def test_classifier_identifies_concurrently(tmpdir, store):
+    filenames = [f'f{i}.py' for i in range(200)]
+    for filename in filenames:
+        tmpdir.join(filename).ensure()
+    with tmpdir.as_cwd():
+        with mock.patch.object(
+                lang_base, 'target_concurrency', return_value=4,
+        ):
+            tags, identified = _classify(filenames, store)
+    assert identified == sorted(filenames)
+    assert set(map(frozenset, tags.values())) == {
+        frozenset({'file', 'text', 'python', 'non-executable'}),
+    }
+
+
+def _filter_hook(**kwargs):
+    return auto_namedtuple(**{
+        'files': '',
+        'exclude': '^$',
+        'types': ['file'],
+        'types_or': [],
+        'exclude_types': [],
+        **kwargs,
+    })
+
+
+def test_classifier_filenames_for_hook(tmpdir):
+    for filename in ('a.py', 'b.py', 'c.txt', 'd/e.py'):
+        tmpdir.join(filename).ensure()
+    with tmpdir.as_cwd():
+        classifier = Classifier(('a.py', 'b.py', 'c.txt', 'd/e.py', 'd'))
+        ret = classifier.filenames_for_hook(_filter_hook())
+        assert ret == ('a.py', 'b.py', 'c.txt', 'd/e.py')
+        ret = classifier.filenames_for_hook(
+            _filter_hook(files=r'\.py$', exclude='^d/'),
+        )
+        assert ret == ('a.py', 'b.py')
+        ret = classifier.filenames_for_hook(_filter_hook(exclude='^b'))
+        assert ret == ('a.py', 'c.txt', 'd/e.py')
+        ret = classifier.filenames_for_hook(_filter_hook(types=['python']))
+        assert ret == ('a.py', 'b.py', 'd/e.py')
+
+
+def test_classifier_filenames_for_hook_shared_between_hooks(tmpdir):
+    tmpdir.join('a.py').ensure()
+    tmpdir.join('b.txt').ensure()
+    with tmpdir.as_cwd():
+        classifier = Classifier(('a.py', 'b.txt'))
+        with mock.patch.object(
+                re, 'compile', wraps=re.compile,
+        ) as compile_mock:
+            ret1 = classifier.filenames_for_hook(
+                _filter_hook(files=r'\.py$', types=['file', 'python']),
+            )
+            ret2 = classifier.filenames_for_hook(
+                _filter_hook(files=r'\.py$', types=['python', 'file']),
+            )
+            ret3 = classifier.filenames_for_hook(
+                _filter_hook(files=r'\.py$', types=['text']),
+            )
+    assert ret1 == ret3 == ('a.py',)
+    assert ret1 is ret2
+    assert sorted(call[0][0] for call in compile_mock.call_args_list) == [
+        r'\.py$', '^$',
+    ]
+
+
+@pytest.mark.parametrize(
+    ('pattern', 'expected'),
+    (
+        ('', ''),
+        (r'\.py$', ''),
+        ('^$', ''),
+        (r'^services/payments/.*\.py$', 'services/payments/'),
+        (r'\Asrc/', 'src/'),
+        (r'^docs\/a\-b\.md$', 'docs/a-b.md'),
+        ('^src/(a|b)/', 'src/'),
+        ('^src/[|]', 'src/'),
+        ('^src/[]|]', 'src/'),
+        (r'^src/\|', 'src/|'),
+        ('^src/|^tests/', ''),
+        ('^src/a?b', 'src/'),
+        ('^src/a*', 'src/'),
+        ('^src/a{2}', 'src/'),
+        (r'^src/\d', 'src/'),
+        ('(?i)^src/', ''),
+        ('^(?i:src)/', ''),
+    ),
+)
+def test_literal_prefix(pattern, expected):
+    assert _literal_prefix(pattern) == expected
+
+
+def test_classifier_anchored_files_only_searches_their_directory(tmpdir):
+    filenames = (
+        'z.py', 'a/b.py', 'a.py', 'a/c/d.py', 'ab/e.py', 'a/f.txt', 'a/0.py',
+    )
+    for filename in filenames:
+        tmpdir.join(filename).ensure()
+    with tmpdir.as_cwd():
+        classifier = Classifier(filenames)
+        pattern = mock.Mock(wraps=re.compile(r'^a/.*\.py$'))
+        classifier._patterns[r'^a/.*\.py$'] = pattern
+        ret = classifier.filenames_for_hook(
+            _filter_hook(files=r'^a/.*\.py$', exclude='^a/c/'),
+        )
+    assert ret == ('a/b.py', 'a/0.py')
+    searched = [call[0][0] for call in pattern.search.call_args_list]
+    assert searched == ['a/0.py', 'a/b.py', 'a/c/d.py', 'a/f.txt']
+
+
 def test_classifier_empty_types_or(tmpdir):
     tmpdir.join('bar').ensure()
     os.symlink(tmpdir.join('bar'), tmpdir.join('foo'))
@@ -199,7 +199,9 @@ def mock_store_dir(tempdir_factory):
 
 @pytest.fixture
 def store(tempdir_factory):
-    yield Store(os.path.join(tempdir_factory.get(), '.pre-commit'))
+    store = Store(os.path.join(tempdir_factory.get(), '.pre-commit'))
+    yield store
+    store.close()
 
 
 class Fixture:
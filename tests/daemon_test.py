@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from unittest import mock
+
+import pytest
+
+import pre_commit.constants as C
+from pre_commit import daemon
+from pre_commit.commands import run
+from testing.fixtures import write_config
+from testing.util import cwd
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == 'win32', reason='no unix sockets on windows',
+)
+
+
+def test_socket_path_per_repository():
+    assert daemon.socket_path('a') == daemon.socket_path('a')
+    assert daemon.socket_path('a') != daemon.socket_path('b')
+
+
+def test_socket_path_in_store(tmpdir):
+    with mock.patch.dict(os.environ, {'PRE_COMMIT_HOME': str(tmpdir)}):
+        path = daemon.socket_path('.')
+    assert os.path.dirname(path) == str(tmpdir)
+
+
+@pytest.mark.parametrize(
+    ('env', 'argv'),
+    (
+        ({}, ['hook-impl']),
+        ({'PRE_COMMIT_DAEMON': '1'}, []),
+        ({'PRE_COMMIT_DAEMON': '1'}, ['run']),
+    ),
+)
+def test_maybe_forward_not_enabled(env, argv):
+    with mock.patch.dict(os.environ, env), mock.patch.object(
+            daemon, 'forward', side_effect=AssertionError,
+    ):
+        assert daemon.maybe_forward(argv) is None
+
+
+def test_forward_without_server_spawns_one(tmpdir):
+    path = tmpdir.join('d.sock').strpath
+    with mock.patch.object(subprocess, 'Popen') as popen:
+        assert daemon.forward(path, ['--version']) is None
+    (cmd,), _ = popen.call_args
+    assert cmd == (sys.executable, '-mpre_commit.daemon', path)
+
+
+@pytest.fixture
+def server(tmpdir):
+    path = tmpdir.join('d.sock').strpath
+    proc = subprocess.Popen((sys.executable, '-mpre_commit.daemon', path))
+    try:
+        for _ in range(200):
+            if os.path.exists(path):
+                break
+            time.sleep(.05)
+        else:
+            raise AssertionError('server did not start')
+        yield path
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def test_forward(server, capfd):
+    assert daemon.forward(server, ['--version']) == 0
+    assert capfd.readouterr().out == f'pre-commit {C.VERSION}\n'
+
+
+def test_forward_exit_code_and_cwd(server, tmpdir, capfd):
+    with tmpdir.as_cwd():
+        ret = daemon.forward(server, ['validate-config', 'missing.yaml'])
+    assert ret == 1
+    assert 'missing.yaml' in capfd.readouterr().out
+
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    else:
+        return True
+
+
+def test_disconnect_interrupts_hooks(server, in_git_dir):
+    pidfile = in_git_dir.join('pid')
+    config = {
+        'repo': 'local',
+        'hooks': [{
+            'id': 'slow',
+            'name': 'slow',
+            'entry': f'sh -c "echo $$ > {pidfile}; exec sleep 60"',
+            'language': 'system',
+            'always_run': True,
+            'pass_filenames': False,
+        }],
+    }
+    write_config('.', config)
+    subprocess.check_call(('git', 'add', C.CONFIG_FILE))
+
+    # as `forward` does, then "^C" by disconnecting
+    request = {
+        'argv': ['run'], 'cwd': os.getcwd(), 'env': {**os.environ},
+    }
+    payload = json.dumps(request).encode()
+    with open(os.devnull, 'r+b') as devnull:
+        fds = [devnull.fileno()] * 3
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(server)
+            socket.send_fds(sock, [daemon._HEADER.pack(len(payload))], fds)
+            sock.sendall(payload)
+            for _ in range(400):
+                if pidfile.exists() and pidfile.read().strip():
+                    break
+                time.sleep(.05)
+            else:
+                raise AssertionError('hook did not start')
+            pid = int(pidfile.read())
+            assert _running(pid)
+
+    for _ in range(200):
+        if not _running(pid):
+            break
+        time.sleep(.05)
+    else:
+        os.kill(pid, signal.SIGKILL)
+        raise AssertionError('hook was not interrupted')
+
+
+def test_warm_loads_hooks(tempdir_factory, store):
+    git_path = tempdir_factory.get()
+    subprocess.check_call(('git', 'init', '-q', git_path))
+    config = {
+        'repos': [{
+            'repo': 'local',
+            'hooks': [{
+                'id': 'echo',
+                'name': 'echo',
+                'entry': 'echo',
+                'language': 'system',
+            }],
+        }],
+    }
+    write_config(git_path, config)
+    # avoid the config looking "racily" modified
+    os.utime(os.path.join(git_path, C.CONFIG_FILE), ns=(0, 0))
+
+    request = {
+        'argv': ['hook-impl', f'--config={C.CONFIG_FILE}'],
+        'cwd': git_path,
+        'env': {**os.environ, 'PRE_COMMIT_HOME': store.directory},
+    }
+    with mock.patch.dict(run._hooks_cache, clear=True):
+        with cwd(str(tempdir_factory.get())):
+            daemon._warm(request)
+        (hooks_key, (_, hooks)), = run._hooks_cache.items()
+    assert hooks_key[0] == os.path.realpath(
+        os.path.join(git_path, C.CONFIG_FILE),
+    )
+    assert [hook.id for hook in hooks] == ['echo']
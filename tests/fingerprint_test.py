@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+from pre_commit import fingerprint
+from pre_commit.fingerprint import ModificationDetector
+from pre_commit.util import cmd_output
+
+
+@pytest.fixture
+def not_racy():
+    with mock.patch.object(fingerprint, '_RACY_NS', 0):
+        yield
+
+
+@pytest.fixture
+def f(in_git_dir):
+    f = in_git_dir.join('f')
+    f.write('hello')
+    cmd_output('git', 'add', 'f')
+    yield f
+
+
+def test_unmodified(f, not_racy):
+    detector = ModificationDetector()
+    before = detector.snapshot(('f',))
+    assert detector.modified(before) == []
+
+
+def test_unmodified_files_are_not_read(f, not_racy):
+    detector = ModificationDetector()
+    with mock.patch.object(fingerprint, 'file_digest') as digest_mck:
+        before = detector.snapshot(('f',))
+        assert detector.modified(before) == []
+    digest_mck.assert_not_called()
+
+
+def test_modified_contents(f, not_racy):
+    detector = ModificationDetector()
+    before = detector.snapshot(('f',))
+    f.write('world')
+    assert detector.modified(before) == ['f']
+
+
+def test_rewritten_with_same_contents_is_not_modified(f, not_racy):
+    detector = ModificationDetector()
+    before = detector.snapshot(('f',))
+    os.utime(f.strpath, ns=(0, 0))
+    f.write('hello')
+    assert detector.modified(before) == []
+
+
+def test_modified_unstaged_file(f, not_racy):
+    f.write('unstaged')
+    detector = ModificationDetector()
+    before = detector.snapshot(('f',))
+    f.write('modified')
+    assert detector.modified(before) == ['f']
+
+
+def test_unstaged_file_rewritten_with_same_contents(f, not_racy):
+    f.write('unstaged')
+    detector = ModificationDetector()
+    before = detector.snapshot(('f',))
+    os.utime(f.strpath, ns=(0, 0))
+    f.write('unstaged')
+    assert detector.modified(before) == []
+
+
+def test_modified_file_compared_by_contents_afterwards(f, not_racy):
+    detector = ModificationDetector()
+    before = detector.snapshot(('f',))
+    f.write('world')
+    assert detector.modified(before) == ['f']
+
+    before = detector.snapshot(('f',))
+    os.utime(f.strpath, ns=(0, 0))
+    f.write('world')
+    assert detector.modified(before) == []
+
+
+def test_racy_same_stat_modification_detected(f):
+    st = os.stat(f.strpath)
+    detector = ModificationDetector()
+    before = detector.snapshot(('f',))
+    # same size and timestamp as before
+    f.write('world')
+    os.utime(f.strpath, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert detector.modified(before) == ['f']
+
+
+def test_deleted_file_is_modified(f, not_racy):
+    detector = ModificationDetector()
+    before = detector.snapshot(('f',))
+    f.remove()
+    assert detector.modified(before) == ['f']
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='no chmod on windows')
+def test_mode_change_is_modified(f, not_racy):  # pragma: win32 no cover
+    detector = ModificationDetector()
+    before = detector.snapshot(('f',))
+    f.chmod(0o755)
+    assert detector.modified(before) == ['f']
+
+
+def test_diff_modified(f, in_git_dir):
+    in_git_dir.join('g').write('hello')
+    cmd_output('git', 'add', 'g')
+    detector = ModificationDetector()
+
+    before = detector.snapshot_diff()
+    assert detector.diff_modified(before) is False
+
+    in_git_dir.join('g').write('world')
+    assert detector.diff_modified(before) is True
@@ -261,6 +261,16 @@ def test_intent_to_add(in_git_dir):
     assert git.intent_to_add_files() == ['a']
 
 
+def test_get_tracked_files(in_git_dir):
+    in_git_dir.join('a').ensure()
+    in_git_dir.join('b*').ensure()
+    in_git_dir.join('c').ensure()
+    cmd_output('git', 'add', 'a', 'b*')
+
+    ret = git.get_tracked_files(('a', 'b*', 'c', '.git/COMMIT_EDITMSG'))
+    assert ret == ['a', 'b*']
+
+
 def test_status_output_with_rename(in_git_dir):
     in_git_dir.join('a').write('1\n2\n3\n4\n5\n6\n7\n8\n9\n10\n')
     cmd_output('git', 'add', 'a')
@@ -272,6 +282,43 @@ def test_status_output_with_rename(in_git_dir):
     assert git.intent_to_add_files() == ['c']
 
 
+def test_status(in_git_dir):
+    for filename in ('a', 'b', 'c', 'd', 'e', 'f g'):
+        in_git_dir.join(filename).write(f'{filename}\n')
+    cmd_output('git', 'add', '.')
+    git_commit()
+
+    cmd_output('git', 'mv', 'a', 'a2')
+    in_git_dir.join('b').write('staged\n')
+    cmd_output('git', 'add', 'b')
+    in_git_dir.join('b').write('unstaged\n')
+    in_git_dir.join('c').write('unstaged\n')
+    in_git_dir.join('d').remove()
+    cmd_output('git', 'rm', '--cached', '-q', 'e')
+    in_git_dir.join('f g').write('staged\n')
+    cmd_output('git', 'add', 'f g')
+    in_git_dir.join('h').ensure()
+    cmd_output('git', 'add', '--intent-to-add', 'h')
+    in_git_dir.join('untracked').ensure()
+
+    assert git.status() == git.Status(
+        staged=['a2', 'b', 'f g'],
+        unstaged=['b', 'c', 'd'],
+        intent_to_add=['h'],
+        unmerged=[],
+    )
+
+
+def test_status_unmerged(in_merge_conflict):
+    assert git.status().unmerged == ['conflict_file']
+
+
+def test_status_non_ascii(non_ascii_repo):
+    non_ascii_repo.join('интервью').write('hi')
+    cmd_output('git', 'add', '.')
+    assert git.status().staged == ['интервью']
+
+
 def test_no_git_env():
     env = {
         'http_proxy': 'http://myproxy:80',
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+from pre_commit import jobserver
+from pre_commit import xargs
+from pre_commit.envcontext import envcontext
+from pre_commit.envcontext import UNSET
+
+skip_win32 = pytest.mark.skipif(
+    sys.platform == 'win32', reason='jobserver is not supported on windows',
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_jobservers():
+    with mock.patch.dict(jobserver._jobservers, clear=True):
+        with envcontext((('MAKEFLAGS', UNSET),)):
+            yield
+
+
+@pytest.fixture
+def pipe():
+    r, w = os.pipe()
+    try:
+        yield r, w
+    finally:
+        os.close(r)
+        os.close(w)
+
+
+def _available(server):
+    os.set_blocking(server.r, False)
+    try:
+        n = 0
+        while True:
+            try:
+                os.read(server.r, 1)
+            except BlockingIOError:
+                break
+            else:
+                n += 1
+        os.write(server.w, b'+' * n)
+        return n
+    finally:
+        os.set_blocking(server.r, True)
+
+
+def test_from_environ_no_makeflags():
+    assert jobserver.from_environ({}) is None
+    assert jobserver.from_environ({'MAKEFLAGS': '-k'}) is None
+
+
+def test_from_environ_pipe(pipe):
+    r, w = pipe
+    makeflags = f'-j --jobserver-auth={r},{w}'
+    server = jobserver.from_environ({'MAKEFLAGS': makeflags})
+    assert server is not None
+    assert (server.r, server.w) == (r, w)
+
+
+def test_from_environ_legacy_fds(pipe):
+    r, w = pipe
+    makeflags = f'-j --jobserver-fds={r},{w}'
+    server = jobserver.from_environ({'MAKEFLAGS': makeflags})
+    assert server is not None
+    assert (server.r, server.w) == (r, w)
+
+
+def test_from_environ_not_inherited():
+    r, w = os.pipe()
+    os.close(r)
+    os.close(w)
+    makeflags = f'-j --jobserver-auth={r},{w}'
+    assert jobserver.from_environ({'MAKEFLAGS': makeflags}) is None
+
+
+def test_from_environ_semaphore():
+    makeflags = '-j --jobserver-auth=gmake_semaphore_1234'
+    assert jobserver.from_environ({'MAKEFLAGS': makeflags}) is None
+
+
+def test_from_environ_missing_fifo(tmpdir):
+    makeflags = f'-j --jobserver-auth=fifo:{tmpdir.join("f")}'
+    assert jobserver.from_environ({'MAKEFLAGS': makeflags}) is None
+
+
+def test_token_without_jobserver():
+    with jobserver.token():
+        pass
+
+
+def test_token_uses_implicit_token_first(pipe):
+    r, w = pipe
+    os.write(w, b'+')
+    with envcontext((('MAKEFLAGS', f'-j2 --jobserver-auth={r},{w}'),)):
+        server = jobserver.from_environ()
+        with jobserver.token():
+            assert _available(server) == 1
+            with jobserver.token():
+                assert _available(server) == 0
+            assert _available(server) == 1
+        assert _available(server) == 1
+
+
+@skip_win32
+def test_jobserver(tmpdir):  # pragma: win32 no cover
+    orig_env = dict(os.environ, MAKEFLAGS='-k')
+    with envcontext((('MAKEFLAGS', '-k'),)):
+        with jobserver.jobserver(3) as auth:
+            # hook processes are not handed the jobserver
+            assert os.environ == orig_env
+            assert auth is not None and auth.startswith('fifo:')
+            server = jobserver.from_environ()
+            assert server is not None
+            assert _available(server) == 3
+            # the jobserver itself does not get an implicit token
+            with jobserver.token():
+                assert _available(server) == 2
+        assert jobserver._own_auth is None
+        assert jobserver._has_implicit_token
+
+
+@skip_win32
+def test_jobserver_already_provided(pipe):  # pragma: win32 no cover
+    r, w = pipe
+    makeflags = f'-j2 --jobserver-auth={r},{w}'
+    with envcontext((('MAKEFLAGS', makeflags),)):
+        with jobserver.jobserver(8) as auth:
+            assert os.environ['MAKEFLAGS'] == makeflags
+            assert auth is None
+
+
+@skip_win32
+def test_xargs_subprocesses_do_not_get_jobserver():  # pragma: win32 no cover
+    with jobserver.jobserver(2):
+        code = 'import os; print(os.environ.get("MAKEFLAGS"))'
+        cmd = (sys.executable, '-c', code)
+        ret, out = xargs.xargs(cmd, ('a', 'b'), target_concurrency=4)
+    assert ret == 0
+    assert set(out.split()) == {b'None'}
+
+
+@skip_win32
+def test_nested_jobserver_is_its_own(tmpdir):  # pragma: win32 no cover
+    # as for a hook which runs pre-commit again
+    with jobserver.jobserver(2):
+        code = (
+            'from pre_commit import jobserver\n'
+            'with jobserver.jobserver(1) as auth:\n'
+            '    with jobserver.token():\n'
+            '        print(auth)\n'
+        )
+        ret, out = xargs.xargs((sys.executable, '-c', code), ('a',))
+    assert ret == 0
+    assert out.startswith(b'fifo:')
+
+
+@skip_win32
+def test_worker(tmpdir):  # pragma: win32 no cover
+    fifo = tmpdir.join('f').strpath
+    os.mkfifo(fifo)
+    with mock.patch.object(jobserver, '_has_implicit_token', True):
+        with mock.patch.object(jobserver, '_own_auth', None):
+            jobserver.worker(f'fifo:{fifo}')
+            assert not jobserver._has_implicit_token
+            server = jobserver.from_environ({})
+    assert server is not None
+    os.close(server.r)
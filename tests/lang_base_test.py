@@ -87,6 +87,12 @@ def test_environment_dir(tmp_path):
     assert ret == f'{tmp_path}{os.sep}langenv-default'
 
 
+def test_environment_dir_env_key(tmp_path):
+    prefix = Prefix(tmp_path, 'abc123')
+    ret = lang_base.environment_dir(prefix, 'langenv', 'default')
+    assert ret == f'{tmp_path}{os.sep}langenv-default-abc123'
+
+
 def test_assert_version_default():
     with pytest.raises(AssertionError) as excinfo:
         lang_base.assert_version_default('lang', '1.2.3')
@@ -135,6 +141,16 @@ def test_target_concurrency(cpu_count_mck, var, expected):
         assert lang_base.target_concurrency() == expected
 
 
+def test_target_concurrency_hook_concurrency(cpu_count_mck):
+    with mock.patch.dict(os.environ, clear=True):
+        with lang_base.hook_concurrency(2):
+            assert lang_base.target_concurrency() == 2
+        assert lang_base.target_concurrency() == 4
+        with mock.patch.dict(os.environ, {'PRE_COMMIT_NO_CONCURRENCY': '1'}):
+            with lang_base.hook_concurrency(2):
+                assert lang_base.target_concurrency() == 1
+
+
 def test_shuffled_is_deterministic():
     seq = [str(i) for i in range(10)]
     expected = ['4', '0', '5', '1', '8', '6', '2', '3', '7', '9']
@@ -3,6 +3,7 @@ from __future__ import annotations
 import argparse
 import contextlib
 import os.path
+import sys
 from unittest import mock
 
 import pytest
@@ -239,3 +240,24 @@ def test_hook_stage_migration(mock_store_dir):
     with mock.patch.object(main, 'run') as mck:
         main.main(('run', '--hook-stage', 'commit'))
     assert mck.call_args[0][2].hook_stage == 'pre-commit'
+
+
+def test_hook_impl_startup_does_not_import_languages():
+    cmd = (
+        sys.executable, '-X', 'importtime',
+        '-m', 'pre_commit', 'hook-impl', '--help',
+    )
+    _, _, stderr = cmd_output(*cmd)
+    assert stderr is not None
+    imported = {
+        line.split('|')[-1].strip()
+        for line in stderr.splitlines()
+        if line.startswith('import time:')
+    }
+    assert 'pre_commit.main' in imported
+    # the language modules (and what they import) load when a hook needs them
+    assert not {
+        name for name in imported if name.startswith('pre_commit.languages.')
+    }
+    assert 'tarfile' not in imported
+    assert 'urllib.request' not in imported
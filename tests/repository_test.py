@@ -15,13 +15,17 @@ from pre_commit import lang_base
 from pre_commit.all_languages import languages
 from pre_commit.clientlib import CONFIG_SCHEMA
 from pre_commit.clientlib import load_manifest
+from pre_commit.errors import FatalError
 from pre_commit.hook import Hook
 from pre_commit.languages import python
 from pre_commit.languages import unsupported
 from pre_commit.prefix import Prefix
+from pre_commit.repository import _clone_jobs
 from pre_commit.repository import _hook_installed
 from pre_commit.repository import all_hooks
 from pre_commit.repository import install_hook_envs
+from pre_commit.store import Store
+from pre_commit.util import CalledProcessError
 from pre_commit.util import cmd_output
 from pre_commit.util import cmd_output_b
 from testing.fixtures import make_config_from_repo
@@ -178,11 +182,37 @@ def test_additional_dependencies_roll_forward(tempdir_factory, store):
     with python.in_env(hook2.prefix, hook2.language_version):
         assert 'mccabe' in cmd_output('pip', 'freeze', '-l')[1]
 
+    # the checkout is shared, only the environment differs
+    assert hook1.prefix.prefix_dir == hook2.prefix.prefix_dir
+    assert hook1.prefix != hook2.prefix
+
     # should not have affected original
     with python.in_env(hook1.prefix, hook1.language_version):
         assert 'mccabe' not in cmd_output('pip', 'freeze', '-l')[1]
 
 
+def test_environments_share_identical_files(tempdir_factory, store):
+    def _files(hook):
+        envdir = lang_base.environment_dir(
+            hook.prefix, python.ENVIRONMENT_DIR, hook.language_version,
+        )
+        ret = {}
+        for root, _, filenames in os.walk(envdir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                if not os.path.islink(path):
+                    ret[os.path.relpath(path, envdir)] = os.stat(path).st_ino
+        return ret
+
+    # two repositories: nothing to share but the dependencies
+    path1 = make_repo(tempdir_factory, 'python_hooks_repo')
+    path2 = make_repo(tempdir_factory, 'python_hooks_repo')
+    files1 = _files(_get_hook(make_config_from_repo(path1), store, 'foo'))
+    files2 = _files(_get_hook(make_config_from_repo(path2), store, 'foo'))
+
+    assert any(files1[k] == files2[k] for k in files1.keys() & files2.keys())
+
+
 @pytest.mark.parametrize('v', ('v1', 'v2'))
 def test_repository_state_compatibility(tempdir_factory, store, v):
     path = make_repo(tempdir_factory, 'python_hooks_repo')
@@ -198,6 +228,93 @@ def test_repository_state_compatibility(tempdir_factory, store, v):
     assert _hook_installed(hook) is True
 
 
+def _make_not_racy(envdir):
+    for bin_dir in ('bin', 'Scripts'):
+        bin_path = os.path.join(envdir, bin_dir)
+        if os.path.isdir(bin_path):
+            for name in os.listdir(bin_path):
+                path = os.path.join(bin_path, name)
+                if not os.path.islink(path):
+                    os.utime(path, ns=(0, 0))
+
+
+def test_health_check_is_cached(tempdir_factory, store):
+    path = make_repo(tempdir_factory, 'python_hooks_repo')
+    hook = _get_hook(make_config_from_repo(path), store, 'foo')
+    envdir = lang_base.environment_dir(
+        hook.prefix, python.ENVIRONMENT_DIR, hook.language_version,
+    )
+    _make_not_racy(envdir)
+
+    with mock.patch.object(
+            python, 'health_check', wraps=python.health_check,
+    ) as health_check:
+        assert _hook_installed(hook) is True
+        assert _hook_installed(hook) is True
+        assert health_check.call_count == 1
+
+        # an executable changed: check again
+        exe = os.path.join(envdir, python.bin_dir(envdir), 'foo')
+        if sys.platform == 'win32':  # pragma: win32 cover
+            exe = f'{exe}.exe'
+        os.utime(exe, ns=(10 ** 9, 10 ** 9))
+        assert _hook_installed(hook) is True
+        assert _hook_installed(hook) is True
+        assert health_check.call_count == 2
+
+
+def test_health_check_racy_executables_not_cached(tempdir_factory, store):
+    path = make_repo(tempdir_factory, 'python_hooks_repo')
+    hook = _get_hook(make_config_from_repo(path), store, 'foo')
+    envdir = lang_base.environment_dir(
+        hook.prefix, python.ENVIRONMENT_DIR, hook.language_version,
+    )
+    _make_not_racy(envdir)
+    exe = os.path.join(envdir, python.bin_dir(envdir), 'foo')
+    if sys.platform == 'win32':  # pragma: win32 cover
+        exe = f'{exe}.exe'
+    os.utime(exe)
+
+    with mock.patch.object(
+            python, 'health_check', wraps=python.health_check,
+    ) as health_check:
+        # just modified: may be modified again without its stat changing
+        assert _hook_installed(hook) is True
+        assert _hook_installed(hook) is True
+        assert health_check.call_count == 2
+
+
+def test_health_check_failure_not_cached(tempdir_factory, store):
+    path = make_repo(tempdir_factory, 'python_hooks_repo')
+    hook = _get_hook(make_config_from_repo(path), store, 'foo')
+    envdir = lang_base.environment_dir(
+        hook.prefix, python.ENVIRONMENT_DIR, hook.language_version,
+    )
+    _make_not_racy(envdir)
+
+    with mock.patch.object(python, 'health_check', return_value='broken'):
+        assert _hook_installed(hook) is False
+        assert _hook_installed(hook) is False
+    assert not os.path.exists(os.path.join(envdir, '.health_check'))
+
+
+def test_health_check_without_executables_not_cached(tempdir_factory, store):
+    path = make_repo(tempdir_factory, 'python_hooks_repo')
+    hook = _get_hook(make_config_from_repo(path), store, 'foo')
+    envdir = lang_base.environment_dir(
+        hook.prefix, python.ENVIRONMENT_DIR, hook.language_version,
+    )
+    # like R's `renv`: nothing tells when the interpreter is upgraded
+    bin_path = os.path.join(envdir, python.bin_dir(envdir))
+    os.rename(bin_path, os.path.join(envdir, 'moved'))
+
+    with mock.patch.object(python, 'health_check', return_value=None) as mck:
+        assert _hook_installed(hook) is True
+        assert _hook_installed(hook) is True
+        assert mck.call_count == 2
+    assert not os.path.exists(os.path.join(envdir, '.health_check'))
+
+
 def test_unknown_keys(store, caplog):
     config = {
         'repo': 'local',
@@ -265,6 +382,43 @@ def test_control_c_control_c_on_install(tempdir_factory, store):
     assert ret == 0
 
 
+def test_install_environments_concurrently(tempdir_factory, store, caplog):
+    hooks = [
+        _get_hook_no_install(
+            make_config_from_repo(make_repo(tempdir_factory, repo)),
+            store,
+            'foo',
+        )
+        for repo in ('python_hooks_repo', 'python_hooks_repo')
+    ]
+    # a bad language_version fails quickly
+    bad_config = {
+        'repo': 'local',
+        'hooks': [{
+            'id': 'bad',
+            'name': 'bad',
+            'entry': 'bad',
+            'language': 'python',
+            'language_version': 'python0.0',
+        }],
+    }
+    bad = _get_hook_no_install(bad_config, store, 'bad')
+    assert len({hook.prefix for hook in (*hooks, bad)}) == 3
+
+    with mock.patch.object(lang_base, 'target_concurrency', return_value=4):
+        with pytest.raises(CalledProcessError):
+            install_hook_envs([*hooks, bad], store)
+
+    assert caplog.messages[-1] == 'Failed to install environment for local.'
+    for hook in hooks:
+        assert _hook_installed(hook)
+    # the failed environment was cleaned up
+    envdir = lang_base.environment_dir(
+        bad.prefix, python.ENVIRONMENT_DIR, bad.language_version,
+    )
+    assert not os.path.exists(envdir)
+
+
 def test_invalidated_virtualenv(tempdir_factory, store):
     # A cached virtualenv may become invalidated if the system python upgrades
     # This should not cause every hook in that virtualenv to fail.
@@ -290,6 +444,71 @@ def test_invalidated_virtualenv(tempdir_factory, store):
     assert ret == 0
 
 
+def test_all_hooks_clones_concurrently(tempdir_factory, store):
+    repos = [
+        make_config_from_repo(make_repo(tempdir_factory, 'script_hooks_repo'))
+        for _ in range(3)
+    ]
+    local = {
+        'repo': 'local',
+        'hooks': [{
+            'id': 'local', 'name': 'local', 'entry': 'true',
+            'language': 'system',
+        }],
+    }
+    config = {'repos': [*repos, local]}
+    config = cfgv.validate(config, CONFIG_SCHEMA)
+    config = cfgv.apply_defaults(config, CONFIG_SCHEMA)
+
+    env = {'PRE_COMMIT_CLONE_JOBS': '4'}
+    with mock.patch.dict(os.environ, env):
+        os.environ.pop('PRE_COMMIT_NO_CONCURRENCY')
+        hooks = all_hooks(config, store)
+
+    # in the order of the configuration
+    assert [hook.src for hook in hooks] == [
+        *(repo['repo'] for repo in repos), 'local',
+    ]
+    assert len({hook.prefix for hook in hooks}) == 4
+
+
+@pytest.mark.parametrize(
+    ('value', 'expected'), (('3', 3), ('0', 1), ('-2', 1)),
+)
+def test_clone_jobs(value, expected):
+    with mock.patch.dict(os.environ, {'PRE_COMMIT_CLONE_JOBS': value}):
+        os.environ.pop('PRE_COMMIT_NO_CONCURRENCY', None)
+        assert _clone_jobs() == expected
+
+
+def test_clone_jobs_invalid():
+    with mock.patch.dict(os.environ, {'PRE_COMMIT_CLONE_JOBS': 'lots'}):
+        os.environ.pop('PRE_COMMIT_NO_CONCURRENCY', None)
+        with pytest.raises(FatalError) as excinfo:
+            _clone_jobs()
+    msg, = excinfo.value.args
+    assert msg == "PRE_COMMIT_CLONE_JOBS must be an integer, got 'lots'"
+
+
+def test_all_hooks_looks_up_repos_at_once(tempdir_factory, store):
+    repos = [
+        make_config_from_repo(make_repo(tempdir_factory, 'script_hooks_repo'))
+        for _ in range(3)
+    ]
+    config = {'repos': repos}
+    config = cfgv.validate(config, CONFIG_SCHEMA)
+    config = cfgv.apply_defaults(config, CONFIG_SCHEMA)
+    all_hooks(config, store)
+
+    # as in a later run
+    store = Store(store.directory)
+    with mock.patch.object(store, 'connect', wraps=store.connect) as connect:
+        hooks = all_hooks(config, store)
+    assert len(hooks) == 3
+    assert connect.call_count == 1
+    store.close()
+
+
 def test_really_long_file_paths(tempdir_factory, store):
     base_path = tempdir_factory.get()
     really_long_path = os.path.join(base_path, 'really_long' * 10)
@@ -431,6 +650,8 @@ def test_manifest_hooks(tempdir_factory, store):
         name='Bash hook',
         pass_filenames=True,
         require_serial=False,
+        read_only=False,
+        cache=False,
         stages=[
             'commit-msg',
             'post-checkout',
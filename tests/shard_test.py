@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import argparse
+
+import pytest
+
+from pre_commit.shard import parse_shard
+from pre_commit.shard import Shard
+from pre_commit.shard import shard_filenames
+
+
+def test_parse_shard():
+    assert parse_shard('2/3') == Shard(2, 3)
+
+
+@pytest.mark.parametrize('s', ('', '1', '1/2/3', 'a/b', '0/2', '3/2'))
+def test_parse_shard_invalid(s):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_shard(s)
+
+
+@pytest.mark.parametrize('by_size', (False, True))
+def test_shards_partition_filenames(tmpdir, by_size):
+    with tmpdir.as_cwd():
+        filenames = [f'f{i}' for i in range(100)]
+        for i, filename in enumerate(filenames):
+            tmpdir.join(filename).write('x' * i)
+
+        shards = [
+            shard_filenames(Shard(i, 3), filenames, by_size=by_size)
+            for i in (1, 2, 3)
+        ]
+    assert set().union(*shards) == set(filenames)
+    assert sum(len(shard) for shard in shards) == len(filenames)
+    assert all(shards)
+
+
+def test_shard_filenames_is_stable():
+    filenames = [f'f{i}' for i in range(100)]
+    assert (
+        shard_filenames(Shard(1, 4), filenames) ==
+        shard_filenames(Shard(1, 4), list(reversed(filenames)))
+    )
+
+
+def test_shard_filenames_by_size_balances_sizes(tmpdir):
+    with tmpdir.as_cwd():
+        tmpdir.join('big').write('x' * 10000)
+        filenames = ['big', *(f'f{i}' for i in range(10))]
+        for filename in filenames[1:]:
+            tmpdir.join(filename).write('x' * 100)
+
+        shards = [
+            shard_filenames(Shard(i, 2), filenames, by_size=True)
+            for i in (1, 2)
+        ]
+    assert {'big'} in shards
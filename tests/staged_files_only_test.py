@@ -9,7 +9,9 @@ import pytest
 import re_assert
 
 from pre_commit import git
+from pre_commit.envcontext import envcontext
 from pre_commit.errors import FatalError
+from pre_commit.staged_files_only import isolated_staged_files
 from pre_commit.staged_files_only import staged_files_only
 from pre_commit.util import cmd_output
 from testing.auto_namedtuple import auto_namedtuple
@@ -447,3 +449,107 @@ def test_failed_diff_does_not_discard_changes(in_git_dir, patch_dir):
     for i in range(3):
         with open(str(i)) as f:
             assert f.read() == 'new contents'
+
+
+def _read(filename):
+    with open(filename) as f:
+        return f.read()
+
+
+def _staged(filename):
+    return cmd_output('git', 'show', f':{filename}')[1]
+
+
+def test_isolated_nothing_unstaged(foo_staged):
+    with isolated_staged_files() as patch:
+        assert os.getcwd() == foo_staged.path
+        assert patch == ()
+    _test_foo_state(foo_staged)
+
+
+def test_isolated_something_unstaged(foo_staged):
+    with open('foo', 'w') as f:
+        f.write('herp\nderp\n')
+    mtime = os.stat('foo').st_mtime_ns
+
+    with isolated_staged_files() as patch:
+        assert os.getcwd() != foo_staged.path
+        assert _read('foo') == FOO_CONTENTS
+        # only set for running the hooks
+        assert 'GIT_DIR' not in os.environ
+        # git commands see the copy
+        with envcontext(patch):
+            assert not git.has_diff()
+
+    assert os.getcwd() == foo_staged.path
+    _test_foo_state(foo_staged, 'herp\nderp\n', 'AM')
+    # the file with unstaged changes was never touched
+    assert os.stat('foo').st_mtime_ns == mtime
+    assert not [n for n in os.listdir('.git') if n.startswith('pre-commit')]
+
+
+@pytest.fixture
+def foo_and_bar_staged(foo_staged):
+    with open('bar', 'w') as f:
+        f.write('bar\n')
+    cmd_output('git', 'add', 'bar')
+    yield foo_staged
+
+
+@pytest.mark.parametrize('in_place', (True, False))
+def test_isolated_fixes_without_unstaged_changes(foo_and_bar_staged, in_place):
+    with open('foo', 'w') as f:
+        f.write('herp\nderp\n')
+
+    with isolated_staged_files():
+        if in_place:
+            with open('bar', 'a') as f:
+                f.write('fixed\n')
+        else:
+            with open('bar.tmp', 'w') as f:
+                f.write('bar\nfixed\n')
+            os.replace('bar.tmp', 'bar')
+
+    assert _read('bar') == _staged('bar') == 'bar\nfixed\n'
+    assert get_short_git_status()['bar'] == 'A'
+
+
+def test_isolated_fixes_merged_with_unstaged_changes(foo_staged):
+    with open('foo', 'w') as f:
+        f.write(f'{FOO_CONTENTS}9\n')
+
+    with isolated_staged_files():
+        with open('foo', 'w') as f:
+            f.write(FOO_CONTENTS.replace('1', 'a'))
+
+    assert _staged('foo') == FOO_CONTENTS.replace('1', 'a')
+    assert _read('foo') == f'{FOO_CONTENTS.replace("1", "a")}9\n'
+
+
+def test_isolated_fixes_conflicting_with_unstaged_changes(foo_staged, caplog):
+    with open('foo', 'w') as f:
+        f.write(FOO_CONTENTS.replace('1', 'a'))
+
+    with isolated_staged_files():
+        with open('foo', 'w') as f:
+            f.write(FOO_CONTENTS.replace('1', 'b'))
+
+    assert _staged('foo') == FOO_CONTENTS.replace('1', 'b')
+    assert _read('foo') == FOO_CONTENTS.replace('1', 'a')
+    assert caplog.messages[-1] == (
+        'Fixes to foo conflicted with its unstaged changes, '
+        'they are only staged.'
+    )
+
+
+def test_isolated_intent_to_add(foo_staged):
+    with open('foo', 'w') as f:
+        f.write('herp\n')
+    with open('ita', 'w') as f:
+        f.write('ita\n')
+    cmd_output('git', 'add', '--intent-to-add', 'ita')
+
+    with isolated_staged_files():
+        assert not os.path.exists('ita')
+
+    assert git.intent_to_add_files() == ['ita']
@@ -2,14 +2,19 @@ from __future__ import annotations
 
 import logging
 import os.path
+import pickle
 import shlex
+import shutil
 import sqlite3
 import stat
+import sys
 from unittest import mock
 
 import pytest
 
 import pre_commit.constants as C
+from pre_commit import clientlib
+from pre_commit import file_lock
 from pre_commit import git
 from pre_commit.store import _get_default_directory
 from pre_commit.store import _LOCAL_RESOURCES
@@ -105,6 +110,142 @@ def test_clone(store, tempdir_factory, caplog):
     assert _select_all_repos(store) == [(path, rev, ret)]
 
 
+def _can_flock(path, operation):
+    import fcntl
+
+    with open(path, 'a+') as f:
+        try:
+            fcntl.flock(f.fileno(), operation | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        else:
+            return True
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='no shared locks')
+def test_lock(store):  # pragma: win32 no cover
+    import fcntl
+
+    global_lock = os.path.join(store.directory, '.lock')
+    with store.lock('repo', 'r1'):
+        (lock_file,) = os.listdir(os.path.join(store.directory, '.locks'))
+        lock_file = os.path.join(store.directory, '.locks', lock_file)
+        assert not _can_flock(lock_file, fcntl.LOCK_EX)
+        # other keys and other processes' shared locks are not blocked
+        with store.lock('repo', 'r2'):
+            pass
+        assert _can_flock(global_lock, fcntl.LOCK_SH)
+        # but the whole store cannot be locked
+        assert not _can_flock(global_lock, fcntl.LOCK_EX)
+    assert _can_flock(lock_file, fcntl.LOCK_EX)
+
+
+def test_nested_locks_take_store_lock_once(store):
+    global_lock = os.path.join(store.directory, '.lock')
+    with mock.patch.object(
+            file_lock, 'lock', wraps=file_lock.lock,
+    ) as lock_mck:
+        with store.lock('repo', 'r1'):
+            with store.lock('mirror', 'r1'):
+                pass
+        with store.lock('repo', 'r2'):
+            pass
+    paths = [call[0][0] for call in lock_mck.call_args_list]
+    assert paths.count(global_lock) == 2
+    assert len(paths) == 5
+
+
+def test_clear_locks(store):
+    with store.lock('repo', 'r1'):
+        pass
+    store.clear_locks()
+    assert not os.path.exists(os.path.join(store.directory, '.locks'))
+    store.clear_locks()  # ok if there are none
+
+
+def _env(store, name, files):
+    env = os.path.join(store.directory, name)
+    for filename, (contents, mode) in files.items():
+        path = os.path.join(env, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(contents)
+        os.chmod(path, mode)
+    return env
+
+
+def _inode(*parts):
+    return os.stat(os.path.join(*parts)).st_ino
+
+
+def test_dedupe(store):
+    env1 = _env(
+        store, 'env1',
+        {'lib/a.py': ('a', 0o644), 'bin/b': ('b', 0o755), 'c': ('c', 0o644)},
+    )
+    env2 = _env(
+        store, 'env2',
+        {'lib/a.py': ('a', 0o644), 'bin/b': ('b', 0o644), 'c': ('d', 0o644)},
+    )
+    store.dedupe(env1)
+    store.dedupe(env2)
+
+    assert _inode(env1, 'lib/a.py') == _inode(env2, 'lib/a.py')
+    # same contents with a different mode is a different file
+    assert _inode(env1, 'bin/b') != _inode(env2, 'bin/b')
+    assert _inode(env1, 'c') != _inode(env2, 'c')
+    with open(os.path.join(env2, 'c')) as f:
+        assert f.read() == 'd'
+    assert stat.S_IMODE(os.stat(os.path.join(env2, 'bin/b')).st_mode) == 0o444
+
+
+def test_dedupe_modification_does_not_leak(store):
+    env1 = _env(store, 'env1', {'a.py': ('a', 0o644)})
+    env2 = _env(store, 'env2', {'a.py': ('a', 0o644)})
+    store.dedupe(env1)
+    store.dedupe(env2)
+    path = os.path.join(env1, 'a.py')
+    assert _inode(path) == _inode(env2, 'a.py')
+
+    # the shared copy cannot be modified in place
+    assert not os.stat(path).st_mode & 0o222
+    # installers (pip, ...) write a new file instead
+    with open(f'{path}.tmp', 'w') as f:
+        f.write('modified')
+    os.replace(f'{path}.tmp', path)
+
+    with open(os.path.join(env2, 'a.py')) as f:
+        assert f.read() == 'a'
+
+
+@xfailif_windows  # pragma: win32 no cover
+def test_dedupe_skips_symlinks_and_empty_files(store):
+    env = _env(store, 'env', {'a': ('a', 0o644), 'empty': ('', 0o644)})
+    os.symlink('a', os.path.join(env, 'link'))
+    store.dedupe(env)
+    assert os.path.islink(os.path.join(env, 'link'))
+    assert os.stat(os.path.join(env, 'a')).st_nlink == 2
+    assert os.stat(os.path.join(env, 'empty')).st_nlink == 1
+
+
+def test_remove_unused_objects(store):
+    assert store.remove_unused_objects() == 0
+
+    env1 = _env(store, 'env1', {'a': ('a', 0o644), 'b': ('b', 0o644)})
+    env2 = _env(store, 'env2', {'a': ('a', 0o644)})
+    store.dedupe(env1)
+    store.dedupe(env2)
+
+    shutil.rmtree(env1)
+    assert store.remove_unused_objects() == 1
+    objects = os.path.join(store.directory, 'objects')
+    assert len(os.listdir(objects)) == 1
+
+    shutil.rmtree(env2)
+    assert store.remove_unused_objects() == 1
+    assert os.listdir(objects) == []
+
+
 def test_warning_for_deprecated_stages_on_init(store, tempdir_factory, caplog):
     manifest = '''\
 -   id: hook1
@@ -184,6 +325,33 @@ def test_clone_cleans_up_on_checkout_failure(store):
     assert repo_dirs == []
 
 
+def test_clones_share_a_mirror(store, tempdir_factory):
+    path = git_dir(tempdir_factory)
+    with cwd(path):
+        git_commit()
+        rev1 = git.head_rev(path)
+        git_commit()
+        rev2 = git.head_rev(path)
+
+    ret1 = store.clone(path, rev1)
+    ret2 = store.clone(path, rev2)
+    ret3 = store.clone(path, rev2, ('dep',))
+    assert len({ret1, ret2, ret3}) == 3
+    assert git.head_rev(ret1) == rev1
+    assert git.head_rev(ret2) == git.head_rev(ret3) == rev2
+
+    mirror, = os.listdir(os.path.join(store.directory, 'mirrors'))
+    mirror = os.path.join(store.directory, 'mirrors', mirror)
+    for ret in (ret1, ret2, ret3):
+        # objects come from the mirror
+        alternates = os.path.join(ret, '.git/objects/info/alternates')
+        with open(alternates) as f:
+            assert f.read() == f'{os.path.join(mirror, "objects")}\n'
+        _, out, _ = cmd_output('git', 'count-objects', '-v', cwd=ret)
+        assert 'count: 0\n' in out
+        assert 'in-pack: 0\n' in out
+
+
 def test_clone_when_repo_already_exists(store):
     # Create an entry in the sqlite db that makes it look like the repo has
     # been cloned.
@@ -196,6 +364,75 @@ def test_clone_when_repo_already_exists(store):
     assert store.clone('fake_repo', 'fake_ref') == 'fake_path'
 
 
+def _insert_repos(store, rows):
+    with store.connect() as db:
+        db.executemany(
+            'INSERT INTO repos (repo, ref, path) VALUES (?, ?, ?)', rows,
+        )
+
+
+def test_connect_reuses_connection(store):
+    with store.connect() as db1:
+        pass
+    with store.connect() as db2:
+        pass
+    assert db1 is db2
+
+    store.close()
+    with store.connect() as db3:
+        pass
+    assert db3 is not db1
+
+
+def test_store_pickles_without_its_connection(store):
+    with store.connect() as db:
+        pass
+    other = pickle.loads(pickle.dumps(store))
+    assert other.directory == store.directory
+    with other.connect() as other_db:
+        assert other_db is not db
+        assert other_db.execute('SELECT COUNT(1) FROM repos').fetchone()
+    other.close()
+
+
+def test_resolve_repos(store, tmpdir):
+    rows = [
+        (f'repo{i}', 'ref', tmpdir.join(f'r{i}').ensure_dir().strpath)
+        for i in range(300)
+    ]
+    _insert_repos(store, rows)
+
+    store.resolve_repos([(repo, ref) for repo, ref, _ in rows])
+    store.resolve_repos([('repo0', 'ref'), ('unknown', 'ref')])
+
+    with mock.patch.object(store, 'connect', side_effect=AssertionError):
+        assert store.clone('repo299', 'ref') == rows[299][2]
+        assert store.clone('repo0', 'ref') == rows[0][2]
+
+
+def test_clone_is_memoized(store, tmpdir):
+    path = tmpdir.join('r').ensure_dir().strpath
+    _insert_repos(store, [('fake_repo', 'fake_ref', path)])
+    assert store.clone('fake_repo', 'fake_ref') == path
+
+    with mock.patch.object(store, 'connect', side_effect=AssertionError):
+        assert store.clone('fake_repo', 'fake_ref') == path
+
+
+def test_clone_memoized_but_removed(store, tmpdir):
+    path = tmpdir.join('r').ensure_dir().strpath
+    _insert_repos(store, [('fake_repo', 'fake_ref', path)])
+    store.resolve_repos([('fake_repo', 'fake_ref')])
+
+    # as `gc` would
+    os.rmdir(path)
+    with store.connect() as db:
+        db.execute('DELETE FROM repos')
+    _insert_repos(store, [('fake_repo', 'fake_ref', 'new_path')])
+
+    assert store.clone('fake_repo', 'fake_ref') == 'new_path'
+
+
 def test_clone_shallow_failure_fallback_to_complete(
     store, tempdir_factory,
     caplog,
@@ -258,6 +495,23 @@ def test_create_when_store_already_exists(store):
     Store(store.directory)
 
 
+def test_migrates_store_created_by_older_version(store):
+    with sqlite3.connect(store.db_path) as db:
+        db.executescript(
+            'DROP TABLE hook_results;'
+            'DROP TABLE file_tags;'
+            'PRAGMA user_version = 0;',
+        )
+    db.close()
+
+    store = Store(store.directory)
+    assert store.select_file_tags([(1, 2)]) == {}
+    with sqlite3.connect(store.db_path) as db:
+        version, = db.execute('PRAGMA user_version').fetchone()
+    db.close()
+    assert version > 0
+
+
 def test_db_repo_name(store):
     assert store.db_repo_name('repo', ()) == 'repo'
     assert store.db_repo_name('repo', ('b', 'a', 'c')) == 'repo:b,a,c'
@@ -272,6 +526,78 @@ def test_local_resources_reflects_reality():
     assert on_disk == {os.path.basename(x) for x in _LOCAL_RESOURCES}
 
 
+def test_load_config_is_cached(store, tmpdir):
+    f = tmpdir.join('cfg.yaml')
+    f.write('repos: []\n')
+
+    with mock.patch.object(
+            clientlib, 'load_config', wraps=clientlib.load_config,
+    ) as load_config:
+        ret1 = store.load_config(f.strpath)
+        ret2 = store.load_config(f.strpath)
+        assert load_config.call_count == 1
+        assert ret1 == ret2 == clientlib.load_config(f.strpath)
+        # each caller gets its own copy
+        assert ret1 is not ret2
+
+        f.write('repos: []\nfail_fast: true\n')
+        assert store.load_config(f.strpath)['fail_fast'] is True
+        assert load_config.call_count == 3
+
+
+def test_load_config_cached_repeats_warnings(store, tmpdir, caplog):
+    f = tmpdir.join('cfg.yaml')
+    f.write('repos: []\nunknown: 1\n')
+
+    store.load_config(f.strpath)
+    first = caplog.record_tuples
+    assert first == [
+        ('pre_commit', logging.WARNING,
+         'Unexpected key(s) present at root: unknown'),
+    ]
+    caplog.clear()
+
+    with mock.patch.object(
+            clientlib, 'load_config', side_effect=AssertionError,
+    ):
+        store.load_config(f.strpath)
+    assert caplog.record_tuples == first
+
+
+def test_load_config_errors_not_cached(store, tmpdir):
+    with pytest.raises(clientlib.InvalidConfigError):
+        store.load_config(tmpdir.join('missing.yaml').strpath)
+
+    f = tmpdir.join('cfg.yaml')
+    f.write('repos: 1\n')
+    for _ in range(2):
+        with pytest.raises(clientlib.InvalidConfigError):
+            store.load_config(f.strpath)
+    assert not os.path.exists(os.path.join(store.directory, 'loaded'))
+
+
+def test_load_manifest_is_cached(store, tmpdir):
+    f = tmpdir.join(C.MANIFEST_FILE)
+    f.write('-   {id: a, name: a, entry: a, language: system}\n')
+
+    with mock.patch.object(
+            clientlib, 'load_manifest', wraps=clientlib.load_manifest,
+    ) as load_manifest:
+        hook, = store.load_manifest(f.strpath)
+        assert store.load_manifest(f.strpath) == [hook]
+        assert load_manifest.call_count == 1
+    assert hook['id'] == 'a'
+
+
+def test_clear_load_cache(store, tmpdir):
+    f = tmpdir.join('cfg.yaml')
+    f.write('repos: []\n')
+    store.load_config(f.strpath)
+    store.clear_load_cache()
+    assert not os.path.exists(os.path.join(store.directory, 'loaded'))
+    store.clear_load_cache()  # ok if there is none
+
+
 def test_mark_config_as_used(store, tmpdir):
     with tmpdir.as_cwd():
         f = tmpdir.join('f').ensure()
@@ -319,6 +645,62 @@ def test_mark_config_as_used_readonly(tmpdir):
     assert _select_all_configs(store) == []
 
 
+def _hook_results(store):
+    with store.connect() as db:
+        return db.execute(
+            'SELECT key, configs, filename FROM hook_results ORDER BY 1, 3',
+        ).fetchall()
+
+
+def test_select_passed_files(store):
+    store.mark_files_passed('k', 'c', '/prefix', '/cfg', {'a': '1', 'b': '2'})
+    store.mark_files_passed('k', 'c', '/prefix', '/cfg', {'b': '3'})
+    store.mark_files_passed('other', 'c', '/prefix', '/cfg', {'c': '4'})
+
+    ret = store.select_passed_files('k', 'c', {'a': '1', 'b': '2', 'c': '4'})
+    assert ret == {'a'}
+    assert store.select_passed_files('k', 'c', {'b': '3'}) == {'b'}
+    # with another tool configuration
+    assert store.select_passed_files('k', 'c2', {'b': '3'}) == set()
+
+
+def test_select_passed_files_many_files(store):
+    digests = {f'f{i}': str(i) for i in range(1000)}
+    store.mark_files_passed('k', 'c', '/prefix', '/cfg', digests)
+    assert store.select_passed_files('k', 'c', digests) == set(digests)
+
+
+def test_mark_files_passed_replaces_other_configurations(store):
+    store.mark_files_passed('k', 'c1', '/prefix', '/cfg', {'a': '1'})
+    store.mark_files_passed('other', 'c1', '/prefix', '/cfg', {'a': '1'})
+    store.mark_files_passed('k', 'c2', '/prefix', '/cfg', {'b': '2'})
+    assert _hook_results(store) == [('k', 'c2', 'b'), ('other', 'c1', 'a')]
+
+
+def test_prune_hook_results(store):
+    for key in ('k1', 'k2', 'k3'):
+        store.mark_files_passed(key, 'c', '/prefix', '/cfg', {'a': '1'})
+    store.mark_files_passed('k4', 'c', '/prefix', '/other', {'a': '1'})
+
+    store.prune_hook_results('/cfg', {'k1', 'k3'})
+    assert [key for key, _, _ in _hook_results(store)] == ['k1', 'k3', 'k4']
+    store.prune_hook_results('/cfg', ())
+    assert [key for key, _, _ in _hook_results(store)] == ['k4']
+
+
+def test_select_file_tags(store):
+    store.mark_file_tags({(1, 2): ('k', {'text', 'file'})})
+    store.mark_file_tags({(1, 3): ('k2', {'binary'}), (1, 2): ('k3', {'x'})})
+    ret = store.select_file_tags([(1, 2), (1, 3), (1, 4)])
+    assert ret == {(1, 2): ('k3', {'x'}), (1, 3): ('k2', {'binary'})}
+
+
+def test_select_file_tags_many_files(store):
+    rows = {(1, i): (str(i), {'file'}) for i in range(1000)}
+    store.mark_file_tags(rows)
+    assert store.select_file_tags(rows) == rows
+
+
 def test_clone_with_recursive_submodules(store, tmp_path):
     sub = tmp_path.joinpath('sub')
     sub.mkdir()
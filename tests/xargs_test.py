@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import concurrent.futures
 import multiprocessing
+import multiprocessing.forkserver
 import os
 import sys
 import time
@@ -47,6 +48,32 @@ def test_cpu_count_multiprocessing_cpu_count_not_implemented(
         assert xargs.cpu_count() == 1
 
 
+def test_process_pool_environment():
+    with mock.patch.dict(os.environ, {'PRE_COMMIT_TEST_VAR': '1'}):
+        with xargs.process_pool(1) as pool:
+            ret = pool.submit(os.getenv, 'PRE_COMMIT_TEST_VAR').result()
+    assert ret == '1'
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='no forkserver')
+def test_process_pool_forkserver_environment():  # pragma: win32 no cover
+    ctx = multiprocessing.get_context('forkserver')
+    # the server starts from the environment at this point
+    multiprocessing.forkserver.ensure_running()
+    with mock.patch.object(
+            multiprocessing, 'get_all_start_methods',
+            return_value=['forkserver'],
+    ):
+        with mock.patch.object(
+                multiprocessing, 'get_context', return_value=ctx,
+        ):
+            with mock.patch.dict(os.environ, {'PRE_COMMIT_TEST_VAR': '1'}):
+                with xargs.process_pool(1) as pool:
+                    fut = pool.submit(os.getenv, 'PRE_COMMIT_TEST_VAR')
+                    ret = fut.result()
+    assert ret == '1'
+
+
 @pytest.mark.parametrize(
     ('env', 'expected'),
     (
@@ -154,6 +181,64 @@ def test_partition_target_concurrency_wont_make_tiny_partitions():
     )
 
 
+def test_partition_work_queue_shrinks_partitions():
+    ret = xargs.partition(
+        ('foo',), tuple(str(i) for i in range(40)),
+        2,
+        _max_length=1000,
+        work_queue=True,
+    )
+    assert [len(part) - 1 for part in ret] == [10, 8, 6, 4, 4, 4, 4]
+    # arguments are still in order
+    assert [arg for part in ret for arg in part[1:]] == [
+        str(i) for i in range(40)
+    ]
+
+
+def test_partition_work_queue_respects_max_length():
+    ret = xargs.partition(
+        ('foo',), ('A',) * 10,
+        2,
+        _max_length=10,
+        work_queue=True,
+    )
+    assert ret == (
+        ('foo',) + ('A',) * 3,
+        ('foo',) + ('A',) * 3,
+        ('foo',) + ('A',) * 3,
+        ('foo', 'A'),
+    )
+
+
+def test_partition_work_queue_argument_too_long():
+    with pytest.raises(xargs.ArgumentTooLongError):
+        xargs.partition(
+            ('a' * 5,), ('a' * 5,), 2, _max_length=10, work_queue=True,
+        )
+
+
+def test_partition_cost_balances_work():
+    costs = {'big': 12, 'small': 1}
+    ret = xargs.partition(
+        ('foo',), ('big',) + ('small',) * 12,
+        2,
+        _max_length=1000,
+        cost=costs.__getitem__,
+    )
+    assert ret == (('foo', 'big'), ('foo',) + ('small',) * 12)
+
+
+def test_file_size_cost(tmp_path):
+    small = tmp_path.joinpath('small')
+    small.write_bytes(b'x' * 200)
+    big = tmp_path.joinpath('big')
+    big.write_bytes(b'x' * 2 * 1024 * 1024)
+
+    assert xargs.file_size_cost(str(small)) == 1
+    assert xargs.file_size_cost(str(big)) == 513
+    assert xargs.file_size_cost(str(tmp_path.joinpath('dne'))) == 1
+
+
 def test_argument_too_long():
     with pytest.raises(xargs.ArgumentTooLongError):
         xargs.partition(('a' * 5,), ('a' * 5,), 1, _max_length=10)